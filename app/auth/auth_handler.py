@@ -4,10 +4,12 @@ from starlette.status import HTTP_403_FORBIDDEN
 import os
 
 API_KEY = os.getenv("API_KEY", "2beeac086729f8bbed029a469e96b38d")
+# Further accepted keys (comma-separated), e.g. one per client so COST_KEY_LIMITS can tell them apart
+API_KEYS = {API_KEY} | {key.strip() for key in os.getenv("API_KEYS", "").split(',') if key.strip()}
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 async def get_api_key(api_key_header: str = Security(api_key_header)):
-    if not api_key_header or api_key_header != API_KEY:
+    if not api_key_header or api_key_header not in API_KEYS:
         raise HTTPException(
             status_code=HTTP_403_FORBIDDEN, 
             detail="Invalid or missing API key"
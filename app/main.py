@@ -1,28 +1,56 @@
 # app/main.py
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Security
-from typing import Dict, Any, Optional
-import magic
-import httpx
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request, Security
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple, Union
 import logging
-from app.utils.document_processor import DocumentProcessor, ExtractionMethod
+from app.utils.cost import (
+    COST_BUDGET, COST_MODEL, COST_STATS, CostBudgetBusy, DocumentTooExpensive, Reservation, actual_cost,
+    measure_cost
+)
+from app.utils.document_processor import DocumentProcessor, ExtractionMethod, ProcessingCancelled, extraction_settings
+from app.utils.extraction_pool import (
+    EXTRACTION_POOL, EXTRACTION_QUEUE_TIMEOUT, ExtractionPoolBusy, ExtractionWorkerCrashed, WorkerProcessor
+)
+from app.utils.fetcher import FetchError, close_clients, fetch_url
+from app.utils.jobs import DEFAULT_PRIORITY, JobManager, JobQueueFull
+from app.utils import metrics
+from app.utils.metrics import record_extraction, register_counters, register_gauges, stage
+from app.utils.ocr_pool import OCR_POOL, OCRPoolBusy
+from app.utils.ocr_tiers import OCR_TIER_STATS, OCRPolicy
+from app.utils.result_cache import PAGE_CACHE, RESULT_CACHE, cache_key
+from app.utils.spool import SpooledDocument, suffix_for
+from app.utils.warmup import READINESS
+from app.utils.office_converter import OFFICE_POOL
 from app.auth.auth_handler import get_api_key
-import boto3
-from urllib.parse import urlparse, parse_qs
-from botocore.exceptions import ClientError
 import os
 import asyncio
-import PyPDF2
-from io import BytesIO
-from fastapi.responses import JSONResponse
+import concurrent.futures
+import json
+import threading
+import time
+import zipfile
+from contextlib import asynccontextmanager
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_manager.start()
+    # Warm-up runs in the background: /healthz answers at once, /readyz once the backends are loaded
+    warmup = asyncio.create_task(READINESS.warm_up())
+    yield
+    warmup.cancel()
+    await job_manager.stop()
+    await asyncio.to_thread(EXTRACTION_POOL.shutdown)
+    await close_clients()
+
 app = FastAPI(
     title="Document Processor",
     description="API for processing documents and extracting text",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 @app.exception_handler(asyncio.TimeoutError)
@@ -43,38 +71,14 @@ SUPPORTED_MIME_TYPES = {
     'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
 }
 
-MAX_PAGES = 10
 MAX_PROCESSING_TIME = 300  # seconds
-
-def get_s3_client():
-    return boto3.client('s3')
-
-def generate_presigned_url(bucket: str, key: str, expiration: int = 900) -> str:
-    try:
-        s3_client = get_s3_client()
-        url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': bucket, 'Key': key},
-            ExpiresIn=expiration
-        )
-        return url
-    except ClientError as e:
-        logger.error(f"Error generating presigned URL: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error generating S3 access URL")
-
-def extract_s3_details_from_url(url: str) -> tuple[str, str]:
-    """Extract bucket and key from S3 URL"""
-    try:
-        parsed = urlparse(url)
-        # The bucket is the first part of the hostname
-        bucket = parsed.netloc.split('.')[0]
-        # Remove leading slash and everything after the question mark
-        key = parsed.path.lstrip('/').split('?')[0]
-        logger.info(f"Extracted bucket: {bucket}, key: {key}")
-        return bucket, key
-    except Exception as e:
-        logger.error(f"Failed to parse S3 URL: {str(e)}")
-        raise ValueError(f"Invalid S3 URL format: {str(e)}")
+# Extracted pages held for a slow streaming client before extraction waits for it
+STREAM_BUFFER_PAGES = int(os.getenv("STREAM_BUFFER_PAGES", "4"))
+# Documents of one batch request processed at the same time
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "1000"))
+# Limit on the uncompressed size of a zip archive member
+BATCH_MAX_ARCHIVE_MEMBER_BYTES = int(os.getenv("BATCH_MAX_ARCHIVE_MEMBER_BYTES", str(50 * 1024 * 1024)))
 
 def get_mime_type_from_filename(filename: str) -> str:
     """Determine MIME type from file extension."""
@@ -91,42 +95,497 @@ def get_mime_type_from_filename(filename: str) -> str:
     ext = os.path.splitext(filename.lower())[1]
     return extension_map.get(ext)
 
-async def check_pdf_pages(content: bytes) -> int:
-    """Check number of pages in a PDF document"""
+def open_processor(
+    document: SpooledDocument,
+    mime_type: str,
+    queue_timeout: Optional[float] = EXTRACTION_QUEUE_TIMEOUT,
+    **kwargs
+) -> Union[DocumentProcessor, WorkerProcessor]:
+    """Processor for a received document: in this process, or in an extraction worker when EXTRACTION_WORKERS is set"""
+    if EXTRACTION_POOL.workers > 0:
+        return WorkerProcessor(document, mime_type, queue_timeout=queue_timeout, **kwargs)
+    return DocumentProcessor.from_spooled(document, mime_type, **kwargs)
+
+# Raised while estimating when the server, not the document, is the problem; mapped by to_http_exception
+UNAVAILABLE_ERRORS = (
+    ExtractionPoolBusy, ExtractionWorkerCrashed, ProcessingCancelled, OCRPoolBusy, DocumentTooExpensive, CostBudgetBusy
+)
+
+def estimate_cost(processor: DocumentProcessor) -> Dict[str, Any]:
+    """Predict the CPU seconds and memory extracting a document will take"""
     try:
-        pdf_file = BytesIO(content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        return len(pdf_reader.pages)
+        with stage('estimate', mime_type=processor.mime_type):
+            features = processor.cost_features()
+    except UNAVAILABLE_ERRORS:
+        # Capacity or worker failures, not a problem with the document
+        raise
     except Exception as e:
-        logger.error(f"Error checking PDF pages: {str(e)}")
+        logger.error(f"Error estimating document cost: {str(e)}")
         raise HTTPException(
             status_code=400,
-            detail="Unable to read PDF document"
+            detail="Unable to read PDF document" if processor.mime_type == 'application/pdf' else "Unable to read document"
         )
+    estimate = COST_MODEL.estimate(features)
+    logger.info(f"Predicted cost: {estimate['cpu_seconds']} CPU seconds, {estimate['memory_mb']} MB")
+    return estimate
+
+def extraction_key(processor: DocumentProcessor) -> str:
+    """Result cache key: the document's bytes and every setting that changes its extraction"""
+    return cache_key(processor.file_bytes, processor.mime_type, extraction_settings(), processor.ocr_policy.settings())
+
+def cached_extraction(key: str) -> Optional[Dict[str, Any]]:
+    """A cached result, served before the document is parsed, estimated or admitted"""
+    extraction = RESULT_CACHE.get(key)
+    if extraction is None:
+        return None
+    logger.info("Serving cached extraction result")
+    return {**extraction, "cost": {"predicted": None, "actual": None}}
+
+def run_extraction(
+    processor: DocumentProcessor,
+    estimate: Dict[str, Any],
+    key: str,
+    api_key: Optional[str] = None
+) -> Dict[str, Any]:
+    """Extract text and links and cache the result under key.
+
+    Call it once the predicted cost has been admitted; the response reports the predicted and actual cost.
+    """
+    with measure_cost() as measured:
+        extracted_text, method_used = processor.process()
+    actual = actual_cost(measured, processor.ocr_stats, processor.worker_cpu_seconds)
+    COST_STATS.record(processor.mime_type, estimate, actual)
+    record_extraction(processor.mime_type, method_used.value, processor.page_methods, measured['wall_seconds'])
+
+    extraction = {
+        "extraction_method": method_used.value,
+        "page_methods": processor.page_methods,
+        "ocr_tiers": processor.ocr_stats,
+        "extracted_text": extracted_text,
+        "links": processor.extract_links()
+    }
+    RESULT_CACHE.set(key, extraction)
+    return {**extraction, "cost": {"predicted": estimate, "actual": actual}}
+
+def run_extraction_job(payload: Dict[str, Any], cancel_event: threading.Event) -> Dict[str, Any]:
+    """Job handler: extract a queued document, stopping early if the job is cancelled or times out"""
+    # Jobs wait for a free extraction worker as long as it takes, like they wait for cost budget
+    with open_processor(
+        payload['document'], payload['mime_type'], queue_timeout=None, cancel_event=cancel_event,
+        ocr_policy=payload['ocr_policy']
+    ) as processor:
+        key = extraction_key(processor)
+        extraction = cached_extraction(key)
+        if extraction is not None:
+            return extraction
+        estimate = COST_MODEL.estimate(processor.cost_features())
+        # Job threads are bounded by JOB_WORKERS, so they can block while waiting for budget
+        with COST_BUDGET.admit(estimate, payload['api_key'], timeout=None, cancel_event=cancel_event, job=True):
+            return run_extraction(processor, estimate, key, payload['api_key'])
+
+def release_job_payload(payload: Dict[str, Any]):
+    """Delete the spooled document once its job has run or was skipped"""
+    payload['document'].close()
+
+job_manager = JobManager(run_extraction_job, release=release_job_payload)
+
+def runtime_gauges() -> List[Tuple[str, str, Dict[str, str], float]]:
+    """Queue depths, worker utilization, budget in use and cache hit ratios, read at scrape time"""
+    ocr = OCR_POOL.stats()
+    budget = COST_BUDGET.stats()
+    extraction = EXTRACTION_POOL.stats()
+    gauges = [
+        ("docprocessor_jobs_queued", "Jobs waiting for a job worker", {}, job_manager.queue_depth),
+        ("docprocessor_jobs_running", "Jobs being processed", {}, job_manager.running),
+        ("docprocessor_ocr_workers", "OCR worker processes", {}, ocr['workers']),
+        ("docprocessor_ocr_pages_in_flight", "Pages submitted to OCR workers and not yet finished", {}, ocr['pages_in_flight']),
+        (
+            "docprocessor_ocr_worker_utilization", "Share of OCR workers busy with a page", {},
+            ocr['pages_in_flight'] / ocr['workers'] if ocr['workers'] > 0 else 0.0
+        ),
+        ("docprocessor_ocr_active_documents", "Documents admitted to the OCR pool", {}, ocr['active_documents']),
+        ("docprocessor_extraction_workers", "Extraction worker processes running or starting", {}, extraction['started']),
+        ("docprocessor_extraction_workers_busy", "Extraction workers holding a document", {}, extraction['busy']),
+        ("docprocessor_cost_cpu_seconds_in_flight", "Predicted CPU seconds of admitted documents", {}, budget['cpu_seconds_in_flight']),
+        ("docprocessor_cost_memory_mb_in_flight", "Predicted memory of admitted documents", {}, budget['memory_mb_in_flight']),
+        ("docprocessor_cost_queued", "Requests waiting for cost budget", {}, budget['queued']),
+        ("docprocessor_cost_admitted", "Requests holding cost budget", {}, budget['admitted']),
+    ]
+    for name, cache in (("documents", RESULT_CACHE), ("pages", PAGE_CACHE)):
+        gauges.append((
+            "docprocessor_cache_hit_ratio", "Cache hits per lookup since startup", {"cache": name},
+            cache.stats()['hit_rate']
+        ))
+    return gauges
 
-async def process_with_timeout(processor: DocumentProcessor) -> tuple:
-    """Process document with timeout"""
+def runtime_counters() -> List[Tuple[str, str, Dict[str, str], float]]:
+    """Cache lookups and extraction worker restarts since startup, read at scrape time"""
+    extraction = EXTRACTION_POOL.stats()
+    counters = []
+    for reason in ('recycled', 'killed', 'crashed'):
+        counters.append((
+            "docprocessor_extraction_worker_restarts_total", "Extraction workers replaced since startup, by reason",
+            {"reason": reason}, extraction[reason]
+        ))
+    for name, cache in (("documents", RESULT_CACHE), ("pages", PAGE_CACHE)):
+        stats = cache.stats()
+        counters.append(("docprocessor_cache_hits_total", "Cache hits since startup", {"cache": name}, stats['hits']))
+        counters.append(("docprocessor_cache_misses_total", "Cache misses since startup", {"cache": name}, stats['misses']))
+    return counters
+
+register_gauges(runtime_gauges)
+register_counters(runtime_counters)
+
+def release_when_done(task: asyncio.Future, reservation: Reservation):
+    """Hold a cost reservation until an extraction thread has really finished, not just its awaiting request"""
+    def done(task: asyncio.Future):
+        COST_BUDGET.release(reservation)
+        # Retrieved here, so a failure after the request has given up is not reported as unhandled
+        if not task.cancelled():
+            task.exception()
+    task.add_done_callback(done)
+
+async def process_with_timeout(
+    processor: DocumentProcessor,
+    estimate: Dict[str, Any],
+    key: str,
+    api_key: Optional[str] = None
+) -> Dict[str, Any]:
+    """Process document with timeout.
+
+    The request queues for cost budget on the event loop; the budget is held until the
+    extraction thread has finished, even when the request times out or is cancelled first.
+    """
+    deadline = time.monotonic() + MAX_PROCESSING_TIME
     try:
+        reservation = await asyncio.wait_for(
+            COST_BUDGET.acquire(estimate, api_key, cancel_event=processor.cancel_event), timeout=MAX_PROCESSING_TIME
+        )
         # Create task for processing
-        task = asyncio.create_task(asyncio.to_thread(processor.process))
-        # Wait for task completion with timeout
-        extracted_text, method_used = await asyncio.wait_for(task, timeout=MAX_PROCESSING_TIME)
-        return extracted_text, method_used
+        task = asyncio.create_task(asyncio.to_thread(run_extraction, processor, estimate, key, api_key))
+        release_when_done(task, reservation)
+        # Wait for task completion with timeout; shielded, as cancelling would not stop the thread anyway
+        return await asyncio.wait_for(asyncio.shield(task), timeout=max(deadline - time.monotonic(), 0))
     except asyncio.TimeoutError:
         logger.error(f"Document processing timed out after {MAX_PROCESSING_TIME} seconds")
+        # Stop the worker thread at the next page instead of letting it run on
+        processor.cancel()
         raise HTTPException(
             status_code=524,  # Using 524 to match the error code you're seeing
             detail=f"The request took too long to process and exceeded the {MAX_PROCESSING_TIME} second timeout limit. Please try with a smaller document or contact support if this persists."
         )
+    except asyncio.CancelledError:
+        # Client disconnect, a cancelled batch or shutdown: nothing will read the result
+        processor.cancel()
+        raise
+
+async def stream_pages(
+    processor: DocumentProcessor,
+    cost: Dict[str, Any],
+    api_key: Optional[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run iter_pages in a worker thread and yield each page record as soon as it is extracted.
+
+    Extraction starts once cost['predicted'] fits the budget; cost['actual'] is filled in when
+    it completes. The whole stream is bounded by MAX_PROCESSING_TIME; on timeout, failure or
+    client disconnect the processor is cancelled and stops at the next page.
+    """
+    loop = asyncio.get_running_loop()
+    # Bounded, so extraction runs at most STREAM_BUFFER_PAGES pages ahead of the client
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_BUFFER_PAGES)
+    finished = object()
+
+    def put(item):
+        """Block the worker thread until the consumer has room; give up once the stream is cancelled"""
+        if processor.cancel_event.is_set():
+            raise ProcessingCancelled()
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except concurrent.futures.TimeoutError:
+                if processor.cancel_event.is_set():
+                    future.cancel()
+                    raise ProcessingCancelled()
+
+    def produce():
+        try:
+            with measure_cost() as measured:
+                for page in processor.iter_pages():
+                    page['method'] = page['method'].value
+                    put(page)
+            cost['actual'] = actual_cost(measured, processor.ocr_stats, processor.worker_cpu_seconds)
+            COST_STATS.record(processor.mime_type, cost['predicted'], cost['actual'])
+            method = processor.extraction_method
+            record_extraction(
+                processor.mime_type, method and method.value, processor.page_methods, measured['wall_seconds']
+            )
+            outcome = finished
+        except Exception as e:
+            outcome = e
+        try:
+            put(outcome)
+        except ProcessingCancelled:
+            # The consumer has gone; nothing is waiting for the outcome
+            pass
+
+    deadline = time.monotonic() + MAX_PROCESSING_TIME
+    reservation = await COST_BUDGET.acquire(cost['predicted'], api_key, cancel_event=processor.cancel_event)
+    producer = asyncio.create_task(asyncio.to_thread(produce))
+    release_when_done(producer, reservation)
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            item = await asyncio.wait_for(queue.get(), timeout=remaining)
+            if item is finished:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    except asyncio.TimeoutError:
+        logger.error(f"Streaming extraction timed out after {MAX_PROCESSING_TIME} seconds")
+        raise
+    finally:
+        processor.cancel()
+        # Let the producer observe the cancellation before the processor is closed
+        await asyncio.shield(producer)
+
+async def receive_document(file: Optional[UploadFile], url: Optional[str]) -> Tuple[SpooledDocument, str, str, str]:
+    """Spool an upload or download and return (document, filename, content type, detected MIME type)"""
+    document, filename, content_type = await fetch_document(file, url)
+    try:
+        return document, filename, content_type, detect_mime_type(document, filename)
+    except Exception:
+        document.close()
+        raise
+
+async def fetch_document(file: Optional[UploadFile], url: Optional[str]) -> Tuple[SpooledDocument, str, str]:
+    """Spool an upload or download to disk once and return (document, filename, content type).
+
+    The caller owns the document and must close it.
+    """
+    # Handle URL input
+    if url:
+        logger.info(f"Processing URL: {url}")
+        with stage('download', source='url'):
+            document, filename, content_type = await fetch_url(url, sniff=sniff_document)
+    else:
+        await file.seek(0)
+        with stage('download', source='upload'):
+            document = await asyncio.to_thread(SpooledDocument.from_file, file.file, suffix_for(file.filename))
+        filename = file.filename
+        content_type = file.content_type
+
+    return document, filename, content_type
+
+def sniff_document(head: bytes, filename: str):
+    """Reject a download from its first bytes when it is clearly not a supported document"""
+    import magic
+
+    mime_type = magic.from_buffer(head, mime=True)
+    # Generic types may still resolve to a supported type once the whole file or filename is considered
+    if mime_type in SUPPORTED_MIME_TYPES or mime_type in ('application/octet-stream', 'application/zip'):
+        return
+    raise HTTPException(
+        status_code=400,
+        detail=f"Unsupported file type: {mime_type}. Supported types: {', '.join(SUPPORTED_MIME_TYPES)}"
+    )
+
+def detect_mime_type(document: SpooledDocument, filename: str) -> str:
+    """Sniff the MIME type and reject unsupported documents"""
+    import magic
+
+    # Verify file type; libmagic reads only the parts of the file it needs
+    with stage('sniff'):
+        mime_type = magic.from_file(document.path, mime=True)
+    logger.info(f"Detected MIME type: {mime_type}")
+    
+    if mime_type == 'application/octet-stream':
+        filename_mime_type = get_mime_type_from_filename(filename)
+        if filename_mime_type and filename_mime_type in SUPPORTED_MIME_TYPES:
+            mime_type = filename_mime_type
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported file type: {mime_type}. Supported types: {', '.join(SUPPORTED_MIME_TYPES)}"
+            )
+    elif mime_type not in SUPPORTED_MIME_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {mime_type}. Supported types: {', '.join(SUPPORTED_MIME_TYPES)}"
+        )
+
+    return mime_type
+
+def get_ocr_policy(
+    ocr_mode: Optional[str],
+    ocr_min_confidence: Optional[float],
+    ocr_images: Optional[bool] = None
+) -> OCRPolicy:
+    """OCR policy from the optional request fields"""
+    try:
+        return OCRPolicy.from_request(ocr_mode, ocr_min_confidence, ocr_images)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def process_content(
+    document: SpooledDocument,
+    filename: str,
+    content_type: str,
+    ocr_policy: Optional[OCRPolicy] = None,
+    api_key: Optional[str] = None,
+    cancel_event: Optional[threading.Event] = None
+) -> Dict[str, Any]:
+    """Validate, extract and build the response for one received document.
+
+    Setting cancel_event (e.g. shared by the documents of a batch) stops the processor at the next page.
+    """
+    mime_type = detect_mime_type(document, filename)
+
+    # The document is parsed once and shared by the cost estimate, extraction and link extraction
+    with open_processor(document, mime_type, ocr_policy=ocr_policy, cancel_event=cancel_event) as processor:
+        # Cache hits skip parsing, the estimate and admission
+        key = await asyncio.to_thread(extraction_key, processor)
+        extraction = cached_extraction(key)
+        if extraction is None:
+            # Reject documents that are too expensive for this API key before any extraction work
+            estimate = await asyncio.to_thread(estimate_cost, processor)
+            COST_BUDGET.check(estimate, api_key)
+
+            # Process document with timeout
+            extraction = await process_with_timeout(processor, estimate, key, api_key)
+
+    return {
+        "filename": filename,
+        "content_type": content_type,
+        "detected_mime_type": mime_type,
+        **extraction
+    }
+
+def to_http_exception(e: Exception) -> HTTPException:
+    """Map a processing error to the HTTP error returned to the client"""
+    if isinstance(e, HTTPException):
+        # HTTP exceptions already have proper error details
+        return e
+    if isinstance(e, asyncio.TimeoutError):
+        logger.error("Processing timeout exceeded", exc_info=True)
+        return HTTPException(
+            status_code=524,
+            detail=f"The request took too long to process and exceeded the {MAX_PROCESSING_TIME} second timeout limit. Please try with a smaller document or contact support if this persists."
+        )
+    if isinstance(e, DocumentTooExpensive):
+        logger.error(f"Document rejected: {str(e)}")
+        return HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    if isinstance(e, CostBudgetBusy):
+        logger.error(f"Cost budget exhausted: {str(e)}")
+        return HTTPException(
+            status_code=503,
+            detail="The server is busy processing other documents. Please retry shortly.",
+            headers={"Retry-After": "5"}
+        )
+    if isinstance(e, ExtractionPoolBusy):
+        logger.error(f"Extraction workers busy: {str(e)}")
+        return HTTPException(
+            status_code=503,
+            detail="The server is busy processing other documents. Please retry shortly.",
+            headers={"Retry-After": "5"}
+        )
+    if isinstance(e, ExtractionWorkerCrashed):
+        logger.error(f"Extraction worker failed: {str(e)}")
+        return HTTPException(
+            status_code=500,
+            detail="The extraction worker processing this document failed. Please retry."
+        )
+    if isinstance(e, OCRPoolBusy):
+        logger.error(f"OCR pool busy: {str(e)}")
+        return HTTPException(
+            status_code=503,
+            detail="The server is busy processing other documents. Please retry shortly.",
+            headers={"Retry-After": "5"}
+        )
+    if isinstance(e, ValueError):
+        logger.error(f"Validation error: {str(e)}", exc_info=True)
+        return HTTPException(
+            status_code=400,
+            detail=f"Validation error: {str(e)}"
+        )
+    if isinstance(e, FetchError):
+        logger.error(f"Download failed: {e.detail}")
+        return HTTPException(
+            status_code=e.status_code,
+            detail=e.detail
+        )
+    logger.error(f"Error processing document: {str(e)}", exc_info=True)
+    error_detail = str(e) if str(e) else "An unexpected error occurred during document processing"
+    return HTTPException(
+        status_code=500,
+        detail=error_detail
+    )
 
 @app.get("/")
 async def root() -> Dict[str, str]:
     return {"status": "running"}
 
+@app.get("/healthz")
+async def healthz() -> Dict[str, str]:
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz() -> JSONResponse:
+    """Readiness: 200 once every warm-up backend is loaded and still healthy, 503 otherwise"""
+    backends = READINESS.report()
+    # With extraction workers, LibreOffice runs in the workers, which are replaced when they fail
+    libreoffice_here = EXTRACTION_POOL.workers <= 0
+    if (
+        libreoffice_here and 'libreoffice' in backends and backends['libreoffice']['status'] == 'ready'
+        and not OFFICE_POOL.is_ready()
+    ):
+        backends['libreoffice'] = {'status': 'failed', 'error': "No healthy LibreOffice instance"}
+    ready = all(backend['status'] == 'ready' for backend in backends.values()) and job_manager.started
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not ready", "backends": backends}
+    )
+
+@app.get("/cache/stats")
+async def cache_stats(api_key: str = Security(get_api_key)) -> Dict[str, Any]:
+    return {"documents": RESULT_CACHE.stats(), "pages": PAGE_CACHE.stats()}
+
+@app.get("/ocr/stats")
+async def ocr_stats(api_key: str = Security(get_api_key)) -> Dict[str, Any]:
+    """Pages, OCR seconds and mean word confidence per OCR tier since startup"""
+    return OCR_TIER_STATS.summary()
+
+@app.get("/metrics")
+async def prometheus_metrics() -> PlainTextResponse:
+    """Stage histograms, extraction histograms by MIME type and method, and runtime gauges for Prometheus"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cost/stats")
+async def cost_stats(api_key: str = Security(get_api_key)) -> Dict[str, Any]:
+    """Budget in use, predicted versus actual CPU seconds per document type, and the model coefficients"""
+    return {
+        "budget": COST_BUDGET.stats(),
+        "documents": COST_STATS.summary(),
+        "limits": COST_BUDGET.limits_for(api_key),
+        "model": COST_MODEL.coefficients,
+    }
+
 @app.post("/process-document/")
 async def process_document(
     file: Optional[UploadFile] = File(None),
     url: Optional[str] = Form(None),
+    ocr_mode: Optional[str] = Form(None),
+    ocr_min_confidence: Optional[float] = Form(None),
+    ocr_images: Optional[bool] = Form(None),
     api_key: str = Security(get_api_key)
 ) -> Dict[str, Any]:
     logger.info(f"Received request - file: {file}, url: {url}")
@@ -137,101 +596,264 @@ async def process_document(
             detail="Either file or url must be provided"
         )
     
+    ocr_policy = get_ocr_policy(ocr_mode, ocr_min_confidence, ocr_images)
     try:
-        # Handle URL input
-        if url:
-            logger.info(f"Processing URL: {url}")
-            async with httpx.AsyncClient(
-                verify=False,
-                follow_redirects=True,
-                headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Accept': '*/*'
-                }
-            ) as client:
-                response = await client.get(url)
-                logger.info(f"URL response status: {response.status_code}")
-                if response.status_code != 200:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Could not download file from URL. Status code: {response.status_code}"
-                    )
-                content = response.content
-                filename = url.split('/')[-1].split('?')[0]
-                content_type = response.headers.get('content-type', '')
-        else:
-            content = await file.read()
-            filename = file.filename
-            content_type = file.content_type
-
-        # Verify file type
-        mime_type = magic.from_buffer(content, mime=True)
-        logger.info(f"Detected MIME type: {mime_type}")
-        
-        # Check PDF page count if it's a PDF
-        if mime_type == 'application/pdf' or (mime_type == 'application/octet-stream' and filename.lower().endswith('.pdf')):
-            num_pages = await check_pdf_pages(content)
-            if num_pages > MAX_PAGES:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"PDF exceeds maximum allowed pages ({MAX_PAGES})"
-                )
-
-        if mime_type == 'application/octet-stream':
-            filename_mime_type = get_mime_type_from_filename(filename)
-            if filename_mime_type and filename_mime_type in SUPPORTED_MIME_TYPES:
-                mime_type = filename_mime_type
-            else:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Unsupported file type: {mime_type}. Supported types: {', '.join(SUPPORTED_MIME_TYPES)}"
-                )
-        elif mime_type not in SUPPORTED_MIME_TYPES:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported file type: {mime_type}. Supported types: {', '.join(SUPPORTED_MIME_TYPES)}"
-            )
-
-        # Process document with timeout
-        processor = DocumentProcessor(content, mime_type)
-        extracted_text, method_used = await process_with_timeout(processor)
-        
-        result = {
-            "filename": filename,
-            "content_type": content_type,
-            "detected_mime_type": mime_type,
-            "extraction_method": method_used.value,
-            "extracted_text": extracted_text,
-            "links": processor.extract_links() if mime_type == 'application/pdf' else []
-        }
+        document, filename, content_type = await fetch_document(file, url)
+        with document:
+            result = await process_content(document, filename, content_type, ocr_policy, api_key)
         logger.info("Processing completed successfully")
         return result
-        
-    except HTTPException as he:
-        # Re-raise HTTP exceptions as they already have proper error details
-        raise he
-    except asyncio.TimeoutError:
-        logger.error("Processing timeout exceeded", exc_info=True)
+    except Exception as e:
+        raise to_http_exception(e)
+
+def format_event(record: Dict[str, Any], sse: bool) -> str:
+    """Encode a stream record as an NDJSON line or a Server-Sent Event named after its type"""
+    data = json.dumps(record)
+    if sse:
+        return f"event: {record['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+@app.post("/process-document/stream")
+async def process_document_stream(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    url: Optional[str] = Form(None),
+    ocr_mode: Optional[str] = Form(None),
+    ocr_min_confidence: Optional[float] = Form(None),
+    ocr_images: Optional[bool] = Form(None),
+    api_key: str = Security(get_api_key)
+) -> StreamingResponse:
+    """Stream one record per page as soon as it is extracted, then a summary record with the links.
+
+    Responds with Server-Sent Events when the client accepts text/event-stream, NDJSON otherwise.
+    """
+    logger.info(f"Received streaming request - file: {file}, url: {url}")
+
+    if not file and not url:
         raise HTTPException(
-            status_code=524,
-            detail=f"The request took too long to process and exceeded the {MAX_PROCESSING_TIME} second timeout limit. Please try with a smaller document or contact support if this persists."
+            status_code=400,
+            detail="Either file or url must be provided"
+        )
+
+    ocr_policy = get_ocr_policy(ocr_mode, ocr_min_confidence, ocr_images)
+    # Problems found before the first page (download, type, cost limit) are still plain HTTP errors
+    try:
+        document, filename, content_type, mime_type = await receive_document(file, url)
+    except Exception as e:
+        raise to_http_exception(e)
+    processor = open_processor(document, mime_type, ocr_policy=ocr_policy)
+    try:
+        estimate = await asyncio.to_thread(estimate_cost, processor)
+        COST_BUDGET.check(estimate, api_key)
+    except Exception as e:
+        processor.close()
+        document.close()
+        raise to_http_exception(e)
+
+    sse = 'text/event-stream' in request.headers.get('accept', '')
+
+    async def stream() -> AsyncIterator[str]:
+        start = time.perf_counter()
+        page_count = 0
+        cost = {"predicted": estimate, "actual": None}
+        try:
+            async for page in stream_pages(processor, cost, api_key):
+                page_count += 1
+                yield format_event({"type": "page", **page}, sse)
+            links = processor.extract_links()
+            yield format_event({
+                "type": "summary",
+                "filename": filename,
+                "content_type": content_type,
+                "detected_mime_type": mime_type,
+                "extraction_method": processor.extraction_method.value,
+                "page_methods": processor.page_methods,
+                "page_count": page_count,
+                "ocr_tiers": processor.ocr_stats,
+                "links": links,
+                "cost": cost,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1)
+            }, sse)
+            logger.info("Streaming completed successfully")
+        except Exception as e:
+            # The status line has already been sent, so failures are reported in-band
+            error = to_http_exception(e)
+            yield format_event({"type": "error", "status_code": error.status_code, "detail": error.detail}, sse)
+        finally:
+            processor.close()
+            document.close()
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type)
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: Optional[UploadFile] = File(None),
+    url: Optional[str] = Form(None),
+    priority: int = Form(DEFAULT_PRIORITY),
+    ocr_mode: Optional[str] = Form(None),
+    ocr_min_confidence: Optional[float] = Form(None),
+    ocr_images: Optional[bool] = Form(None),
+    api_key: str = Security(get_api_key)
+) -> JSONResponse:
+    """Queue a document for asynchronous processing; lower priority values run first"""
+    if not file and not url:
+        raise HTTPException(
+            status_code=400,
+            detail="Either file or url must be provided"
         )
-    except ValueError as ve:
-        logger.error(f"Validation error: {str(ve)}", exc_info=True)
+
+    ocr_policy = get_ocr_policy(ocr_mode, ocr_min_confidence, ocr_images)
+    try:
+        document, filename, content_type, mime_type = await receive_document(file, url)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error receiving document: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=400,
-            detail=f"Validation error: {str(ve)}"
+            detail=str(e) or "Could not read the document"
         )
-    except ClientError as ce:
-        logger.error(f"AWS S3 error: {str(ce)}", exc_info=True)
+
+    try:
+        job = job_manager.submit(
+            {"document": document, "mime_type": mime_type, "ocr_policy": ocr_policy, "api_key": api_key},
+            {"filename": filename, "content_type": content_type, "detected_mime_type": mime_type},
+            priority=priority
+        )
+    except JobQueueFull as qf:
+        logger.error(str(qf))
+        document.close()
         raise HTTPException(
-            status_code=500,
-            detail=f"S3 operation failed: {str(ce)}"
+            status_code=429,
+            detail="Too many documents are waiting to be processed. Please retry shortly.",
+            headers={"Retry-After": "10"}
         )
-    except Exception as e:
-        logger.error(f"Error processing document: {str(e)}", exc_info=True)
-        error_detail = str(e) if str(e) else "An unexpected error occurred during document processing"
+    logger.info(f"Queued job {job['id']} with priority {priority}")
+    return JSONResponse(status_code=202, content=job)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, api_key: str = Security(get_api_key)) -> Dict[str, Any]:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, api_key: str = Security(get_api_key)) -> Dict[str, Any]:
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def is_zip_archive(file: UploadFile) -> bool:
+    """Zip archives in a batch are expanded; DOCX, XLSX and other Office files are zips too, so the extension decides.
+
+    Clients often send Office files as application/zip, so that content type only counts without an extension.
+    """
+    filename = (file.filename or '').lower()
+    extension = os.path.splitext(filename)[1]
+    if extension == '.zip':
+        return True
+    if extension:
+        return False
+    return file.content_type in ('application/zip', 'application/x-zip-compressed')
+
+def spool_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> SpooledDocument:
+    """Decompress an archive member straight to a spooled file"""
+    with archive.open(info) as member:
+        return SpooledDocument.from_file(member, suffix_for(info.filename))
+
+def archive_sources(file: UploadFile) -> List[Tuple[str, Callable[[], Awaitable[Tuple[SpooledDocument, str, str]]]]]:
+    """List the documents in an uploaded zip archive without reading their contents yet"""
+    archive = zipfile.ZipFile(file.file)
+    sources = []
+    for info in archive.infolist():
+        name = info.filename
+        if info.is_dir() or name.startswith('__MACOSX/') or os.path.basename(name).startswith('.'):
+            continue
+
+        async def read_member(info=info):
+            if info.file_size > BATCH_MAX_ARCHIVE_MEMBER_BYTES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Archive member exceeds {BATCH_MAX_ARCHIVE_MEMBER_BYTES} bytes"
+                )
+            document = await asyncio.to_thread(spool_member, archive, info)
+            return document, os.path.basename(info.filename), ''
+
+        sources.append((name, read_member))
+    return sources
+
+@app.post("/process-documents/batch")
+async def process_documents_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    urls: Optional[List[str]] = Form(None),
+    ocr_mode: Optional[str] = Form(None),
+    ocr_min_confidence: Optional[float] = Form(None),
+    ocr_images: Optional[bool] = Form(None),
+    api_key: str = Security(get_api_key)
+) -> StreamingResponse:
+    """Process many files, URLs or zip archives, streaming one NDJSON record per document as it finishes"""
+    sources = []
+    for file in files or []:
+        if is_zip_archive(file):
+            try:
+                sources.extend(archive_sources(file))
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"Invalid zip archive: {file.filename}")
+        else:
+            sources.append((file.filename, lambda file=file: fetch_document(file, None)))
+    for url in urls or []:
+        sources.append((url, lambda url=url: fetch_document(None, url)))
+
+    if not sources:
         raise HTTPException(
-            status_code=500,
-            detail=error_detail
-        )
\ No newline at end of file
+            status_code=400,
+            detail="At least one file, url or zip archive must be provided"
+        )
+    if len(sources) > BATCH_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds maximum allowed documents ({BATCH_MAX_DOCUMENTS})"
+        )
+
+    ocr_policy = get_ocr_policy(ocr_mode, ocr_min_confidence, ocr_images)
+    logger.info(f"Received batch of {len(sources)} documents")
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    # Shared by every document's processor, so one set() stops all of their extraction threads
+    cancel_event = threading.Event()
+
+    async def run(index: int, name: str, source) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                document, filename, content_type = await source()
+                with document:
+                    result = await process_content(
+                        document, filename, content_type, ocr_policy, api_key, cancel_event=cancel_event
+                    )
+                return {"index": index, "source": name, "status": "ok", **result}
+            except Exception as e:
+                # A failed document is reported in its record and does not abort the batch
+                error = to_http_exception(e)
+                return {
+                    "index": index,
+                    "source": name,
+                    "status": "error",
+                    "status_code": error.status_code,
+                    "detail": error.detail
+                }
+
+    async def stream() -> AsyncIterator[str]:
+        tasks = [asyncio.create_task(run(index, name, source)) for index, (name, source) in enumerate(sources)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield json.dumps(await task) + "\n"
+        finally:
+            # Stop outstanding work if the client goes away: cancelling a task only abandons the
+            # await, the processors have to be told to stop extracting and release their budget
+            cancel_event.set()
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,407 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from app.utils.ocr_pool import OCR_POOL, OCR_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Calibrated coefficients: the report written by `python -m benchmarks calibrate` (empty uses the defaults)
+COST_MODEL_PATH = os.getenv("COST_MODEL_PATH", "")
+# Predicted work admitted at the same time across all requests; further requests queue
+COST_BUDGET_CPU_SECONDS = float(os.getenv("COST_BUDGET_CPU_SECONDS", str(max(OCR_WORKERS, 1) * 60)))
+COST_BUDGET_MEMORY_MB = float(os.getenv("COST_BUDGET_MEMORY_MB", "4096"))
+# Seconds a request waits for budget before it is rejected
+COST_QUEUE_TIMEOUT = float(os.getenv("COST_QUEUE_TIMEOUT", "30"))
+# Limits for every API key; COST_KEY_LIMITS overrides them per key as JSON,
+# e.g. '{"<api key>": {"max_document_cpu_seconds": 600, "max_concurrent_cpu_seconds": 120}}'
+COST_MAX_DOCUMENT_CPU_SECONDS = float(os.getenv("COST_MAX_DOCUMENT_CPU_SECONDS", "120"))
+COST_MAX_DOCUMENT_MEMORY_MB = float(os.getenv("COST_MAX_DOCUMENT_MEMORY_MB", "2048"))
+# Jobs do not hold a connection open, so they may be much larger
+COST_MAX_JOB_CPU_SECONDS = float(os.getenv("COST_MAX_JOB_CPU_SECONDS", "1800"))
+COST_MAX_CONCURRENT_CPU_SECONDS = float(os.getenv("COST_MAX_CONCURRENT_CPU_SECONDS", str(COST_BUDGET_CPU_SECONDS)))
+COST_KEY_LIMITS = os.getenv("COST_KEY_LIMITS", "")
+
+# CPU seconds per unit of each feature; calibration replaces them with fitted values
+CPU_FEATURES = ('documents', 'text_pages', 'ocr_megapixels', 'xml_megabytes', 'conversions')
+DEFAULT_COEFFICIENTS = {
+    'documents': 0.05,
+    'text_pages': 0.01,
+    'ocr_megapixels': 0.4,
+    'xml_megabytes': 0.5,
+    'conversions': 3.0,
+    # Tiered OCR renders every page twice in the worst case
+    'tiered_ocr_factor': 1.6,
+    # Memory: a fixed overhead, the document itself and the largest decoded page
+    'memory_mb': 50.0,
+    'memory_mb_per_file_megabyte': 1.0,
+    'memory_mb_per_page_megapixel': 3.0,
+}
+
+class DocumentTooExpensive(Exception):
+    """Raised when a document's predicted cost exceeds the limits of the requesting API key"""
+
+class CostBudgetBusy(Exception):
+    """Raised when the cost budget cannot admit a document in time"""
+
+def empty_features() -> Dict[str, float]:
+    return {
+        'documents': 1,
+        'pages': 0,
+        'text_pages': 0,
+        'ocr_megapixels': 0.0,
+        'max_page_megapixels': 0.0,
+        'xml_megabytes': 0.0,
+        'conversions': 0,
+        'file_megabytes': 0.0,
+        'tiered': 0,
+    }
+
+class CostModel:
+    """Linear model predicting the CPU seconds and memory of extracting a document from cheap features"""
+
+    def __init__(self, coefficients: Optional[Dict[str, float]] = None):
+        self.coefficients = {**DEFAULT_COEFFICIENTS, **(coefficients or {})}
+
+    @classmethod
+    def load(cls, path: str) -> "CostModel":
+        """Model from a calibration report (or a bare coefficients file); defaults if it cannot be read"""
+        if not path:
+            return cls()
+        try:
+            with open(path) as model_file:
+                data = json.load(model_file)
+            data = data.get('calibration', data)
+            return cls(data.get('coefficients', data))
+        except Exception as e:
+            logger.error(f"Could not load cost model from {path}, using defaults: {str(e)}")
+            return cls()
+
+    def cpu_features(self, features: Dict[str, float]) -> Dict[str, float]:
+        """The features the CPU estimate is linear in, with tiered OCR scaled up"""
+        values = {name: float(features.get(name, 0)) for name in CPU_FEATURES}
+        if features.get('tiered'):
+            values['ocr_megapixels'] *= self.coefficients['tiered_ocr_factor']
+        return values
+
+    def estimate(self, features: Dict[str, float]) -> Dict[str, Any]:
+        coefficients = self.coefficients
+        cpu_seconds = sum(coefficients[name] * value for name, value in self.cpu_features(features).items())
+        memory_mb = (
+            coefficients['memory_mb']
+            + coefficients['memory_mb_per_file_megabyte'] * features.get('file_megabytes', 0)
+            + coefficients['memory_mb_per_page_megapixel'] * features.get('max_page_megapixels', 0)
+        )
+        return {
+            'cpu_seconds': round(cpu_seconds, 3),
+            'memory_mb': round(memory_mb, 1),
+            'features': features,
+        }
+
+def _parse_key_limits(value: str) -> Dict[str, Dict[str, float]]:
+    if not value:
+        return {}
+    try:
+        return {key: dict(limits) for key, limits in json.loads(value).items()}
+    except Exception as e:
+        logger.error(f"Ignoring invalid COST_KEY_LIMITS: {str(e)}")
+        return {}
+
+class Reservation:
+    """A document's place in the cost budget: queued under a ticket, then holding its predicted cost"""
+
+    def __init__(self, ticket: int, cpu_seconds: float, memory_mb: float, key: str, key_limit: float, wake: Callable[[], None]):
+        self.ticket = ticket
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.key = key
+        self.key_limit = key_limit
+        self.wake = wake
+        self.granted = False
+        self.released = False
+
+class CostBudget:
+    """Admits documents while their combined predicted cost fits the global and per-key budgets.
+
+    A document whose prediction exceeds its key's per-document limits is rejected outright.
+    Otherwise it queues under a ticket until the CPU seconds and memory already admitted leave
+    room for it. Waiters are admitted in ticket order; one held back only by its own key's
+    concurrency limit does not hold up the others. A document is always admitted when nothing
+    else is running, so an estimate larger than the whole budget cannot wait forever.
+
+    Request handlers wait with ``await acquire()`` on the event loop, so queued requests do not
+    tie up executor threads; job threads use the blocking ``admit()``.
+    """
+
+    def __init__(
+        self,
+        cpu_seconds: float = COST_BUDGET_CPU_SECONDS,
+        memory_mb: float = COST_BUDGET_MEMORY_MB,
+        key_limits: Optional[Dict[str, Dict[str, float]]] = None
+    ):
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.key_limits = _parse_key_limits(COST_KEY_LIMITS) if key_limits is None else key_limits
+        self._lock = threading.Lock()
+        self._tickets = itertools.count()
+        # Queued reservations in ticket order
+        self._waiting: Dict[int, Reservation] = {}
+        self._cpu_in_flight = 0.0
+        self._memory_in_flight = 0.0
+        self._key_in_flight: Dict[str, float] = {}
+        self._admitted = 0
+
+    def limits_for(self, api_key: Optional[str]) -> Dict[str, float]:
+        return {
+            'max_document_cpu_seconds': COST_MAX_DOCUMENT_CPU_SECONDS,
+            'max_document_memory_mb': COST_MAX_DOCUMENT_MEMORY_MB,
+            'max_job_cpu_seconds': COST_MAX_JOB_CPU_SECONDS,
+            'max_concurrent_cpu_seconds': COST_MAX_CONCURRENT_CPU_SECONDS,
+            **self.key_limits.get(api_key or '', {}),
+        }
+
+    def check(self, estimate: Dict[str, Any], api_key: Optional[str] = None, job: bool = False):
+        """Reject a document whose predicted cost is over the per-document limits"""
+        limits = self.limits_for(api_key)
+        max_cpu_seconds = limits['max_job_cpu_seconds'] if job else limits['max_document_cpu_seconds']
+        if estimate['cpu_seconds'] > max_cpu_seconds:
+            raise DocumentTooExpensive(
+                f"Document is predicted to need {estimate['cpu_seconds']:.1f} CPU seconds, "
+                f"more than the allowed {max_cpu_seconds:g}"
+            )
+        if estimate['memory_mb'] > limits['max_document_memory_mb']:
+            raise DocumentTooExpensive(
+                f"Document is predicted to need {estimate['memory_mb']:.0f} MB of memory, "
+                f"more than the allowed {limits['max_document_memory_mb']:.0f}"
+            )
+
+    def _key_blocked(self, reservation: Reservation) -> bool:
+        key_in_flight = self._key_in_flight.get(reservation.key, 0.0)
+        return bool(key_in_flight) and key_in_flight + reservation.cpu_seconds > reservation.key_limit
+
+    def _fits(self, reservation: Reservation) -> bool:
+        if not self._admitted:
+            return True
+        return (
+            self._cpu_in_flight + reservation.cpu_seconds <= self.cpu_seconds
+            and self._memory_in_flight + reservation.memory_mb <= self.memory_mb
+        )
+
+    def _grant(self):
+        """Admit queued reservations in ticket order while they fit; call with the lock held"""
+        for ticket, reservation in list(self._waiting.items()):
+            if self._key_blocked(reservation):
+                continue
+            if not self._fits(reservation):
+                # Later tickets may not overtake one that is waiting for the global budget
+                break
+            del self._waiting[ticket]
+            self._admitted += 1
+            self._cpu_in_flight += reservation.cpu_seconds
+            self._memory_in_flight += reservation.memory_mb
+            self._key_in_flight[reservation.key] = self._key_in_flight.get(reservation.key, 0.0) + reservation.cpu_seconds
+            reservation.granted = True
+            reservation.wake()
+
+    def _enqueue(self, estimate: Dict[str, Any], api_key: Optional[str], job: bool, wake: Callable[[], None]) -> Reservation:
+        self.check(estimate, api_key, job)
+        key_limit = self.limits_for(api_key)['max_concurrent_cpu_seconds']
+        with self._lock:
+            reservation = Reservation(
+                next(self._tickets), estimate['cpu_seconds'], estimate['memory_mb'], api_key or '', key_limit, wake
+            )
+            self._waiting[reservation.ticket] = reservation
+            self._grant()
+        return reservation
+
+    def _leave(self, reservation: Reservation) -> bool:
+        """Take a queued reservation out of the queue; returns True if it was granted in the meantime"""
+        with self._lock:
+            if reservation.granted:
+                return True
+            del self._waiting[reservation.ticket]
+            # The leaver may have been holding later tickets back
+            self._grant()
+            return False
+
+    def _busy(self, cancel_event: Optional[threading.Event], deadline: Optional[float]) -> Optional[CostBudgetBusy]:
+        """The error to give up with, once the waiter is cancelled or its deadline has passed"""
+        if cancel_event is not None and cancel_event.is_set():
+            return CostBudgetBusy("Cancelled while waiting for the cost budget")
+        if deadline is not None and time.monotonic() >= deadline:
+            return CostBudgetBusy(
+                f"Cost budget exhausted ({self._cpu_in_flight:.0f} CPU seconds, "
+                f"{self._memory_in_flight:.0f} MB in progress)"
+            )
+        return None
+
+    @staticmethod
+    def _wait_seconds(deadline: Optional[float]) -> float:
+        # Wake up at least every second to notice cancellation
+        return 1.0 if deadline is None else max(min(deadline - time.monotonic(), 1.0), 0.0)
+
+    async def acquire(
+        self,
+        estimate: Dict[str, Any],
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = COST_QUEUE_TIMEOUT,
+        cancel_event: Optional[threading.Event] = None,
+        job: bool = False
+    ) -> Reservation:
+        """Wait on the event loop until the document's predicted cost fits; release() it when extraction ends.
+
+        Raises CostBudgetBusy after ``timeout`` seconds (None waits until ``cancel_event`` is set).
+        """
+        loop = asyncio.get_running_loop()
+        granted = asyncio.Event()
+
+        def wake():
+            # Usually called from the thread releasing another document
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(granted.set)
+
+        reservation = self._enqueue(estimate, api_key, job, wake)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while not reservation.granted:
+                busy = self._busy(cancel_event, deadline)
+                if busy is not None:
+                    raise busy
+                try:
+                    await asyncio.wait_for(granted.wait(), self._wait_seconds(deadline))
+                except asyncio.TimeoutError:
+                    pass
+        except CostBudgetBusy:
+            if self._leave(reservation):
+                return reservation
+            raise
+        except BaseException:
+            # Cancelled by the caller, e.g. its request timed out
+            if self._leave(reservation):
+                self.release(reservation)
+            raise
+        return reservation
+
+    def release(self, reservation: Reservation):
+        """Return a granted reservation's cost to the budget and admit whoever now fits"""
+        with self._lock:
+            if reservation.released:
+                return
+            reservation.released = True
+            self._admitted -= 1
+            self._cpu_in_flight -= reservation.cpu_seconds
+            self._memory_in_flight -= reservation.memory_mb
+            self._key_in_flight[reservation.key] -= reservation.cpu_seconds
+            if self._key_in_flight[reservation.key] <= 1e-9:
+                del self._key_in_flight[reservation.key]
+            self._grant()
+
+    @contextmanager
+    def admit(
+        self,
+        estimate: Dict[str, Any],
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = COST_QUEUE_TIMEOUT,
+        cancel_event: Optional[threading.Event] = None,
+        job: bool = False
+    ) -> Iterator[None]:
+        """Blocking form of acquire() for job threads: hold the document's predicted cost while it is extracted"""
+        granted = threading.Event()
+        reservation = self._enqueue(estimate, api_key, job, granted.set)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not reservation.granted:
+            busy = self._busy(cancel_event, deadline)
+            if busy is not None:
+                if not self._leave(reservation):
+                    raise busy
+                break
+            granted.wait(self._wait_seconds(deadline))
+        try:
+            yield
+        finally:
+            self.release(reservation)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'cpu_seconds': self.cpu_seconds,
+                'memory_mb': self.memory_mb,
+                'cpu_seconds_in_flight': round(self._cpu_in_flight, 3),
+                'memory_mb_in_flight': round(self._memory_in_flight, 1),
+                'admitted': self._admitted,
+                'queued': len(self._waiting),
+            }
+
+@contextmanager
+def measure_cost() -> Iterator[Dict[str, float]]:
+    """Measure the calling thread's CPU seconds and the wall seconds of a block; filled in on exit"""
+    measured: Dict[str, float] = {}
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        yield measured
+    finally:
+        measured['cpu_seconds'] = time.thread_time() - cpu_start
+        measured['wall_seconds'] = time.perf_counter() - wall_start
+
+def actual_cost(
+    measured: Dict[str, float],
+    ocr_stats: Dict[str, Dict[str, Any]],
+    worker_cpu_seconds: Optional[float] = None
+) -> Dict[str, float]:
+    """Extraction thread CPU plus the seconds OCR workers spent on the document's pages.
+
+    With inline OCR (no worker processes) the OCR time is already in the thread's CPU time.
+    When the document was extracted in an extraction worker, worker_cpu_seconds is the CPU
+    that worker used, OCR included. LibreOffice conversions run in their own process and are
+    only visible in wall_seconds.
+    """
+    cpu_seconds = measured['cpu_seconds']
+    if worker_cpu_seconds is not None:
+        cpu_seconds += worker_cpu_seconds
+    elif OCR_POOL.workers > 0:
+        cpu_seconds += sum(tier['seconds'] for tier in ocr_stats.values())
+    return {'cpu_seconds': round(cpu_seconds, 3), 'wall_seconds': round(measured['wall_seconds'], 3)}
+
+class CostStats:
+    """Predicted versus actual CPU seconds per document type since startup"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._types: Dict[str, Dict[str, float]] = {}
+
+    def record(self, mime_type: str, estimate: Dict[str, Any], actual: Dict[str, float]):
+        with self._lock:
+            stats = self._types.setdefault(mime_type, {
+                'documents': 0, 'predicted_cpu_seconds': 0.0, 'actual_cpu_seconds': 0.0, 'absolute_error': 0.0
+            })
+            stats['documents'] += 1
+            stats['predicted_cpu_seconds'] += estimate['cpu_seconds']
+            stats['actual_cpu_seconds'] += actual['cpu_seconds']
+            stats['absolute_error'] += abs(estimate['cpu_seconds'] - actual['cpu_seconds'])
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                mime_type: {
+                    'documents': stats['documents'],
+                    'predicted_cpu_seconds': round(stats['predicted_cpu_seconds'], 3),
+                    'actual_cpu_seconds': round(stats['actual_cpu_seconds'], 3),
+                    'mean_absolute_error': round(stats['absolute_error'] / stats['documents'], 3),
+                    # Above 1 the model underestimates this type; recalibrate when it drifts
+                    'actual_to_predicted': (
+                        round(stats['actual_cpu_seconds'] / stats['predicted_cpu_seconds'], 2)
+                        if stats['predicted_cpu_seconds'] else None
+                    ),
+                }
+                for mime_type, stats in self._types.items()
+            }
+
+COST_MODEL = CostModel.load(COST_MODEL_PATH)
+COST_BUDGET = CostBudget()
+COST_STATS = CostStats()
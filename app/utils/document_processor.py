@@ -1,44 +1,575 @@
 from enum import Enum
-import fitz
 import logging
-from typing import Tuple
-from pdf2image import convert_from_bytes
-import pytesseract
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from PIL import Image
-import docx
 import io
 import os
-import tempfile
-import subprocess
-import re
+import threading
+import time
+import zipfile
+from functools import partial
+from app.utils.cost import empty_features
+from app.utils.links import LINK_PLATFORMS, LinkCollector, empty_links
+from app.utils.metrics import record_ocr, stage, timed
+from app.utils.office_converter import OFFICE_POOL
+from app.utils.ocr_engine import OCR_LANGUAGE, engine_name
+from app.utils.ocr_pool import OCR_POOL, OCRPoolBusy, ocr_page_scored
+from app.utils.ocr_tiers import OCR_RETRY_MAX_DIMENSION, OCR_TIER_STATS, OCRPolicy, TierStats
+from app.utils.ooxml import DocxReader
+from app.utils.parsed_document import ParsedDocument
+from app.utils.result_cache import PAGE_CACHE, cache_key
+from app.utils.spool import SpooledDocument
 
 logger = logging.getLogger(__name__)
 
+DOC_MIME_TYPES = ['application/msword', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document']
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+IMAGE_MIME_TYPES = ['image/jpeg', 'image/png', 'image/tiff']
+
+# Text layer quality thresholds used by the per-page extraction planner
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "50"))
+TEXT_LAYER_MAX_GARBAGE_RATIO = float(os.getenv("TEXT_LAYER_MAX_GARBAGE_RATIO", "0.1"))
+TEXT_LAYER_MAX_IMAGE_COVERAGE = float(os.getenv("TEXT_LAYER_MAX_IMAGE_COVERAGE", "0.5"))
+# Pages mostly covered by images still need this much text to be trusted
+TEXT_LAYER_MIN_CHARS_WITH_IMAGES = int(os.getenv("TEXT_LAYER_MIN_CHARS_WITH_IMAGES", "200"))
+
+# Rasterization settings for OCR; the size limits are applied by lowering the render DPI
+OCR_DPI = int(os.getenv("OCR_DPI", "150"))
+OCR_MAX_WIDTH = 2000
+OCR_MAX_DIMENSION = 4000
+# Embedded DOCX pictures smaller than this (icons, bullets, rules) are not worth OCRing
+DOCX_IMAGE_MIN_SIDE = 64
+
+class ProcessingCancelled(Exception):
+    """Raised inside extraction when the processor was cancelled (e.g. on timeout)"""
+
 class ExtractionMethod(Enum):
     OCR = "ocr"
     PYMUPDF = "pymupdf"
     DOCX = "docx"
+    HYBRID = "hybrid"
+
+def _garbage_ratio(text: str) -> float:
+    """Share of non-whitespace characters that are replacement, private-use or control glyphs"""
+    total = 0
+    garbage = 0
+    for char in text:
+        if char.isspace():
+            continue
+        total += 1
+        code = ord(char)
+        if char == '\ufffd' or 0xE000 <= code <= 0xF8FF or code < 0x20:
+            garbage += 1
+    return garbage / total if total else 0.0
+
+def _image_coverage(page) -> float:
+    """Fraction of the page area covered by images"""
+    import fitz
+
+    page_rect = page.rect
+    page_area = abs(page_rect)
+    if not page_area:
+        return 0.0
+    covered = 0.0
+    for info in page.get_image_info():
+        covered += abs(fitz.Rect(info['bbox']) & page_rect)
+    return min(covered / page_area, 1.0)
+
+# Bump when extraction output changes so cached results are not reused
+EXTRACTION_VERSION = 3
+
+def extraction_settings() -> Dict[str, Any]:
+    """Settings that influence extraction output, used to key cached results"""
+    return {
+        'version': EXTRACTION_VERSION,
+        'text_layer_min_chars': TEXT_LAYER_MIN_CHARS,
+        'text_layer_max_garbage_ratio': TEXT_LAYER_MAX_GARBAGE_RATIO,
+        'text_layer_max_image_coverage': TEXT_LAYER_MAX_IMAGE_COVERAGE,
+        'text_layer_min_chars_with_images': TEXT_LAYER_MIN_CHARS_WITH_IMAGES,
+        'ocr_dpi': OCR_DPI,
+        'ocr_max_width': OCR_MAX_WIDTH,
+        'ocr_max_dimension': OCR_MAX_DIMENSION,
+        'ocr_language': OCR_LANGUAGE,
+        'ocr_engine': engine_name(),
+        'link_platforms': LINK_PLATFORMS,
+    }
+
+def page_ocr_settings() -> Dict[str, Any]:
+    """Settings besides the OCR policy that change a page's OCR text, used to key cached pages"""
+    return {
+        'version': EXTRACTION_VERSION,
+        'ocr_language': OCR_LANGUAGE,
+        'ocr_engine': engine_name(),
+    }
+
+def page_fingerprint(parsed: ParsedDocument, page_number: int) -> str:
+    """Hash everything that determines how a page renders, so identical pages in different files match"""
+    doc = parsed.doc
+    page = doc[page_number]
+    parts = [
+        [page.rect.width, page.rect.height, page.rotation, OCR_DPI, OCR_MAX_WIDTH, OCR_MAX_DIMENSION],
+        page.read_contents(),
+        [font[2:] for font in page.get_fonts(full=True)],
+    ]
+    for xref in sorted({image[0] for image in page.get_images(full=True)} | {xobject[0] for xobject in page.get_xobjects()}):
+        parts.append(doc.xref_stream_raw(xref) or b"")
+    return cache_key(*parts)
+
+def render_zoom(page, dpi: int = OCR_DPI, max_width: int = OCR_MAX_WIDTH, max_dimension: int = OCR_MAX_DIMENSION) -> float:
+    """Pick the render scale for a page so the bitmap respects the OCR size limits"""
+    width, height = page.rect.width, page.rect.height
+    zoom = dpi / 72
+    if width * zoom > max_width:
+        zoom = max_width / width
+    if max(width, height) * zoom > max_dimension:
+        zoom = max_dimension / max(width, height)
+    return zoom
+
+def render_pages(
+    parsed: ParsedDocument,
+    page_numbers: Iterable[int],
+    dpi: int = OCR_DPI,
+    max_width: int = OCR_MAX_WIDTH,
+    max_dimension: int = OCR_MAX_DIMENSION
+) -> Iterator[Image.Image]:
+    """Rasterize pages one at a time into 8-bit grayscale images for Tesseract"""
+    for i in page_numbers:
+        with stage('render'):
+            image = parsed.render_gray(i, render_zoom(parsed.page(i), dpi, max_width, max_dimension))
+        yield image
+
+# EXIF orientation values and the transpose that undoes them
+EXIF_ORIENTATION_TAG = 0x0112
+EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+def image_scale(width: int, height: int) -> float:
+    """Downscale factor that brings an image within the OCR size limits (images are never upscaled)"""
+    return min(1.0, OCR_MAX_WIDTH / width, OCR_MAX_DIMENSION / max(width, height))
+
+def _open_image(source: Union[bytes, str]) -> Image.Image:
+    """Open image bytes, or a file path so PIL reads frames from disk as needed"""
+    return Image.open(source if isinstance(source, str) else io.BytesIO(source))
+
+def iter_image_frames(source: Union[bytes, str]) -> Iterator[Image.Image]:
+    """Decode an image, or each frame of a multi-page TIFF, lazily into OCR-sized grayscale images.
+
+    JPEGs are decoded in draft mode straight to grayscale at the smallest DCT scale that still
+    covers the target size. Other formats are reduced while resampling, and EXIF orientation
+    is applied to the already reduced frame, so no extra full-size copies are made. TIFF frames
+    come out of PIL already oriented.
+    """
+    image = _open_image(source)
+    try:
+        yield from _image_frames(image)
+    finally:
+        image.close()
+
+def _image_frames(image: Image.Image) -> Iterator[Image.Image]:
+    # PIL already applies a TIFF's orientation tag when it opens and loads each frame
+    orientation = 1 if image.format == 'TIFF' else image.getexif().get(EXIF_ORIENTATION_TAG, 1)
+    transpose = EXIF_TRANSPOSE.get(orientation)
+    for frame_index in range(getattr(image, 'n_frames', 1)):
+        with stage('render'):
+            image.seek(frame_index)
+            width, height = image.size
+            # Orientations 5-8 swap the axes, so the width limit applies to the stored height
+            if orientation in (5, 6, 7, 8):
+                scale = image_scale(height, width)
+            else:
+                scale = image_scale(width, height)
+            target = (max(1, round(width * scale)), max(1, round(height * scale)))
+
+            if image.format == 'JPEG':
+                image.draft('L', target)
+            if image.size != target:
+                frame = image.resize(target, Image.Resampling.BILINEAR, reducing_gap=2.0)
+            else:
+                frame = image.copy()
+            if frame.mode != 'L':
+                frame = frame.convert('L')
+            if transpose is not None:
+                frame = frame.transpose(transpose)
+        yield frame
+
+def docx_image_frames(reader: DocxReader, parts: List[str]) -> Iterator[Image.Image]:
+    """OCR-sized frames of the pictures embedded in a DOCX; formats PIL cannot decode (EMF, WMF) are skipped"""
+    for part in parts:
+        try:
+            frames = list(iter_image_frames(reader.read_part(part)))
+        except Exception as e:
+            logger.info(f"Skipping embedded image {part}: {str(e)}")
+            continue
+        for frame in frames:
+            if min(frame.size) >= DOCX_IMAGE_MIN_SIDE:
+                yield frame
+
+def image_frame_count(source: Union[bytes, str]) -> int:
+    with _open_image(source) as image:
+        return getattr(image, 'n_frames', 1)
+
+def assess_page(parsed: ParsedDocument, page_number: int) -> Dict:
+    """Score the native text layer of a page and decide whether it needs OCR"""
+    page = parsed.page(page_number)
+    text = parsed.page_text(page_number)
+    char_count = sum(1 for char in text if not char.isspace())
+    garbage_ratio = _garbage_ratio(text)
+    image_coverage = _image_coverage(page)
+
+    needs_ocr = (
+        char_count < TEXT_LAYER_MIN_CHARS
+        or garbage_ratio > TEXT_LAYER_MAX_GARBAGE_RATIO
+        or (image_coverage > TEXT_LAYER_MAX_IMAGE_COVERAGE and char_count < TEXT_LAYER_MIN_CHARS_WITH_IMAGES)
+    )
+
+    return {
+        'text': text,
+        'char_count': char_count,
+        'garbage_ratio': garbage_ratio,
+        'image_coverage': image_coverage,
+        'needs_ocr': needs_ocr,
+    }
+
+def overall_method(page_methods: List[ExtractionMethod]) -> ExtractionMethod:
+    """Summarize per-page methods: a single method when all pages agree, otherwise HYBRID"""
+    if page_methods and all(method == page_methods[0] for method in page_methods):
+        return page_methods[0]
+    return ExtractionMethod.HYBRID
 
 class DocumentProcessor:
-    def __init__(self, file_bytes: bytes, mime_type: str):
+    # Extraction runs in the calling thread; see WorkerProcessor for extraction in worker processes
+    worker_cpu_seconds: Optional[float] = None
+
+    def __init__(
+        self,
+        file_bytes: bytes,
+        mime_type: str,
+        cancel_event: Optional[threading.Event] = None,
+        ocr_policy: Optional[OCRPolicy] = None,
+        file_path: Optional[str] = None
+    ):
+        # file_path, when given, is the same document on disk; stages that can open files use it
         self.file_bytes = file_bytes
+        self.file_path = file_path
         self.mime_type = mime_type
+        self.cancel_event = cancel_event or threading.Event()
+        self.ocr_policy = ocr_policy or OCRPolicy()
+        self._ocr_stats = TierStats(parent=OCR_TIER_STATS)
         self._extracted_text = None
         self._extraction_method = None
+        self._page_methods: List[ExtractionMethod] = []
+        self._links: Optional[LinkCollector] = None
+        self._pdf_bytes: Optional[bytes] = None
+        self._conversion_error: Optional[Exception] = None
+        self._parsed: Optional[ParsedDocument] = None
+        self._lock = threading.Lock()
+        self._close_requested = False
+
+    @classmethod
+    def from_spooled(cls, document: SpooledDocument, mime_type: str, **kwargs) -> "DocumentProcessor":
+        """Processor over a spooled document: its memory map for hashing, its file for parsing"""
+        return cls(document.buffer, mime_type, file_path=document.path, **kwargs)
+
+    def __enter__(self) -> "DocumentProcessor":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def parsed(self) -> ParsedDocument:
+        """The document (converted to PDF if needed), parsed once and shared by all stages"""
+        if self._parsed is None:
+            if self.file_path is not None and self.mime_type not in DOC_MIME_TYPES:
+                self._parsed = ParsedDocument(path=self.file_path)
+            else:
+                self._parsed = ParsedDocument(self._get_pdf_bytes())
+        return self._parsed
+
+    @property
+    def page_count(self) -> int:
+        if self.mime_type in IMAGE_MIME_TYPES:
+            return image_frame_count(self._source)
+        return self.parsed.page_count
+
+    @property
+    def _source(self) -> Union[bytes, str]:
+        return self.file_path if self.file_path is not None else self.file_bytes
+
+    def close(self):
+        """Release the parsed document and any converted PDF.
+
+        If extraction is still running in another thread (e.g. after a request timeout),
+        the resources are released when it finishes instead.
+        """
+        self._close_requested = True
+        self._release_if_idle()
+
+    def _release_if_idle(self):
+        if not self._close_requested or not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self._parsed is not None:
+                self._parsed.close()
+                self._parsed = None
+            self._pdf_bytes = None
+        finally:
+            self._lock.release()
+
+    def cancel(self):
+        """Ask a running extraction to stop at the next page boundary"""
+        self.cancel_event.set()
+
+    def _check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise ProcessingCancelled("Document processing was cancelled")
+
+    @property
+    def extraction_method(self) -> Optional[ExtractionMethod]:
+        """Overall method of the last completed extraction, None before one finished"""
+        return self._extraction_method
+
+    @property
+    def ocr_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Pages, OCR seconds and mean word confidence per OCR tier for this document"""
+        return self._ocr_stats.summary()
+
+    @property
+    def page_methods(self) -> List[str]:
+        """Extraction method used for each page by the last successful extraction"""
+        return [method.value for method in self._page_methods]
+
+    def cost_features(self) -> Dict[str, float]:
+        """Cheap measurements that predict the cost of extraction, taken before it starts.
+
+        PDF pages with a usable text layer count as text pages, the others by the megapixels
+        they would be OCRed at; images by their frames' OCR megapixels; DOCX files by the size
+        of their XML. DOC files (and unreadable DOCX files) count a LibreOffice conversion.
+        Page text read here is cached and reused by the extraction.
+        """
+        features = empty_features()
+        features['file_megabytes'] = len(self.file_bytes) / (1024 * 1024)
+        features['tiered'] = int(self.ocr_policy.tiered)
+        needs_conversion = self.mime_type in DOC_MIME_TYPES
+
+        if self.mime_type == 'application/pdf':
+            parsed = self.parsed
+            features['pages'] = parsed.page_count
+            for i in range(parsed.page_count):
+                self._check_cancelled()
+                if sum(1 for char in parsed.page_text(i) if not char.isspace()) >= TEXT_LAYER_MIN_CHARS:
+                    features['text_pages'] += 1
+                    continue
+                page = parsed.page(i)
+                zoom = render_zoom(page)
+                megapixels = page.rect.width * page.rect.height * zoom * zoom / 1e6
+                features['ocr_megapixels'] += megapixels
+                features['max_page_megapixels'] = max(features['max_page_megapixels'], megapixels)
+
+        elif self.mime_type in IMAGE_MIME_TYPES:
+            with _open_image(self._source) as image:
+                for frame_index in range(getattr(image, 'n_frames', 1)):
+                    image.seek(frame_index)
+                    width, height = image.size
+                    features['pages'] += 1
+                    features['ocr_megapixels'] += width * height * image_scale(width, height) ** 2 / 1e6
+                    # The frame is decoded at full size before it is reduced
+                    features['max_page_megapixels'] = max(features['max_page_megapixels'], width * height / 1e6)
+
+        elif self.mime_type == DOCX_MIME_TYPE:
+            try:
+                self._add_docx_features(features)
+                needs_conversion = False
+            except zipfile.BadZipFile:
+                pass
+
+        if needs_conversion:
+            # The converted document's size is unknown up front; the file size stands in for its text volume
+            features['conversions'] = 1
+            features['xml_megabytes'] = features['file_megabytes']
+        return features
+
+    def _add_docx_features(self, features: Dict[str, float]):
+        with zipfile.ZipFile(self.file_path if self.file_path is not None else io.BytesIO(self.file_bytes)) as package:
+            for info in package.infolist():
+                if info.filename.startswith('word/') and info.filename.endswith('.xml'):
+                    features['xml_megabytes'] += info.file_size / (1024 * 1024)
+                elif self.ocr_policy.images and info.filename.startswith('word/media/'):
+                    try:
+                        with Image.open(package.open(info)) as image:
+                            width, height = image.size
+                    except Exception:
+                        continue
+                    features['ocr_megapixels'] += width * height * image_scale(width, height) ** 2 / 1e6
+                    features['max_page_megapixels'] = max(features['max_page_megapixels'], width * height / 1e6)
 
     def process(self) -> Tuple[str, ExtractionMethod]:
         """Process the document and return extracted text and method used"""
+        try:
+            with self._lock:
+                return self._process()
+        finally:
+            self._release_if_idle()
+
+    def iter_pages(self) -> Iterator[Dict]:
+        """Extract the document page by page, yielding {'page', 'method', 'text', 'duration_ms'} as each page is done.
+
+        Only the current page's text is handed out, so callers can stream results without the
+        full text ever being joined. duration_ms is the time since the previous page was yielded.
+        DOCX files are read natively and split at their explicit page breaks, images are OCRed
+        frame by frame, and PDFs and DOC files (or DOCX files that cannot be read) use the
+        per-page planner.
+        """
+        try:
+            with self._lock:
+                reader = self._open_docx() if self.mime_type == DOCX_MIME_TYPE else None
+                if self.mime_type in IMAGE_MIME_TYPES:
+                    pages = self._iter_image()
+                elif reader is not None:
+                    pages = self._iter_docx_or_planned(reader)
+                else:
+                    pages = self._iter_planned()
+
+                start = time.perf_counter()
+                for page in pages:
+                    now = time.perf_counter()
+                    page['duration_ms'] = round((now - start) * 1000, 1)
+                    yield page
+                    start = time.perf_counter()
+        finally:
+            self._release_if_idle()
+
+    def _open_docx(self) -> Optional[DocxReader]:
+        try:
+            return DocxReader(self._source)
+        except Exception as e:
+            logger.error(f"Native DOCX extraction failed, falling back to conversion: {str(e)}")
+            return None
+
+    def _iter_docx_or_planned(self, reader: DocxReader) -> Iterator[Dict]:
+        """Native DOCX pages; a package whose XML fails before the first page is converted instead"""
+        pages = self._iter_docx(reader)
+        try:
+            first = next(pages, None)
+        except (OCRPoolBusy, ProcessingCancelled):
+            raise
+        except Exception as e:
+            logger.error(f"Native DOCX extraction failed, falling back to conversion: {str(e)}")
+            yield from self._iter_planned()
+            return
+        if first is not None:
+            yield first
+            yield from pages
+
+    def _iter_docx(self, reader: DocxReader) -> Iterator[Dict]:
+        """Yield the text of each DOCX page; with policy.images, OCR text of its pictures is appended"""
+        page_methods = []
+        links = LinkCollector()
+        with reader:
+            for i, page in enumerate(timed(reader.iter_pages(), 'docx')):
+                self._check_cancelled()
+                method = ExtractionMethod.DOCX
+                page_text = page['text']
+                if self.ocr_policy.images and page['images']:
+                    image_texts = self._ocr_docx_images(reader, page['images'])
+                    if image_texts:
+                        page_text = "\n".join([page_text] + image_texts)
+                        method = ExtractionMethod.HYBRID
+                page_methods.append(method)
+                links.add_text(page_text)
+                yield {'page': i + 1, 'method': method, 'text': page_text}
+            links.add_uris(reader.hyperlinks)
+
+        self._links = links
+        self._page_methods = page_methods
+        self._extraction_method = overall_method(page_methods) if page_methods else ExtractionMethod.DOCX
+
+    def _ocr_docx_images(self, reader: DocxReader, parts: List[str]) -> List[str]:
+        """OCR the pictures of one DOCX page through the worker pool; failed pictures are left out"""
+        texts = []
+        results = OCR_POOL.map(partial(ocr_page_scored, confidence=False), docx_image_frames(reader, parts))
+        try:
+            for future in results:
+                self._check_cancelled()
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to OCR embedded image: {str(e)}")
+                    continue
+                self._record_ocr('single', result)
+                if result['text'].strip():
+                    texts.append(result['text'])
+        finally:
+            results.close()
+        return texts
+
+    def _process(self) -> Tuple[str, ExtractionMethod]:
         if self._extracted_text is not None:
             return self._extracted_text, self._extraction_method
 
         extraction_errors = []
 
-        # Try OCR first for all file types
+        # DOCX text is read straight from the package; conversion and OCR are only fallbacks
+        if self.mime_type == DOCX_MIME_TYPE:
+            try:
+                logger.info("Attempting native DOCX extraction")
+                self._extracted_text, self._extraction_method = self._process_docx()
+                if self._extracted_text.strip():
+                    return self._extracted_text, self._extraction_method
+            except (OCRPoolBusy, ProcessingCancelled):
+                raise
+            except Exception as e:
+                error_msg = f"DOCX extraction failed: {str(e)}"
+                logger.error(error_msg)
+                extraction_errors.append(error_msg)
+
+        # PDFs and converted documents go through the per-page planner, which only OCRs pages
+        # whose text layer is missing or unusable
+        if self.mime_type == 'application/pdf' or self.mime_type in DOC_MIME_TYPES:
+            try:
+                logger.info("Attempting planned extraction (text layer first, OCR where needed)")
+                self._extracted_text, self._extraction_method = self._process_planned()
+                if self._extracted_text.strip():
+                    return self._extracted_text, self._extraction_method
+            except (OCRPoolBusy, ProcessingCancelled):
+                raise
+            except Exception as e:
+                error_msg = f"Planned extraction failed: {str(e)}"
+                logger.error(error_msg)
+                extraction_errors.append(error_msg)
+
+        # Images are decoded directly and OCRed frame by frame
+        if self.mime_type in IMAGE_MIME_TYPES:
+            try:
+                logger.info("Attempting image OCR extraction")
+                self._extracted_text, self._extraction_method = self._process_image()
+                if self._extracted_text.strip():
+                    return self._extracted_text, self._extraction_method
+            except (OCRPoolBusy, ProcessingCancelled):
+                raise
+            except Exception as e:
+                error_msg = f"Image OCR extraction failed: {str(e)}"
+                logger.error(error_msg)
+                extraction_errors.append(error_msg)
+
+            error_summary = " | ".join(extraction_errors)
+            raise ValueError(f"All extraction methods failed. Details: {error_summary}")
+
+        # Try OCR of every page
         try:
-            logger.info("Attempting OCR extraction as primary method")
+            logger.info("Attempting OCR extraction")
             self._extracted_text, self._extraction_method = self._process_ocr()
             if self._extracted_text.strip():
                 return self._extracted_text, self._extraction_method
+        except (OCRPoolBusy, ProcessingCancelled):
+            raise
         except Exception as e:
             error_msg = f"OCR extraction failed: {str(e)}"
             logger.error(error_msg)
@@ -55,26 +586,14 @@ class DocumentProcessor:
                     error_msg = "PyMuPDF extraction produced empty text"
                     logger.error(error_msg)
                     extraction_errors.append(error_msg)
+            except ProcessingCancelled:
+                raise
             except Exception as e:
                 error_msg = f"PyMuPDF extraction failed: {str(e)}"
                 logger.error(error_msg)
                 extraction_errors.append(error_msg)
 
-        elif self.mime_type in ['application/msword', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document']:
-            try:
-                logger.info("Attempting DOCX extraction")
-                self._extracted_text, self._extraction_method = self._process_docx()
-                if self._extracted_text.strip():
-                    return self._extracted_text, self._extraction_method
-                else:
-                    error_msg = "DOCX extraction produced empty text"
-                    logger.error(error_msg)
-                    extraction_errors.append(error_msg)
-            except Exception as e:
-                error_msg = f"DOCX extraction failed: {str(e)}"
-                logger.error(error_msg)
-                extraction_errors.append(error_msg)
-
+        elif self.mime_type in DOC_MIME_TYPES:
             try:
                 logger.info("Attempting PyMuPDF extraction for DOC/DOCX")
                 self._extracted_text, self._extraction_method = self._process_pymupdf()
@@ -84,6 +603,8 @@ class DocumentProcessor:
                     error_msg = "PyMuPDF extraction produced empty text"
                     logger.error(error_msg)
                     extraction_errors.append(error_msg)
+            except ProcessingCancelled:
+                raise
             except Exception as e:
                 error_msg = f"PyMuPDF extraction failed: {str(e)}"
                 logger.error(error_msg)
@@ -93,174 +614,299 @@ class DocumentProcessor:
         error_summary = " | ".join(extraction_errors)
         raise ValueError(f"All extraction methods failed. Details: {error_summary}")
 
-    def _process_ocr(self) -> Tuple[str, ExtractionMethod]:
-        """Extract text using OCR"""
-        logger.info("Converting document to images...")
-        
-        # For DOC/DOCX, convert to PDF first
-        if self.mime_type in ['application/msword', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document']:
-            pdf_bytes = self._convert_to_pdf()
-        else:
-            pdf_bytes = self.file_bytes
-
-        # Convert PDF to images
-        images = convert_from_bytes(
-            pdf_bytes,
-            dpi=150,
-            fmt='jpeg',
-            size=(2000, None)  # Limit width to 2000 pixels
-        )
+    def _process_planned(self) -> Tuple[str, ExtractionMethod]:
+        """Extract text page by page, using the native text layer where it is usable and OCR elsewhere"""
+        page_texts = [page['text'] for page in self._iter_planned()]
+        text = "\n".join(page_texts)
+        if not text.strip():
+            raise Exception("Planned extraction produced no text")
+
+        method = self._extraction_method
+        logger.info(f"Planned extraction used {method.value} for {len(page_texts)} pages")
+        return text.strip(), method
 
-        if not images:
-            raise Exception("Document to image conversion produced no images")
+    def _iter_planned(self) -> Iterator[Dict]:
+        """Yield planned pages in order as soon as each is done.
+
+        OCR starts when the first page that needs it is reached; from then on the following OCR
+        pages are rendered and OCRed ahead, up to the document's share of the pool.
+        """
+        parsed = self.parsed
+        ocr_pages = []
+        for i in range(parsed.page_count):
+            self._check_cancelled()
+            assessment = assess_page(parsed, i)
+            if assessment['needs_ocr']:
+                logger.info(
+                    f"Page {i+1} needs OCR (chars={assessment['char_count']}, "
+                    f"garbage={assessment['garbage_ratio']:.2f}, images={assessment['image_coverage']:.2f})"
+                )
+                ocr_pages.append(i)
+
+        if ocr_pages:
+            logger.info(f"OCRing {len(ocr_pages)} of {parsed.page_count} pages")
+        ocr_results = self._ocr_pages(ocr_pages)
+        ocr_set = set(ocr_pages)
+        page_methods = []
+        links = LinkCollector()
+        try:
+            for i in range(parsed.page_count):
+                self._check_cancelled()
+                method = ExtractionMethod.PYMUPDF
+                page_text = None
+                if i in ocr_set:
+                    _, page_text = next(ocr_results)
+                # On OCR failure keep whatever the text layer had rather than dropping the page
+                if page_text is None:
+                    page_text = parsed.page_text(i)
+                else:
+                    method = ExtractionMethod.OCR
+                page_methods.append(method)
+                self._collect_page_links(links, i, page_text)
+                yield {'page': i + 1, 'method': method, 'text': page_text}
+        finally:
+            ocr_results.close()
 
-        logger.info(f"Successfully converted document to {len(images)} images")
-        text = ""
+        self._links = links
+        self._page_methods = page_methods
+        self._extraction_method = overall_method(page_methods)
 
-        for i, image in enumerate(images):
+    def _get_pdf_bytes(self) -> bytes:
+        """Return the document as PDF bytes, converting DOC/DOCX once and reusing the result"""
+        if self.mime_type not in DOC_MIME_TYPES:
+            return self.file_bytes
+        if self._conversion_error is not None:
+            raise self._conversion_error
+        if self._pdf_bytes is None:
             try:
-                logger.info(f"Processing page {i+1} with OCR...")
-                # Resize if image is too large
-                max_dimension = 4000
-                if max(image.size) > max_dimension:
-                    ratio = max_dimension / max(image.size)
-                    new_size = tuple(int(dim * ratio) for dim in image.size)
-                    image = image.resize(new_size, Image.Resampling.LANCZOS)
-
-                page_text = pytesseract.image_to_string(image)
-                text += page_text + "\n"
+                self._pdf_bytes = self._convert_to_pdf()
             except Exception as e:
-                logger.error(f"Failed to OCR page {i+1}: {str(e)}")
+                self._conversion_error = e
+                raise
+        return self._pdf_bytes
+
+    def _ocr_pages(self, page_numbers: Iterable[int]) -> Iterator[Tuple[int, Optional[str]]]:
+        """OCR pages through the worker pool, yielding (page, text) in order; text is None on failure.
+
+        Pages already seen in other documents with the same OCR policy, language, engine and
+        extraction version are served from the page cache.
+        """
+        parsed = self.parsed
+        policy = self.ocr_policy
+        page_numbers = list(page_numbers)
+        settings = page_ocr_settings()
+        keys = {i: cache_key(page_fingerprint(parsed, i), policy.settings(), settings) for i in page_numbers}
+        cached = {}
+        for i in page_numbers:
+            page_text = PAGE_CACHE.get(keys[i])
+            if page_text is not None:
+                cached[i] = page_text
+        if cached:
+            logger.info(f"Reusing cached OCR text for {len(cached)} pages")
+
+        uncached = [i for i in page_numbers if i not in cached]
+        results = self._ocr_tiered(uncached) if policy.tiered else self._ocr_single(uncached)
+        try:
+            for i in page_numbers:
+                if i in cached:
+                    yield i, cached[i]
+                    continue
+                self._check_cancelled()
+                page_text = next(results)
+                if page_text is not None:
+                    PAGE_CACHE.set(keys[i], page_text)
+                yield i, page_text
+        finally:
+            results.close()
+
+    def _ocr_single(self, page_numbers: List[int]) -> Iterator[Optional[str]]:
+        """One OCR pass at OCR_DPI, yielding each page's text (None on failure) in order"""
+        results = OCR_POOL.map(partial(ocr_page_scored, confidence=False), render_pages(self.parsed, page_numbers))
+        try:
+            for i, future in zip(page_numbers, results):
+                try:
+                    logger.info(f"Processing page {i+1} with OCR...")
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to OCR page {i+1}: {str(e)}")
+                    yield None
+                    continue
+                self._record_ocr('single', result)
+                yield result['text']
+        finally:
+            results.close()
+
+    def _ocr_tiered(self, page_numbers: List[int]) -> Iterator[Optional[str]]:
+        """Fast low-DPI pass over all pages, then a preprocessed high-DPI retry of low-confidence pages.
+
+        A retry replaces the first result only when its confidence is at least as high.
+        """
+        parsed = self.parsed
+        policy = self.ocr_policy
+        first: Dict[int, Optional[Dict[str, Any]]] = {}
+        results = OCR_POOL.map(partial(ocr_page_scored, fast=True), render_pages(parsed, page_numbers, policy.fast_dpi))
+        try:
+            for i, future in zip(page_numbers, results):
+                self._check_cancelled()
+                try:
+                    first[i] = future.result()
+                except Exception as e:
+                    logger.error(f"Failed fast OCR of page {i+1}: {str(e)}")
+                    first[i] = None
+                    continue
+                self._record_ocr('fast', first[i])
+        finally:
+            results.close()
+
+        retry_pages = [
+            i for i in page_numbers
+            if first[i] is None or first[i]['confidence'] is None or first[i]['confidence'] < policy.min_confidence
+        ]
+        if retry_pages:
+            logger.info(f"Retrying {len(retry_pages)} of {len(page_numbers)} pages at {policy.retry_dpi} DPI")
+        retry_set = set(retry_pages)
+        retries = OCR_POOL.map(
+            partial(ocr_page_scored, preprocess=True),
+            render_pages(parsed, retry_pages, policy.retry_dpi, OCR_RETRY_MAX_DIMENSION, OCR_RETRY_MAX_DIMENSION)
+        )
+        try:
+            for i in page_numbers:
+                result = first[i]
+                if i in retry_set:
+                    try:
+                        retry = next(retries).result()
+                    except Exception as e:
+                        logger.error(f"Failed OCR retry of page {i+1}: {str(e)}")
+                        retry = None
+                    if retry is not None:
+                        kept = result is None or (retry['confidence'] or 0) >= (result['confidence'] or 0)
+                        self._record_ocr('retry', retry, kept=kept)
+                        if kept:
+                            result = retry
+                yield None if result is None else result['text']
+        finally:
+            retries.close()
+
+    def _record_ocr(self, tier: str, result: Dict[str, Any], kept: bool = True):
+        self._ocr_stats.record(tier, result, kept)
+        record_ocr(tier, result['seconds'])
+
+    def _process_ocr(self) -> Tuple[str, ExtractionMethod]:
+        """Extract text using OCR"""
+        page_count = self.parsed.page_count
+        if not page_count:
+            raise Exception("Document has no pages to OCR")
+
+        logger.info(f"OCRing {page_count} pages...")
+        page_texts = []
+        links = LinkCollector()
+        for i, page_text in self._ocr_pages(range(page_count)):
+            if page_text is not None:
+                page_texts.append(page_text)
+                self._collect_page_links(links, i, page_text)
+        text = "\n".join(page_texts)
 
         if not text.strip():
             raise Exception("OCR extraction produced no text")
 
+        self._links = links
+        self._page_methods = [ExtractionMethod.OCR] * page_count
+        return text.strip(), ExtractionMethod.OCR
+
+    def _process_image(self) -> Tuple[str, ExtractionMethod]:
+        """Extract text from an image upload; multi-page TIFF frames are OCRed as separate pages"""
+        page_texts = [page['text'] for page in self._iter_image()]
+        text = "\n".join(page_texts)
+
+        if not text.strip():
+            raise Exception("Image OCR produced no text")
+
         return text.strip(), ExtractionMethod.OCR
 
+    def _iter_image(self) -> Iterator[Dict]:
+        """Yield OCR text per image frame in order; a frame that fails to OCR yields empty text"""
+        page_count = 0
+        links = LinkCollector()
+        results = OCR_POOL.map(partial(ocr_page_scored, confidence=False), iter_image_frames(self._source))
+        try:
+            for i, future in enumerate(results):
+                self._check_cancelled()
+                page_count += 1
+                try:
+                    logger.info(f"Processing image frame {i+1} with OCR...")
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to OCR image frame {i+1}: {str(e)}")
+                    page_text = ""
+                else:
+                    self._record_ocr('single', result)
+                    page_text = result['text']
+                links.add_text(page_text)
+                yield {'page': i + 1, 'method': ExtractionMethod.OCR, 'text': page_text}
+        finally:
+            results.close()
+
+        self._links = links
+        self._page_methods = [ExtractionMethod.OCR] * page_count
+        self._extraction_method = ExtractionMethod.OCR
+
     def _process_pymupdf(self) -> Tuple[str, ExtractionMethod]:
         """Extract text using PyMuPDF"""
-        if self.mime_type in ['application/msword', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document']:
-            pdf_bytes = self._convert_to_pdf()
-        else:
-            pdf_bytes = self.file_bytes
-
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        text = ""
-        for page in doc:
-            text += page.get_text()
+        parsed = self.parsed
+        page_texts = []
+        links = LinkCollector()
+        page_count = parsed.page_count
+        for i in range(page_count):
+            self._check_cancelled()
+            page_texts.append(parsed.page_text(i))
+            self._collect_page_links(links, i, page_texts[-1])
+        text = "".join(page_texts)
 
         if not text.strip():
             raise Exception("PyMuPDF extraction produced no text")
 
+        self._links = links
+        self._page_methods = [ExtractionMethod.PYMUPDF] * page_count
         return text.strip(), ExtractionMethod.PYMUPDF
 
     def _process_docx(self) -> Tuple[str, ExtractionMethod]:
-        """Extract text from DOCX using python-docx"""
-        doc = docx.Document(io.BytesIO(self.file_bytes))
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-        
+        """Extract text from the DOCX package XML (body, tables, text boxes, headers, footers and notes)"""
+        page_texts = [page['text'] for page in self._iter_docx(DocxReader(self._source))]
+        text = "\n".join(page_texts)
+
         if not text.strip():
             raise Exception("DOCX extraction produced no text")
 
-        return text.strip(), ExtractionMethod.DOCX
+        return text.strip(), self._extraction_method
 
     def _convert_to_pdf(self) -> bytes:
-        """Convert DOC/DOCX to PDF using LibreOffice"""
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as temp_doc:
-            temp_doc.write(self.file_bytes)
-            temp_doc_path = temp_doc.name
+        """Convert DOC/DOCX to PDF using the shared LibreOffice pool"""
+        suffix = '.doc' if self.mime_type == 'application/msword' else '.docx'
+        with stage('convert', mime_type=self.mime_type):
+            return OFFICE_POOL.convert_to_pdf(self.file_bytes, suffix, source_path=self.file_path)
 
-        try:
-            temp_pdf_path = temp_doc_path.replace('.docx', '.pdf')
-            
-            # Convert to PDF using LibreOffice
-            process = subprocess.Popen([
-                'soffice',
-                '--headless',
-                '--convert-to',
-                'pdf',
-                '--outdir',
-                os.path.dirname(temp_pdf_path),
-                temp_doc_path
-            ])
-            process.wait()
-
-            # Read the converted PDF
-            with open(temp_pdf_path, 'rb') as pdf_file:
-                pdf_bytes = pdf_file.read()
-
-            return pdf_bytes
+    def extract_links(self) -> Dict[str, List[str]]:
+        """Links, emails and phone numbers collected while the text was extracted.
 
-        finally:
-            # Clean up temporary files
-            if os.path.exists(temp_doc_path):
-                os.unlink(temp_doc_path)
-            if os.path.exists(temp_pdf_path):
-                os.unlink(temp_pdf_path)
-
-    def extract_links(self) -> dict:
-        """Extract links from the document"""
-        if self.mime_type != 'application/pdf':
-            return {
-                'web_links': [],
-                'linkedin_links': [],
-                'github_links': [],
-                'stackoverflow_links': [],
-                'email_links': [],
-                'text_links': [],
-                'annotation_links': []
-            }
-        
-        try:
-            # Initialize links dictionary with sets
-            links = {
-                'web_links': set(),
-                'linkedin_links': set(),
-                'github_links': set(),
-                'stackoverflow_links': set(),
-                'email_links': set(),
-                'text_links': set(),
-                'annotation_links': set()
-            }
-            
-            # Open PDF and extract links
-            doc = fitz.open(stream=self.file_bytes, filetype="pdf")
-            for page in doc:
-                # Get all links from the page
-                for link in page.get_links():
-                    if 'uri' in link:  # Check if it's a URL link
-                        uri = link['uri']
-                        links['annotation_links'].add(uri)
-                        
-                        # Categorize the link
-                        uri_lower = uri.lower()
-                        if 'linkedin.com' in uri_lower:
-                            links['linkedin_links'].add(uri)
-                        elif 'github.com' in uri_lower:
-                            links['github_links'].add(uri)
-                        elif 'stackoverflow.com' in uri_lower:
-                            links['stackoverflow_links'].add(uri)
-                        else:
-                            links['web_links'].add(uri)
-                        
-                # Extract any email addresses from text
-                text = page.get_text()
-                emails = re.findall(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', text)
-                links['email_links'].update(emails)
-            
-            doc.close()
-            
-            # Convert sets to lists for JSON serialization
-            return {k: list(v) for k, v in links.items()}
-            
-        except Exception as e:
-            logger.error(f"Error extracting links: {str(e)}", exc_info=True)
-            return {
-                'web_links': [],
-                'linkedin_links': [],
-                'github_links': [],
-                'stackoverflow_links': [],
-                'email_links': [],
-                'text_links': [],
-                'annotation_links': []
-            }
\ No newline at end of file
+        Before (or without) an extraction, a PDF's links are read from its text layer and annotations.
+        """
+        if self._links is None:
+            if self.mime_type != 'application/pdf':
+                return empty_links()
+            try:
+                collector = LinkCollector()
+                parsed = self.parsed
+                for i in range(parsed.page_count):
+                    self._collect_page_links(collector, i, parsed.page_text(i))
+                self._links = collector
+            except Exception as e:
+                logger.error(f"Error extracting links: {str(e)}", exc_info=True)
+                return empty_links()
+        return self._links.result()
+
+    def _collect_page_links(self, collector: LinkCollector, page_number: int, page_text: str):
+        """Feed one page's annotation links and final text to the collector, then release the page's cached text"""
+        parsed = self.parsed
+        collector.add_uris(link['uri'] for link in parsed.page_links(page_number) if 'uri' in link)
+        collector.add_text(page_text)
+        parsed.release_page(page_number)
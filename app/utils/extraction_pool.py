@@ -0,0 +1,644 @@
+import gc
+import logging
+import mmap
+import multiprocessing
+import os
+import pickle
+import signal
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.utils import metrics
+from app.utils.document_processor import DocumentProcessor, ExtractionMethod, ProcessingCancelled
+from app.utils.ocr_tiers import OCR_TIER_STATS, OCRPolicy, TierStats
+from app.utils.spool import SpooledDocument
+
+logger = logging.getLogger(__name__)
+
+# Worker processes that run extraction; 0 extracts in threads of the server process
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "0"))
+# Recycle a worker after this many documents, or once its resident memory exceeds the limit
+EXTRACTION_MAX_DOCUMENTS_PER_WORKER = int(os.getenv("EXTRACTION_MAX_DOCUMENTS_PER_WORKER", "100"))
+EXTRACTION_MAX_RSS_MB = float(os.getenv("EXTRACTION_MAX_RSS_MB", "1024"))
+# Seconds a request waits for a free worker before it is rejected
+EXTRACTION_QUEUE_TIMEOUT = float(os.getenv("EXTRACTION_QUEUE_TIMEOUT", "30"))
+# Seconds a new worker may take to start and warm its backends
+EXTRACTION_STARTUP_TIMEOUT = float(os.getenv("EXTRACTION_STARTUP_TIMEOUT", "120"))
+# How often a waiting request checks for cancellation and for a dead worker
+POLL_INTERVAL = 0.1
+
+class ExtractionPoolBusy(Exception):
+    """Raised when no extraction worker becomes free in time"""
+
+class ExtractionWorkerCrashed(Exception):
+    """Raised when a worker process exits in the middle of a document (e.g. a native crash or OOM kill)"""
+
+def _rss_mb() -> float:
+    """Current resident memory of this process"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        # Peak rather than current memory where /proc is missing (in bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024)
+
+def _picklable(e: Exception) -> Exception:
+    """The exception itself if it survives the pipe, otherwise a RuntimeError with its message"""
+    try:
+        pickle.loads(pickle.dumps(e))
+        return e
+    except Exception:
+        return RuntimeError(str(e) or type(e).__name__)
+
+class _Session:
+    """One document open in a worker process: the spooled file mapped read-only and its processor"""
+
+    def __init__(self, path: str, size: int, mime_type: str, ocr_policy: OCRPolicy):
+        self._map = None
+        # The server's spooled file is mapped again here, so both processes share its pages
+        if size:
+            with open(path, 'rb') as spooled_file:
+                self._map = mmap.mmap(spooled_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.processor = DocumentProcessor(
+            self._map if self._map is not None else b"", mime_type, ocr_policy=ocr_policy, file_path=path
+        )
+
+    def state(self) -> Dict[str, Any]:
+        processor = self.processor
+        return {
+            'page_methods': processor.page_methods,
+            'extraction_method': processor.extraction_method,
+            'links': processor._links.result() if processor._links is not None else None,
+        }
+
+    def close(self):
+        self.processor.close()
+        self.processor = None
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # A page image still references the map; it is unmapped with that reference
+                pass
+            self._map = None
+
+def _reply_state(session: Optional[_Session], cpu_seconds: float) -> Dict[str, Any]:
+    """What the server mirrors after every call: processor results, OCR and metric samples, memory"""
+    state = session.state() if session is not None else {'page_methods': [], 'extraction_method': None, 'links': None}
+    state.update({
+        'ocr_tiers': OCR_TIER_STATS.drain(),
+        'metrics': metrics.drain(),
+        'cpu_seconds': cpu_seconds,
+        'rss_mb': _rss_mb(),
+    })
+    return state
+
+def _worker_main(conn, backends: List[str]):
+    """Serve one document at a time for the server until told to stop"""
+    logging.basicConfig(level=logging.INFO)
+    # Own process group, so a hard kill also ends tesseract and LibreOffice children
+    if hasattr(os, 'setsid'):
+        os.setsid()
+
+    from app.utils.cost import measure_cost
+    from app.utils.ocr_pool import OCR_POOL
+    from app.utils.office_converter import OFFICE_POOL
+    from app.utils.warmup import LOCAL_WARMERS
+
+    # Workers are the unit of parallelism: OCR runs inline, and one document needs one LibreOffice instance
+    OCR_POOL.workers = 0
+    OFFICE_POOL.size = 1
+    errors = {}
+    for name in backends:
+        try:
+            LOCAL_WARMERS[name]()
+        except Exception as e:
+            errors[name] = str(e)
+    conn.send(('ready', errors))
+
+    session: Optional[_Session] = None
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            kind = message[0]
+            if kind == 'close':
+                if session is not None:
+                    session.close()
+                    session = None
+                gc.collect()
+                conn.send(('closed', _rss_mb()))
+                continue
+
+            measured = {}
+            try:
+                with measure_cost() as measured:
+                    if kind == 'open':
+                        session = _Session(*message[1:])
+                        value = None
+                    elif kind == 'pages':
+                        for page in session.processor.iter_pages():
+                            conn.send(('page', page))
+                        value = None
+                    else:
+                        value = getattr(session.processor, message[1])()
+            except (BrokenPipeError, EOFError):
+                raise
+            except Exception as e:
+                conn.send(('error', _picklable(e), _reply_state(session, measured.get('cpu_seconds', 0.0))))
+                continue
+            conn.send(('result', value, _reply_state(session, measured['cpu_seconds'])))
+    except (BrokenPipeError, EOFError):
+        # The server retired this worker or went away
+        pass
+
+    if session is not None:
+        session.close()
+    OFFICE_POOL.shutdown()
+
+class ExtractionWorker:
+    """A worker process and the server's end of its pipe"""
+
+    def __init__(self, index: int, backends: List[str]):
+        self.index = index
+        self.documents = 0
+        self.rss_mb = 0.0
+        # Backends that failed to warm, once the worker reported in
+        self.errors: Optional[Dict[str, str]] = None
+        # A close was sent and its reply (with the memory left afterwards) not read yet
+        self.closing = False
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, backends), name=f"extraction-{index}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def _crashed(self) -> ExtractionWorkerCrashed:
+        self.process.join(timeout=1)
+        return ExtractionWorkerCrashed(f"Extraction worker exited unexpectedly (exit code {self.process.exitcode})")
+
+    def _read(self, cancel_event: Optional[threading.Event] = None, deadline: Optional[float] = None) -> Tuple:
+        """Next message from the worker.
+
+        Kills the worker and raises ProcessingCancelled when cancel_event is set first, and raises
+        ExtractionWorkerCrashed when the process dies or misses the deadline.
+        """
+        while not self.conn.poll(POLL_INTERVAL):
+            if cancel_event is not None and cancel_event.is_set():
+                self.kill()
+                raise ProcessingCancelled("Document processing was cancelled")
+            if not self.process.is_alive() and not self.conn.poll():
+                raise self._crashed()
+            if deadline is not None and time.monotonic() > deadline:
+                self.kill()
+                raise ExtractionWorkerCrashed("Extraction worker did not respond in time")
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError):
+            raise self._crashed()
+
+    def _absorb(self, message: Tuple) -> bool:
+        """Take in the start-up and close reports, which are not replies to a call"""
+        if message[0] == 'ready':
+            self.errors = message[1]
+            return True
+        if message[0] == 'closed':
+            self.closing = False
+            self.rss_mb = message[1]
+            return True
+        return False
+
+    def receive(self, cancel_event: Optional[threading.Event] = None) -> Tuple:
+        """Next reply to a call"""
+        while True:
+            message = self._read(cancel_event)
+            if not self._absorb(message):
+                return message
+
+    def wait_ready(self, timeout: float = EXTRACTION_STARTUP_TIMEOUT) -> Dict[str, str]:
+        """Block until the worker has warmed its backends; returns the backends that failed"""
+        deadline = time.monotonic() + timeout
+        while self.errors is None:
+            self._absorb(self._read(deadline=deadline))
+        return self.errors
+
+    def settle(self, timeout: float = EXTRACTION_STARTUP_TIMEOUT):
+        """Wait for an outstanding close, so rss_mb is the memory the worker kept after its last document"""
+        deadline = time.monotonic() + timeout
+        while self.closing:
+            if not self._absorb(self._read(deadline=deadline)):
+                self.kill()
+                raise ExtractionWorkerCrashed("Unexpected message from an idle extraction worker")
+
+    def request(self, message: Tuple):
+        try:
+            self.conn.send(message)
+        except (BrokenPipeError, OSError):
+            raise self._crashed()
+
+    def stop(self):
+        """Ask the worker to exit once it is done with its queued messages; it is reaped later"""
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.conn.close()
+
+    def kill(self):
+        """Kill the worker and everything it started, freeing their CPU at once"""
+        if self.process.pid is not None and self.process.is_alive():
+            try:
+                if hasattr(os, 'killpg') and os.getpgid(self.process.pid) == self.process.pid:
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                else:
+                    # Not in its own group yet; the group would still be the server's
+                    self.process.kill()
+            except ProcessLookupError:
+                pass
+        self.process.join(timeout=5)
+        self.conn.close()
+
+class ExtractionPool:
+    """Supervised worker processes that extract documents in isolation from the server process.
+
+    The server only does I/O. A document is handed over as the path of its spooled file, which
+    the worker maps read-only, so document bytes are never pickled. A worker serves one document
+    at a time. It is replaced after EXTRACTION_MAX_DOCUMENTS_PER_WORKER documents, when the memory
+    it keeps after a document exceeds EXTRACTION_MAX_RSS_MB, and when it crashes. A worker whose
+    document is cancelled or times out is killed together with its children.
+    """
+
+    def __init__(
+        self,
+        workers: int = EXTRACTION_WORKERS,
+        max_documents: int = EXTRACTION_MAX_DOCUMENTS_PER_WORKER,
+        max_rss_mb: float = EXTRACTION_MAX_RSS_MB
+    ):
+        self.workers = workers
+        self.max_documents = max_documents
+        self.max_rss_mb = max_rss_mb
+        self.backends: List[str] = []
+        self._cond = threading.Condition()
+        self._idle: List[ExtractionWorker] = []
+        self._retired: List[ExtractionWorker] = []
+        # Workers running or starting, idle or busy
+        self._started = 0
+        self._next_index = 0
+        self._counts = {'recycled': 0, 'killed': 0, 'crashed': 0}
+        self._start_lock = threading.Lock()
+        self._start_errors: Optional[Dict[str, str]] = None
+        self._shut_down = False
+        # Replacements started in the background that have not reported in yet
+        self._starting = 0
+
+    def _spawn(self) -> ExtractionWorker:
+        with self._cond:
+            index = self._next_index
+            self._next_index += 1
+        worker = ExtractionWorker(index, self.backends)
+        logger.info(f"Started extraction worker {index} (pid {worker.pid})")
+        return worker
+
+    def start(self, backends: List[str] = ()) -> Dict[str, str]:
+        """Start every worker ahead of traffic, warming the given backends in each.
+
+        Replacement workers warm the same backends. Returns the backends that failed to warm,
+        with the error from the first worker they failed in; later calls return the same report.
+        """
+        with self._start_lock:
+            if self._start_errors is not None:
+                return dict(self._start_errors)
+            with self._cond:
+                self.backends = list(backends)
+                missing = self.workers - self._started
+                self._started += missing
+            workers = []
+            try:
+                for _ in range(missing):
+                    workers.append(self._spawn())
+            finally:
+                with self._cond:
+                    self._started -= missing - len(workers)
+            errors: Dict[str, str] = {}
+            for worker in workers:
+                try:
+                    for name, error in worker.wait_ready().items():
+                        errors.setdefault(name, error)
+                except ExtractionWorkerCrashed as e:
+                    logger.error(f"Extraction worker {worker.index} failed to start: {str(e)}")
+                    self.discard(worker, 'crashed')
+                    continue
+                self.release(worker)
+            self._start_errors = errors
+            return dict(errors)
+
+    def checkout(
+        self,
+        timeout: Optional[float] = EXTRACTION_QUEUE_TIMEOUT,
+        cancel_event: Optional[threading.Event] = None
+    ) -> ExtractionWorker:
+        """Take a free worker, starting one if fewer than ``workers`` are running"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            self._reap()
+            with self._cond:
+                while not self._idle and self._started >= self.workers:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ProcessingCancelled("Document processing was cancelled")
+                    remaining = deadline - time.monotonic() if deadline is not None else POLL_INTERVAL
+                    if remaining <= 0:
+                        raise ExtractionPoolBusy(f"All {self.workers} extraction workers are busy")
+                    self._cond.wait(min(remaining, POLL_INTERVAL))
+                worker = self._idle.pop(0) if self._idle else None
+                if worker is None:
+                    self._started += 1
+            if worker is None:
+                try:
+                    return self._spawn()
+                except Exception:
+                    with self._cond:
+                        self._started -= 1
+                        self._cond.notify_all()
+                    raise
+            try:
+                worker.settle()
+            except ExtractionWorkerCrashed as e:
+                logger.error(f"Extraction worker {worker.index} died while idle: {str(e)}")
+                self.discard(worker, 'crashed')
+                continue
+            if worker.rss_mb > self.max_rss_mb:
+                logger.info(f"Recycling extraction worker {worker.index} at {worker.rss_mb:.0f} MB resident")
+                self._retire(worker)
+                continue
+            return worker
+
+    def release(self, worker: ExtractionWorker):
+        """Return a worker after a document; it is retired once it reached its document limit"""
+        if worker.documents >= self.max_documents:
+            logger.info(f"Recycling extraction worker {worker.index} after {worker.documents} documents")
+            self._retire(worker)
+            return
+        with self._cond:
+            if not self._shut_down:
+                self._idle.append(worker)
+                self._cond.notify_all()
+                return
+            self._started -= 1
+        worker.stop()
+
+    def _retire(self, worker: ExtractionWorker):
+        worker.stop()
+        with self._cond:
+            self._retired.append(worker)
+            self._counts['recycled'] += 1
+            self._started -= 1
+            self._cond.notify_all()
+        self._replace()
+
+    def discard(self, worker: ExtractionWorker, reason: str):
+        """Kill a worker that was abandoned mid-document or died; it is replaced in the background or on demand"""
+        worker.kill()
+        with self._cond:
+            self._counts[reason] += 1
+            self._started -= 1
+            self._cond.notify_all()
+        self._replace()
+
+    def _replace(self):
+        """Start a replacement in the background if the pool was started ahead of traffic"""
+        with self._cond:
+            if self._start_errors is None or self._shut_down or self._started >= self.workers:
+                return
+            self._started += 1
+            self._starting += 1
+        threading.Thread(target=self._start_replacement, name="extraction-replacement", daemon=True).start()
+
+    def _start_replacement(self):
+        worker = None
+        try:
+            worker = self._spawn()
+            worker.wait_ready()
+        except Exception as e:
+            logger.error(f"Failed to start a replacement extraction worker: {str(e)}")
+            if worker is not None:
+                worker.kill()
+            with self._cond:
+                self._starting -= 1
+                self._started -= 1
+                self._cond.notify_all()
+            return
+        with self._cond:
+            self._starting -= 1
+        self.release(worker)
+
+    def _reap(self):
+        """Join retired workers that have exited"""
+        with self._cond:
+            retired, self._retired = self._retired, []
+        running = []
+        for worker in retired:
+            worker.process.join(timeout=0)
+            if worker.process.is_alive():
+                running.append(worker)
+        with self._cond:
+            self._retired.extend(running)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'started': self._started,
+                'busy': self._started - self._starting - len(self._idle),
+                **self._counts,
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._shut_down = True
+            idle, self._idle = self._idle, []
+            self._started -= len(idle)
+        for worker in idle:
+            worker.stop()
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.kill()
+        self._reap()
+
+EXTRACTION_POOL = ExtractionPool()
+
+class WorkerProcessor:
+    """Stands in for DocumentProcessor and runs every stage in an extraction worker.
+
+    A worker is taken on first use and kept until close(), so the estimate, the extraction
+    and link extraction share one parsed document. Results, OCR tier stats and stage metrics
+    are mirrored back into this process after every call.
+    """
+
+    def __init__(
+        self,
+        document: SpooledDocument,
+        mime_type: str,
+        cancel_event: Optional[threading.Event] = None,
+        ocr_policy: Optional[OCRPolicy] = None,
+        pool: ExtractionPool = EXTRACTION_POOL,
+        queue_timeout: Optional[float] = EXTRACTION_QUEUE_TIMEOUT
+    ):
+        self.document = document
+        self.file_bytes = document.buffer
+        self.file_path = document.path
+        self.mime_type = mime_type
+        self.cancel_event = cancel_event or threading.Event()
+        self.ocr_policy = ocr_policy or OCRPolicy()
+        self.pool = pool
+        self.queue_timeout = queue_timeout
+        # CPU seconds the worker spent on the last extraction, OCR included
+        self.worker_cpu_seconds: Optional[float] = None
+        self._cpu_seconds = 0.0
+        self._ocr_stats = TierStats(parent=OCR_TIER_STATS)
+        self._page_methods: List[str] = []
+        self._extraction_method: Optional[ExtractionMethod] = None
+        self._links: Optional[Dict[str, List[str]]] = None
+        self._worker: Optional[ExtractionWorker] = None
+        self._lock = threading.Lock()
+        self._close_requested = False
+
+    def __enter__(self) -> "WorkerProcessor":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def extraction_method(self) -> Optional[ExtractionMethod]:
+        return self._extraction_method
+
+    @property
+    def ocr_stats(self) -> Dict[str, Dict[str, Any]]:
+        return self._ocr_stats.summary()
+
+    @property
+    def page_methods(self) -> List[str]:
+        return list(self._page_methods)
+
+    def cancel(self):
+        """Stop the extraction; a worker in the middle of this document is killed"""
+        self.cancel_event.set()
+
+    def _ensure_worker(self) -> ExtractionWorker:
+        if self._worker is None:
+            worker = self.pool.checkout(self.queue_timeout, self.cancel_event)
+            self._worker = worker
+            worker.documents += 1
+            self._roundtrip(worker, ('open', self.document.path, len(self.document), self.mime_type, self.ocr_policy))
+        return self._worker
+
+    def _roundtrip(self, worker: ExtractionWorker, message: Tuple) -> Any:
+        try:
+            worker.request(message)
+            return self._apply(worker, worker.receive(self.cancel_event))
+        except ProcessingCancelled:
+            self._abandon(worker, 'killed')
+            raise
+        except ExtractionWorkerCrashed:
+            self._abandon(worker, 'crashed')
+            raise
+
+    def _apply(self, worker: ExtractionWorker, message: Tuple) -> Any:
+        """Mirror the state the worker reported with its reply, and return or raise the reply"""
+        if message[0] not in ('result', 'error'):
+            raise ExtractionWorkerCrashed(f"Unexpected message from extraction worker: {message[0]}")
+        _, value, state = message
+        self._page_methods = state['page_methods']
+        self._extraction_method = state['extraction_method']
+        if state['links'] is not None:
+            self._links = state['links']
+        self._ocr_stats.add(state['ocr_tiers'])
+        metrics.merge(state['metrics'])
+        worker.rss_mb = state['rss_mb']
+        self._cpu_seconds = state['cpu_seconds']
+        if message[0] == 'error':
+            raise value
+        return value
+
+    def _abandon(self, worker: ExtractionWorker, reason: str):
+        """Drop a worker whose conversation about this document did not finish cleanly"""
+        if self._worker is worker:
+            self._worker = None
+            self.pool.discard(worker, reason)
+
+    def _call(self, name: str) -> Any:
+        try:
+            with self._lock:
+                return self._roundtrip(self._ensure_worker(), ('call', name))
+        finally:
+            self._release_if_idle()
+
+    def cost_features(self) -> Dict[str, float]:
+        return self._call('cost_features')
+
+    def process(self) -> Tuple[str, ExtractionMethod]:
+        result = self._call('process')
+        self.worker_cpu_seconds = self._cpu_seconds
+        return result
+
+    def extract_links(self) -> Dict[str, List[str]]:
+        if self._links is not None:
+            return self._links
+        return self._call('extract_links')
+
+    def iter_pages(self) -> Iterator[Dict]:
+        """Pages as the worker finishes them; the worker is killed if the caller stops early"""
+        try:
+            with self._lock:
+                worker = self._ensure_worker()
+                try:
+                    worker.request(('pages',))
+                    while True:
+                        message = worker.receive(self.cancel_event)
+                        if message[0] != 'page':
+                            break
+                        yield message[1]
+                except ExtractionWorkerCrashed:
+                    self._abandon(worker, 'crashed')
+                    raise
+                except BaseException:
+                    # Cancelled, or the caller stopped early, with pages still coming
+                    self._abandon(worker, 'killed')
+                    raise
+                self._apply(worker, message)
+                self.worker_cpu_seconds = self._cpu_seconds
+        finally:
+            self._release_if_idle()
+
+    def close(self):
+        """Free the worker for the next document; if a call is still running, once it returns"""
+        self._close_requested = True
+        self._release_if_idle()
+
+    def _release_if_idle(self):
+        if not self._close_requested or not self._lock.acquire(blocking=False):
+            return
+        try:
+            worker, self._worker = self._worker, None
+            if worker is None:
+                return
+            # The reply is read by the worker's next user, so closing never waits for the worker
+            try:
+                worker.request(('close',))
+            except ExtractionWorkerCrashed:
+                self.pool.discard(worker, 'crashed')
+                return
+            worker.closing = True
+            self.pool.release(worker)
+        finally:
+            self._lock.release()
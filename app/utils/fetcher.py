@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import os
+import re
+from typing import TYPE_CHECKING, Callable, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+from app.utils.spool import SpooledDocument, suffix_for
+
+# httpx and boto3 are imported on first use; boto3 alone adds a noticeable share of startup time
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+# Downloads larger than this are rejected before or while they stream in
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(50 * 1024 * 1024)))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "60"))
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "100"))
+FETCH_VERIFY_TLS = os.getenv("FETCH_VERIFY_TLS", "true").lower() in ("1", "true", "yes")
+# Read S3 URLs through the S3 API instead of HTTP (presigned URLs always use HTTP)
+S3_DIRECT_READS = os.getenv("S3_DIRECT_READS", "true").lower() in ("1", "true", "yes")
+# Alternative S3 endpoint, e.g. a MinIO or moto server
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+# Leading bytes used to sniff the file type before the rest is downloaded
+SNIFF_BYTES = 8192
+CHUNK_SIZE = 256 * 1024
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+_VIRTUAL_HOSTED_S3 = re.compile(r'^(?P<bucket>.+)\.s3(?:[.-](?P<region>[a-z0-9-]+))?\.amazonaws\.com$')
+_PATH_STYLE_S3 = re.compile(r'^s3(?:[.-](?P<region>[a-z0-9-]+))?\.amazonaws\.com$')
+
+class FetchError(Exception):
+    """Raised when a document cannot be downloaded; carries the HTTP status to return"""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+class S3Unavailable(FetchError):
+    """Raised when the S3 API cannot be used for an object: missing credentials, no access or no endpoint"""
+
+# Called with the first bytes and the filename; raises to reject the download early
+Sniffer = Callable[[bytes, str], None]
+
+_http_client: Optional["httpx.AsyncClient"] = None
+_s3_client = None
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def get_http_client() -> "httpx.AsyncClient":
+    """Application-wide HTTP client with connection pooling, keep-alive and HTTP/2 where available"""
+    global _http_client
+    if _http_client is None:
+        import httpx
+
+        _http_client = httpx.AsyncClient(
+            http2=_http2_available(),
+            verify=FETCH_VERIFY_TLS,
+            follow_redirects=True,
+            timeout=FETCH_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=FETCH_MAX_CONNECTIONS,
+                max_keepalive_connections=FETCH_MAX_CONNECTIONS // 2
+            ),
+            headers={
+                'User-Agent': USER_AGENT,
+                'Accept': '*/*'
+            }
+        )
+    return _http_client
+
+def get_s3_client():
+    """Shared S3 client; boto3 clients are thread-safe"""
+    global _s3_client
+    if _s3_client is None:
+        import boto3
+        from botocore.config import Config
+
+        _s3_client = boto3.client(
+            's3',
+            endpoint_url=S3_ENDPOINT_URL,
+            config=Config(max_pool_connections=FETCH_MAX_CONNECTIONS)
+        )
+    return _s3_client
+
+async def close_clients():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+def extract_s3_details_from_url(url: str) -> Optional[Tuple[str, str]]:
+    """Return (bucket, key) for s3:// and unsigned amazonaws.com S3 URLs, None for anything else"""
+    parsed = urlparse(url)
+    if parsed.scheme == 's3':
+        key = parsed.path.lstrip('/')
+        return (parsed.netloc, unquote(key)) if parsed.netloc and key else None
+    if parsed.scheme not in ('http', 'https'):
+        return None
+
+    # Presigned URLs must keep their signature, so they are fetched over HTTP
+    query = parse_qs(parsed.query)
+    if 'X-Amz-Signature' in query or 'Signature' in query:
+        return None
+
+    host = parsed.hostname or ''
+    path = unquote(parsed.path.lstrip('/'))
+    match = _VIRTUAL_HOSTED_S3.match(host)
+    if match and path:
+        return match.group('bucket'), path
+    if _PATH_STYLE_S3.match(host) and '/' in path:
+        bucket, key = path.split('/', 1)
+        return (bucket, key) if key else None
+    return None
+
+def _filename_from_url(url: str) -> str:
+    return unquote(url.split('/')[-1].split('?')[0])
+
+async def fetch_url(url: str, sniff: Sniffer, max_bytes: int = FETCH_MAX_BYTES) -> Tuple[SpooledDocument, str, str]:
+    """Download a document straight to a spooled file and return (document, filename, content type).
+
+    Oversized documents are rejected from Content-Length or as soon as the byte cap is crossed,
+    and the first bytes are passed to ``sniff`` so unsupported files stop before the full download.
+    The caller owns the returned document and must close it.
+    """
+    scheme = urlparse(url).scheme
+    s3_location = extract_s3_details_from_url(url) if S3_DIRECT_READS else None
+    if s3_location is not None:
+        try:
+            return await fetch_s3_object(*s3_location, sniff=sniff, max_bytes=max_bytes)
+        except S3Unavailable as e:
+            # Public objects are still readable over HTTP when the S3 API is not usable here
+            if scheme not in ('http', 'https'):
+                raise
+            logger.warning(f"Direct S3 read failed ({e.detail}), fetching over HTTP instead")
+    if scheme == 's3':
+        raise FetchError(f"Invalid S3 URL: {url}")
+    return await _fetch_http(url, sniff, max_bytes)
+
+async def _fetch_http(url: str, sniff: Sniffer, max_bytes: int) -> Tuple[SpooledDocument, str, str]:
+    import httpx
+
+    filename = _filename_from_url(url)
+    document = SpooledDocument(suffix_for(filename))
+    try:
+        async with get_http_client().stream('GET', url) as response:
+            logger.info(f"URL response status: {response.status_code}")
+            if response.status_code != 200:
+                raise FetchError(f"Could not download file from URL. Status code: {response.status_code}")
+
+            content_length = response.headers.get('content-length')
+            if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                raise FetchError(f"Document exceeds maximum allowed size ({max_bytes} bytes)", status_code=413)
+
+            # Only the leading bytes are kept in memory, for sniffing
+            head = bytearray()
+            sniffed = False
+            # Chunks are taken as they arrive, so the sniff runs once its leading bytes are in
+            async for chunk in response.aiter_bytes():
+                document.write(chunk)
+                if document.size > max_bytes:
+                    raise FetchError(f"Document exceeds maximum allowed size ({max_bytes} bytes)", status_code=413)
+                if not sniffed:
+                    head.extend(chunk[:SNIFF_BYTES - len(head)])
+                    if len(head) >= SNIFF_BYTES:
+                        sniff(bytes(head), filename)
+                        sniffed = True
+            if not sniffed:
+                sniff(bytes(head), filename)
+
+            return document.finish(), filename, response.headers.get('content-type', '')
+    except httpx.HTTPError as e:
+        document.close()
+        raise FetchError(f"Could not download file from URL: {str(e)}")
+    except BaseException:
+        document.close()
+        raise
+
+async def fetch_s3_object(bucket: str, key: str, sniff: Sniffer, max_bytes: int = FETCH_MAX_BYTES) -> Tuple[SpooledDocument, str, str]:
+    """Read an S3 object through the shared client into a spooled file, sniffing a ranged read of its head first.
+
+    Raises S3Unavailable when credentials or access are missing, so HTTP URLs can fall back to a plain download.
+    """
+    from botocore.exceptions import BotoCoreError, ClientError
+
+    logger.info(f"Reading S3 object s3://{bucket}/{key}")
+    filename = key.rsplit('/', 1)[-1]
+    client = get_s3_client()
+    document = SpooledDocument(suffix_for(filename))
+    try:
+        head = await asyncio.to_thread(client.head_object, Bucket=bucket, Key=key)
+        size = head['ContentLength']
+        if size > max_bytes:
+            raise FetchError(f"Document exceeds maximum allowed size ({max_bytes} bytes)", status_code=413)
+
+        chunks = []
+        await asyncio.to_thread(_read_range, client, bucket, key, 0, min(size, SNIFF_BYTES) - 1, chunks.append)
+        first = b"".join(chunks)
+        sniff(first, filename)
+        document.write(first)
+        if size > document.size:
+            await asyncio.to_thread(_read_range, client, bucket, key, document.size, size - 1, document.write)
+        return document.finish(), filename, head.get('ContentType', '')
+    except ClientError as e:
+        document.close()
+        code = e.response.get('Error', {}).get('Code', '')
+        logger.error(f"AWS S3 error: {str(e)}")
+        if code in ('403', 'AccessDenied'):
+            raise S3Unavailable(f"Could not read s3://{bucket}/{key} ({code})")
+        if code in ('404', 'NoSuchKey', 'NoSuchBucket'):
+            raise FetchError(f"Could not read s3://{bucket}/{key} ({code})")
+        raise FetchError(f"S3 operation failed: {str(e)}", status_code=500)
+    except BotoCoreError as e:
+        # Missing credentials, unreachable endpoint and similar client-side failures
+        document.close()
+        logger.error(f"AWS S3 error: {str(e)}")
+        raise S3Unavailable(f"S3 is not available for s3://{bucket}/{key}: {str(e)}", status_code=500)
+    except BaseException:
+        document.close()
+        raise
+
+def _read_range(client, bucket: str, key: str, start: int, end: int, write: Callable[[bytes], None]):
+    """Stream a byte range of an object to write in chunks"""
+    if end < start:
+        return
+    response = client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")
+    body = response['Body']
+    try:
+        for chunk in body.iter_chunks(CHUNK_SIZE):
+            write(chunk)
+    finally:
+        body.close()
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+# Largest skew (degrees) corrected before a high-resolution OCR retry, and the search step
+DESKEW_MAX_ANGLE = float(os.getenv("DESKEW_MAX_ANGLE", "5"))
+DESKEW_STEP = 0.25
+# Dark pixels sampled when estimating skew; bounds the angle x pixel matrix
+DESKEW_SAMPLE_PIXELS = 50000
+
+def otsu_threshold(pixels: np.ndarray) -> int:
+    """Gray level that best separates ink from background (Otsu's method)"""
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if not total:
+        return 128
+    weight_background = np.cumsum(hist)
+    weight_foreground = total - weight_background
+    cumulative = np.cumsum(hist * np.arange(256))
+    mean_background = cumulative / np.maximum(weight_background, 1)
+    mean_foreground = (cumulative[-1] - cumulative) / np.maximum(weight_foreground, 1)
+    between_variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+    return int(np.argmax(between_variance))
+
+def estimate_skew(pixels: np.ndarray, threshold: int) -> float:
+    """Angle (degrees) of the text lines, found by maximizing the sharpness of the row projection"""
+    ys, xs = np.nonzero(pixels <= threshold)
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > DESKEW_SAMPLE_PIXELS:
+        sample = np.random.default_rng(0).choice(len(ys), DESKEW_SAMPLE_PIXELS, replace=False)
+        ys, xs = ys[sample], xs[sample]
+
+    angles = np.deg2rad(np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + DESKEW_STEP / 2, DESKEW_STEP))
+    # Row each dark pixel lands on when the page is rotated by each candidate angle
+    rows = np.rint(ys[None, :] * np.cos(angles)[:, None] - xs[None, :] * np.sin(angles)[:, None]).astype(np.int64)
+    rows -= rows.min(axis=1, keepdims=True)
+    height = int(rows.max()) + 1
+    # One bincount for all angles: offset each angle's rows into its own block
+    offsets = np.arange(len(angles))[:, None] * height
+    counts = np.bincount((rows + offsets).ravel(), minlength=len(angles) * height).reshape(len(angles), height)
+    # Lines aligned with the rows concentrate the ink into few rows
+    scores = (counts.astype(np.float64) ** 2).sum(axis=1)
+    return float(np.rad2deg(angles[int(np.argmax(scores))]))
+
+def preprocess_for_ocr(image: Image.Image) -> Image.Image:
+    """Deskew and binarize a grayscale page image"""
+    if image.mode != 'L':
+        image = image.convert('L')
+    pixels = np.asarray(image)
+    threshold = otsu_threshold(pixels)
+    angle = estimate_skew(pixels, threshold)
+    if angle:
+        image = image.rotate(angle, resample=Image.Resampling.BILINEAR, expand=True, fillcolor=255)
+        pixels = np.asarray(image)
+    return Image.fromarray(np.where(pixels > threshold, 255, 0).astype(np.uint8), 'L')
@@ -0,0 +1,283 @@
+import abc
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "900"))  # seconds
+# Finished jobs are kept this long before they are purged from the store
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+# memory, sqlite:///path/to/jobs.sqlite3 or redis://host:port/db
+JOB_STORE_URL = os.getenv("JOB_STORE_URL", "memory")
+
+DEFAULT_PRIORITY = 5
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    TIMED_OUT = "timed_out"
+
+FINISHED_STATUSES = {JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED, JobStatus.TIMED_OUT}
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+class JobStore(abc.ABC):
+    """Persists job records (status, timestamps, result); document bytes never go through the store"""
+
+    @abc.abstractmethod
+    def save(self, job: Dict[str, Any]):
+        ...
+
+    @abc.abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    def purge(self, finished_before: float):
+        """Delete jobs that finished before the given time"""
+
+class MemoryJobStore(JobStore):
+    def __init__(self):
+        self._jobs: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def save(self, job: Dict[str, Any]):
+        with self._lock:
+            self._jobs[job['id']] = json.dumps(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            data = self._jobs.get(job_id)
+        return json.loads(data) if data is not None else None
+
+    def purge(self, finished_before: float):
+        with self._lock:
+            for job_id, data in list(self._jobs.items()):
+                finished_at = json.loads(data).get('finished_at')
+                if finished_at is not None and finished_at < finished_before:
+                    del self._jobs[job_id]
+
+class SQLiteJobStore(JobStore):
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, data TEXT NOT NULL, finished_at REAL)"
+        )
+        self._db.commit()
+
+    def save(self, job: Dict[str, Any]):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs (id, data, finished_at) VALUES (?, ?, ?)",
+                (job['id'], json.dumps(job), job.get('finished_at'))
+            )
+            self._db.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def purge(self, finished_before: float):
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE finished_at < ?", (finished_before,))
+            self._db.commit()
+
+class RedisJobStore(JobStore):
+    """Redis-backed store; finished jobs expire through Redis TTLs"""
+
+    def __init__(self, url: str, ttl: float = JOB_RESULT_TTL):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._ttl = int(ttl)
+
+    def _key(self, job_id: str) -> str:
+        return f"docprocessor:job:{job_id}"
+
+    def save(self, job: Dict[str, Any]):
+        ttl = self._ttl if job.get('finished_at') is not None else None
+        self._redis.set(self._key(job['id']), json.dumps(job), ex=ttl)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        data = self._redis.get(self._key(job_id))
+        return json.loads(data) if data is not None else None
+
+    def purge(self, finished_before: float):
+        pass
+
+def create_job_store(url: str = JOB_STORE_URL) -> JobStore:
+    if url.startswith("sqlite:///"):
+        return SQLiteJobStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisJobStore(url)
+    return MemoryJobStore()
+
+class JobManager:
+    """Bounded priority queue of extraction jobs served by a fixed number of workers.
+
+    ``handler(payload, cancel_event)`` runs in a thread and returns the job result. On timeout or
+    cancellation the event is set, and the worker waits for the handler to actually stop before
+    taking the next job, so abandoned work never piles up behind the workers' backs.
+    ``release(payload)``, if given, is called once a payload is no longer needed: after its job
+    ran, when a cancelled job is skipped, or when queued jobs are dropped on shutdown.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any], threading.Event], Dict[str, Any]],
+        store: Optional[JobStore] = None,
+        workers: int = JOB_WORKERS,
+        max_queued: int = JOB_QUEUE_SIZE,
+        timeout: float = JOB_TIMEOUT,
+        release: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        self.handler = handler
+        self.release = release
+        self.store = store or create_job_store()
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks = []
+        self._sequence = itertools.count()
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._running = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} job workers (queue size {self.max_queued})")
+
+    async def stop(self):
+        for event in self._cancel_events.values():
+            event.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while self._queue is not None and not self._queue.empty():
+            _, _, _, payload = self._queue.get_nowait()
+            self._release(payload)
+
+    def _release(self, payload: Dict[str, Any]):
+        if self.release is None:
+            return
+        try:
+            self.release(payload)
+        except Exception as e:
+            logger.error(f"Failed to release job payload: {str(e)}")
+
+    def submit(self, payload: Dict[str, Any], metadata: Dict[str, Any], priority: int = DEFAULT_PRIORITY) -> Dict[str, Any]:
+        """Queue a job; lower priority values run first. Raises JobQueueFull when at capacity."""
+        if self._queue is None:
+            raise RuntimeError("JobManager has not been started")
+        if self._queue.full():
+            raise JobQueueFull(f"Job queue is full ({self.max_queued} jobs waiting)")
+
+        self.store.purge(time.time() - JOB_RESULT_TTL)
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': JobStatus.QUEUED.value,
+            'priority': priority,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+            **metadata
+        }
+        self.store.save(job)
+        self._cancel_events[job['id']] = threading.Event()
+        self._queue.put_nowait((priority, next(self._sequence), job['id'], payload))
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued or running job and return its record"""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+        if job['status'] == JobStatus.QUEUED.value:
+            self._finish(job, JobStatus.CANCELLED, error="Job was cancelled")
+        return job
+
+    def _finish(self, job: Dict[str, Any], status: JobStatus, result=None, error: Optional[str] = None):
+        job.update(status=status.value, finished_at=time.time(), result=result, error=error)
+        self.store.save(job)
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, job_id, payload = await self._queue.get()
+            try:
+                await self._run(job_id, payload)
+            except Exception as e:
+                logger.error(f"Job worker {index} failed on job {job_id}: {str(e)}", exc_info=True)
+            finally:
+                self._cancel_events.pop(job_id, None)
+                self._release(payload)
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, payload: Dict[str, Any]):
+        job = self.store.get(job_id)
+        cancel_event = self._cancel_events.get(job_id)
+        if job is None or cancel_event is None or job['status'] != JobStatus.QUEUED.value:
+            return
+
+        job.update(status=JobStatus.RUNNING.value, started_at=time.time())
+        self.store.save(job)
+        self._running += 1
+        task = asyncio.ensure_future(asyncio.to_thread(self.handler, payload, cancel_event))
+        try:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(task), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Job {job_id} timed out after {self.timeout} seconds, cancelling")
+                cancel_event.set()
+                await asyncio.gather(task, return_exceptions=True)
+                self._finish(job, JobStatus.TIMED_OUT, error=f"Processing exceeded the {self.timeout} second timeout")
+                return
+            except Exception as e:
+                if cancel_event.is_set():
+                    self._finish(job, JobStatus.CANCELLED, error="Job was cancelled")
+                else:
+                    self._finish(job, JobStatus.FAILED, error=str(e) or "An unexpected error occurred")
+                return
+            self._finish(job, JobStatus.SUCCEEDED, result=result)
+        finally:
+            self._running -= 1
@@ -0,0 +1,137 @@
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from app.utils.metrics import stage
+
+# Platforms links are categorized into; each gets a "<platform>_links" list in the response.
+# LINK_PLATFORMS adds or overrides entries, e.g. "gitlab.com=gitlab,kaggle.com=kaggle,janedoe.dev=personal".
+# Subdomains match their parent (gist.github.com is github) unless listed themselves.
+DEFAULT_LINK_PLATFORMS = {
+    'linkedin.com': 'linkedin',
+    'github.com': 'github',
+    'stackoverflow.com': 'stackoverflow',
+}
+
+def _parse_platforms(value: str) -> Dict[str, str]:
+    platforms = {}
+    for entry in value.split(','):
+        domain, _, platform = entry.partition('=')
+        if domain.strip() and platform.strip():
+            platforms[domain.strip().lower()] = platform.strip().lower()
+    return platforms
+
+LINK_PLATFORMS = {**DEFAULT_LINK_PLATFORMS, **_parse_platforms(os.getenv("LINK_PLATFORMS", ""))}
+
+# One pass over the text finds every kind of token; alternatives are tried in this order at each position
+_TOKEN_PATTERN = re.compile(r"""
+    (?P<email>[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})
+  | (?P<url>(?:https?://|www\.)[^\s<>"'`{}|\\^\[\]]+)
+  | (?P<bare>(?<![\w@.-])(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,}/[^\s<>"'`{}|\\^\[\]]*)
+  | (?P<phone>(?<![\w+])(?:
+        \+\d{1,3}[\s.-]?(?:\(\d{1,4}\)[\s.-]?)?\d{1,4}(?:[\s.-]?\d{2,4}){1,4}   # international: +44 20 7946 0958
+      | \(\d{2,4}\)[\s.-]?\d{3,4}[\s.-]?\d{3,4}                              # area code: (555) 123-4567
+      | 0[1-9]\d{0,3}[\s.-]\d{3,4}[\s.-]?\d{3,4}                               # trunk prefix: 030 1234 5678
+      | [2-9]\d{2}[\s.-]\d{3}[\s.-]\d{4}                                       # North American: 555-123-4567
+    )(?!\w))
+""", re.VERBOSE)
+_TRAILING_PUNCTUATION = '.,;:!?)\'"'
+PHONE_MIN_DIGITS = 7
+PHONE_MAX_DIGITS = 15
+
+class DomainTrie:
+    """Maps hostnames to platforms by walking their labels from the TLD down; the longest listed suffix wins"""
+
+    _PLATFORM = ''
+
+    def __init__(self, table: Dict[str, str]):
+        self._root: Dict = {}
+        for domain, platform in table.items():
+            node = self._root
+            for label in reversed(domain.lower().split('.')):
+                node = node.setdefault(label, {})
+            node[self._PLATFORM] = platform
+
+    def lookup(self, host: str) -> Optional[str]:
+        node = self._root
+        platform = None
+        for label in reversed(host.split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            platform = node.get(self._PLATFORM, platform)
+        return platform
+
+def _host(uri: str) -> str:
+    try:
+        return urlsplit(uri if '://' in uri else f"http://{uri}").hostname or ''
+    except ValueError:
+        return ''
+
+class LinkCollector:
+    """Collects links, emails and phone numbers from annotations, hyperlinks and extracted text.
+
+    Feed it page by page while text is extracted; result() returns de-duplicated lists in the
+    order the links were first seen.
+    """
+
+    def __init__(self, platforms: Optional[Dict[str, str]] = None):
+        platforms = LINK_PLATFORMS if platforms is None else platforms
+        self._trie = DomainTrie(platforms)
+        categories = ['web'] + sorted(set(platforms.values())) + ['email', 'phone', 'text', 'annotation']
+        # Dicts keep insertion order and act as ordered sets
+        self._links: Dict[str, Dict[str, None]] = {f"{category}_links": {} for category in categories}
+
+    def _categorize(self, uri: str):
+        platform = self._trie.lookup(_host(uri))
+        self._links[f"{platform or 'web'}_links"][uri] = None
+
+    def add_uri(self, uri: str, source: str = 'annotation'):
+        """Add an embedded link (PDF annotation or DOCX hyperlink).
+
+        mailto: and tel: links are kept as web links, as before, and their address or number is
+        also added to the email or phone links.
+        """
+        self._links[f"{source}_links"][uri] = None
+        lower = uri.lower()
+        if lower.startswith('mailto:'):
+            self._links['email_links'][uri[7:].split('?')[0]] = None
+            self._links['web_links'][uri] = None
+            return
+        if lower.startswith('tel:'):
+            self._links['phone_links'][uri[4:]] = None
+            self._links['web_links'][uri] = None
+            return
+        self._categorize(uri)
+
+    def add_uris(self, uris: Iterable[str], source: str = 'annotation'):
+        for uri in uris:
+            self.add_uri(uri, source)
+
+    def add_text(self, text: str):
+        """Scan extracted text once for URLs, emails and phone numbers"""
+        with stage('links'):
+            self._scan(text)
+
+    def _scan(self, text: str):
+        for match in _TOKEN_PATTERN.finditer(text):
+            kind = match.lastgroup
+            token = match.group()
+            if kind == 'email':
+                self._links['email_links'][token] = None
+            elif kind == 'phone':
+                digits = sum(char.isdigit() for char in token)
+                if PHONE_MIN_DIGITS <= digits <= PHONE_MAX_DIGITS:
+                    self._links['phone_links'][" ".join(token.split())] = None
+            else:
+                uri = token.rstrip(_TRAILING_PUNCTUATION)
+                if uri:
+                    self._links['text_links'][uri] = None
+                    self._categorize(uri)
+
+    def result(self) -> Dict[str, List[str]]:
+        return {key: list(values) for key, values in self._links.items()}
+
+def empty_links() -> Dict[str, List[str]]:
+    return LinkCollector().result()
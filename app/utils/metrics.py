@@ -0,0 +1,245 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prometheus metrics at /metrics; when off, the stage helpers below do no work
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# OpenTelemetry spans per stage; needs opentelemetry-api plus an SDK/exporter configured by the deployment
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Stage durations range from sub-millisecond text reads to multi-minute conversions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def drain(self) -> Dict[Tuple, float]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[Tuple, float]):
+        for labelvalues, amount in values.items():
+            self.inc(*labelvalues, amount=amount)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # labels -> (per-bucket counts with a final +Inf slot, sum, count)
+        self._values: Dict[Tuple, List] = {}
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def drain(self) -> Dict[Tuple, List]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[Tuple, List]):
+        with self._lock:
+            for labelvalues, (counts, total, count) in values.items():
+                state = self._values.get(labelvalues)
+                if state is None:
+                    state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labelvalues, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = 'le="+Inf"' if bound == float('inf') else f'le="{float(bound)}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {count}")
+        return lines
+
+STAGE_SECONDS = Histogram(
+    'docprocessor_stage_seconds',
+    'Seconds spent in each pipeline stage (download, sniff, estimate, convert, render, ocr, text_layer, docx, links)',
+    ('stage',)
+)
+EXTRACTION_SECONDS = Histogram(
+    'docprocessor_extraction_seconds',
+    'Seconds from the start of extraction to the extracted text, by MIME type and overall method',
+    ('mime_type', 'method')
+)
+PAGES = Counter('docprocessor_pages_total', 'Pages extracted, by MIME type and page method', ('mime_type', 'method'))
+OCR_SECONDS = Counter('docprocessor_ocr_worker_seconds_total', 'Seconds OCR workers spent on pages, by tier', ('tier',))
+METRICS = [STAGE_SECONDS, EXTRACTION_SECONDS, PAGES, OCR_SECONDS]
+
+# Callbacks returning (name, help, {labels}, value) samples read at scrape time
+GaugeSample = Tuple[str, str, Dict[str, str], float]
+_gauge_callbacks: List[Callable[[], Iterable[GaugeSample]]] = []
+_counter_callbacks: List[Callable[[], Iterable[GaugeSample]]] = []
+
+def register_gauges(callback: Callable[[], Iterable[GaugeSample]]):
+    """Add a callback whose gauges (queue depths, utilization, cache hit rates) are read on every scrape"""
+    _gauge_callbacks.append(callback)
+
+def register_counters(callback: Callable[[], Iterable[GaugeSample]]):
+    """Add a callback whose running totals (cache hits, worker restarts) are exported as counters.
+
+    Names end in _total, like the counters above.
+    """
+    _counter_callbacks.append(callback)
+
+_tracer = None
+
+def _get_tracer():
+    global _tracer
+    if _tracer is None:
+        from opentelemetry import trace
+
+        _tracer = trace.get_tracer("docprocessor")
+    return _tracer
+
+_NOOP = nullcontext()
+
+def stage(name: str, **attributes: Any) -> ContextManager:
+    """Time a pipeline stage into the stage histogram and, with tracing, wrap it in a span.
+
+    With metrics and tracing both disabled this returns a shared no-op context manager.
+    """
+    if not METRICS_ENABLED and not TRACING_ENABLED:
+        return _NOOP
+    return _stage(name, attributes)
+
+@contextmanager
+def _stage(name: str, attributes: Dict[str, Any]) -> Iterator[None]:
+    span = _get_tracer().start_as_current_span(f"docprocessor.{name}", attributes=attributes) if TRACING_ENABLED else _NOOP
+    with span:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if METRICS_ENABLED:
+                STAGE_SECONDS.observe(time.perf_counter() - start, name)
+
+def observe(name: str, seconds: float, **attributes: Any):
+    """Record a stage that was timed elsewhere (e.g. in an OCR worker process) as ending now"""
+    if METRICS_ENABLED:
+        STAGE_SECONDS.observe(seconds, name)
+    if TRACING_ENABLED:
+        end = time.time_ns()
+        span = _get_tracer().start_span(f"docprocessor.{name}", attributes=attributes, start_time=end - int(seconds * 1e9))
+        span.end(end_time=end)
+
+def record_ocr(tier: str, seconds: float):
+    """One page OCRed in a worker: its stage time and the worker seconds it used"""
+    observe('ocr', seconds, tier=tier)
+    if METRICS_ENABLED:
+        OCR_SECONDS.inc(tier, amount=seconds)
+
+def timed(items: Iterable, name: str, **attributes: Any) -> Iterator:
+    """Yield from items, recording the time spent producing each one as a stage (e.g. rendering a page)"""
+    if not METRICS_ENABLED and not TRACING_ENABLED:
+        yield from items
+        return
+    iterator = iter(items)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        observe(name, time.perf_counter() - start, **attributes)
+        yield item
+
+def record_extraction(mime_type: str, method: Optional[str], page_methods: List[str], seconds: float):
+    if not METRICS_ENABLED:
+        return
+    EXTRACTION_SECONDS.observe(seconds, mime_type, method or 'none')
+    for page_method in page_methods:
+        PAGES.inc(mime_type, page_method)
+
+def drain() -> Dict[str, Dict]:
+    """Take this process's samples and reset them, for an extraction worker to hand to the server"""
+    return {metric.name: metric.drain() for metric in METRICS}
+
+def merge(samples: Dict[str, Dict]):
+    """Add samples drained in another process"""
+    for metric in METRICS:
+        if metric.name in samples:
+            metric.merge(samples[metric.name])
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(_render_callbacks(_counter_callbacks, 'counter'))
+    lines.extend(_render_callbacks(_gauge_callbacks, 'gauge'))
+    return "\n".join(lines) + "\n"
+
+def _render_callbacks(callbacks: List[Callable[[], Iterable[GaugeSample]]], kind: str) -> List[str]:
+    # Samples of one metric must be contiguous, so they are grouped by name across callbacks
+    metrics: Dict[str, Tuple[str, List[str]]] = {}
+    for callback in callbacks:
+        try:
+            samples = list(callback())
+        except Exception as e:
+            logger.error(f"Metrics callback failed: {str(e)}")
+            continue
+        for name, documentation, labels, value in samples:
+            sample = f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value}"
+            metrics.setdefault(name, (documentation, []))[1].append(sample)
+    lines = []
+    for name, (documentation, samples) in metrics.items():
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+    return lines
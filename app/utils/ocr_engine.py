@@ -0,0 +1,154 @@
+import abc
+import functools
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# auto (tesserocr when installed, else pytesseract), tesserocr or pytesseract
+OCR_ENGINE = os.getenv("OCR_ENGINE", "auto")
+OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+# Seconds before a single page's tesseract process is killed (pytesseract only)
+OCR_PAGE_TIMEOUT = float(os.getenv("OCR_PAGE_TIMEOUT", "60"))
+
+class OCREngine(abc.ABC):
+    """A Tesseract backend; instances are used by one thread at a time"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def image_to_string(self, image: Image.Image) -> str:
+        ...
+
+    @abc.abstractmethod
+    def image_to_data(self, image: Image.Image, fast: bool = False) -> Tuple[str, List[float]]:
+        """Text plus the confidence (0-100) of every recognized word.
+
+        fast skips Tesseract's second pass over inverted (light on dark) text.
+        """
+
+class TesserocrEngine(OCREngine):
+    """Keeps an initialized Tesseract API handle (language model loaded) alive across pages.
+
+    Grayscale images are passed as raw buffers, so there is no temp file, no encoding and no fork.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, language: str = OCR_LANGUAGE):
+        import tesserocr
+
+        self._api = tesserocr.PyTessBaseAPI(lang=language)
+
+    def _set_image(self, image: Image.Image):
+        if image.mode == 'L':
+            self._api.SetImageBytes(image.tobytes(), image.width, image.height, 1, image.width)
+        else:
+            self._api.SetImage(image)
+
+    def image_to_string(self, image: Image.Image) -> str:
+        # Set on every call: the handle is shared by the thread, and a fast pass turns inversion off
+        self._api.SetVariable('tessedit_do_invert', '1')
+        self._set_image(image)
+        try:
+            return self._api.GetUTF8Text()
+        finally:
+            self._api.Clear()
+
+    def image_to_data(self, image: Image.Image, fast: bool = False) -> Tuple[str, List[float]]:
+        self._api.SetVariable('tessedit_do_invert', '0' if fast else '1')
+        self._set_image(image)
+        try:
+            self._api.Recognize()
+            return self._api.GetUTF8Text(), [float(confidence) for confidence in self._api.AllWordConfidences()]
+        finally:
+            self._api.Clear()
+
+class PytesseractEngine(OCREngine):
+    """Runs the tesseract CLI once per page; used when tesserocr is not installed"""
+
+    name = "pytesseract"
+
+    def __init__(self, language: str = OCR_LANGUAGE):
+        import pytesseract
+
+        self._pytesseract = pytesseract
+        self.language = language
+
+    def image_to_string(self, image: Image.Image) -> str:
+        return self._pytesseract.image_to_string(image, lang=self.language, timeout=OCR_PAGE_TIMEOUT)
+
+    def image_to_data(self, image: Image.Image, fast: bool = False) -> Tuple[str, List[float]]:
+        data = self._pytesseract.image_to_data(
+            image,
+            lang=self.language,
+            config='-c tessedit_do_invert=0' if fast else '',
+            output_type=self._pytesseract.Output.DICT,
+            timeout=OCR_PAGE_TIMEOUT
+        )
+        # Rebuild the text from the word boxes: words joined per line, a blank line between paragraphs
+        lines: Dict[Tuple[int, int, int], List[str]] = {}
+        confidences = []
+        for word, confidence, block, paragraph, line in zip(
+            data['text'], data['conf'], data['block_num'], data['par_num'], data['line_num']
+        ):
+            if not word.strip() or float(confidence) < 0:
+                continue
+            lines.setdefault((block, paragraph, line), []).append(word)
+            confidences.append(float(confidence))
+
+        parts = []
+        previous = None
+        for (block, paragraph, line), words in lines.items():
+            if previous is not None and previous != (block, paragraph):
+                parts.append("")
+            parts.append(" ".join(words))
+            previous = (block, paragraph)
+        return "\n".join(parts), confidences
+
+ENGINES = {
+    'tesserocr': TesserocrEngine,
+    'pytesseract': PytesseractEngine,
+}
+
+_local = threading.local()
+
+def create_engine(name: str = OCR_ENGINE) -> OCREngine:
+    if name != 'auto':
+        return ENGINES[name]()
+    try:
+        return TesserocrEngine()
+    except ImportError:
+        return PytesseractEngine()
+    except Exception as e:
+        logger.error(f"Could not initialize tesserocr, falling back to pytesseract: {str(e)}")
+        return PytesseractEngine()
+
+@functools.lru_cache(maxsize=None)
+def engine_name(name: str = OCR_ENGINE) -> str:
+    """The engine create_engine() ends up with for a name, used to key cached OCR text.
+
+    auto follows the same fallback: tesserocr counts only if a handle can be initialized.
+    """
+    if name != 'auto':
+        return name
+    try:
+        TesserocrEngine()
+    except Exception:
+        return 'pytesseract'
+    return 'tesserocr'
+
+def get_engine(name: Optional[str] = None) -> OCREngine:
+    """Engine for the calling thread, created once and reused across pages and requests"""
+    engines: Dict[str, OCREngine] = getattr(_local, 'engines', None)
+    if engines is None:
+        engines = _local.engines = {}
+    name = name or OCR_ENGINE
+    if name not in engines:
+        engines[name] = create_engine(name)
+        logger.info(f"Initialized {engines[name].name} OCR engine in process {os.getpid()}")
+    return engines[name]
@@ -0,0 +1,219 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from PIL import Image
+
+from app.utils.ocr_engine import get_engine
+
+logger = logging.getLogger(__name__)
+
+# Number of OCR worker processes; 0 runs OCR inline in the calling thread
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+# Documents allowed to OCR at the same time; further requests wait for a slot
+OCR_MAX_DOCUMENTS = int(os.getenv("OCR_MAX_DOCUMENTS", str(max(OCR_WORKERS, 1) * 2)))
+# Seconds a request waits for an OCR slot before it is rejected
+OCR_ADMISSION_TIMEOUT = float(os.getenv("OCR_ADMISSION_TIMEOUT", "30"))
+
+class OCRPoolBusy(Exception):
+    """Raised when the OCR pool cannot admit another document in time"""
+
+def ocr_page(image: Image.Image) -> str:
+    """Run Tesseract on a single page image with this worker's long-lived engine"""
+    return get_engine().image_to_string(image)
+
+def ocr_page_scored(image: Image.Image, fast: bool = False, preprocess: bool = False, confidence: bool = True) -> Dict[str, Any]:
+    """OCR one page and report its text, mean word confidence and the seconds spent in this worker"""
+    start = time.perf_counter()
+    if preprocess:
+        # NumPy is only loaded in workers that actually run a tiered retry
+        from app.utils.image_preprocess import preprocess_for_ocr
+
+        image = preprocess_for_ocr(image)
+    engine = get_engine()
+    if confidence:
+        text, confidences = engine.image_to_data(image, fast=fast)
+        mean_confidence = sum(confidences) / len(confidences) if confidences else None
+    else:
+        text, mean_confidence = engine.image_to_string(image), None
+    return {'text': text, 'confidence': mean_confidence, 'seconds': time.perf_counter() - start}
+
+def warm_up_worker(_=None) -> int:
+    """Load this worker's OCR engine (and language model) and run it once; returns the worker's pid"""
+    get_engine().image_to_string(Image.new('L', (64, 32), 255))
+    return os.getpid()
+
+class OCRPool:
+    """Process pool that OCRs pages concurrently and shares workers fairly between documents.
+
+    Every admitted document may have at most ``workers / active documents`` pages in flight,
+    so one large scan cannot starve other requests, and the total number of pages in flight
+    never exceeds the number of workers.
+    """
+
+    def __init__(self, workers: int = OCR_WORKERS, max_documents: int = OCR_MAX_DOCUMENTS):
+        self.workers = workers
+        self.max_documents = max_documents
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._active = {}
+        self._next_token = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._cond:
+            if self._executor is None:
+                logger.info(f"Starting OCR pool with {self.workers} workers")
+                # Spawn rather than fork: the server process runs threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _submit(self, func: Callable, item) -> Future:
+        try:
+            return self._get_executor().submit(func, item)
+        except BrokenProcessPool:
+            # A worker died (e.g. tesseract crashed); start a fresh pool and retry once
+            logger.error("OCR pool is broken, restarting it")
+            with self._cond:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            return self._get_executor().submit(func, item)
+
+    @contextmanager
+    def _admit(self, timeout: float):
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._active) < self.max_documents, timeout=timeout):
+                raise OCRPoolBusy(
+                    f"OCR capacity exhausted ({self.max_documents} documents in progress)"
+                )
+            token = self._next_token
+            self._next_token += 1
+            self._active[token] = 0
+            self._cond.notify_all()
+        try:
+            yield token
+        finally:
+            with self._cond:
+                del self._active[token]
+                self._cond.notify_all()
+
+    def _has_slot(self, token: int) -> bool:
+        fair_share = max(1, self.workers // max(len(self._active), 1))
+        return self._in_flight < self.workers and self._active[token] < fair_share
+
+    def _acquire(self, token: int, block: bool) -> bool:
+        with self._cond:
+            if block:
+                self._cond.wait_for(lambda: self._has_slot(token))
+            elif not self._has_slot(token):
+                return False
+            self._in_flight += 1
+            self._active[token] += 1
+            return True
+
+    def _release(self, token: int):
+        with self._cond:
+            self._in_flight -= 1
+            if token in self._active:
+                self._active[token] -= 1
+            self._cond.notify_all()
+
+    def map(
+        self,
+        func: Callable,
+        items: Iterable,
+        timeout: float = OCR_ADMISSION_TIMEOUT
+    ) -> Iterator[Future]:
+        """Apply func to items in the worker processes, yielding completed futures in input order.
+
+        Items are pulled from the iterable only when a worker slot is free, so at most
+        a fair share of pages is materialized at once. A failing item does not stop the others;
+        its future carries the exception.
+        """
+        if self.workers <= 0:
+            for item in items:
+                future = Future()
+                try:
+                    future.set_result(func(item))
+                except Exception as e:
+                    future.set_exception(e)
+                yield future
+            return
+
+        with self._admit(timeout) as token:
+            pending = deque()
+            iterator = iter(items)
+            exhausted = False
+            try:
+                while True:
+                    # Block for a slot only when nothing is pending, otherwise drain results first
+                    while not exhausted and self._acquire(token, block=not pending):
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            self._release(token)
+                            exhausted = True
+                            break
+                        except Exception as e:
+                            # The producer failed (e.g. a page could not be rendered) and is finished
+                            self._release(token)
+                            exhausted = True
+                            future = Future()
+                            future.set_exception(e)
+                            pending.append(future)
+                            break
+                        try:
+                            future = self._submit(func, item)
+                        except Exception:
+                            self._release(token)
+                            raise
+                        future.add_done_callback(lambda _, token=token: self._release(token))
+                        pending.append(future)
+                        del item
+                    if not pending:
+                        break
+                    future = pending.popleft()
+                    future.exception()
+                    yield future
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def warm_up(self) -> int:
+        """Start the worker processes and load their OCR engines; returns how many workers were warmed.
+
+        One warm-up task is submitted per worker. Workers are spawned on demand, so this is
+        best effort: a fast worker may take two tasks and leave another cold.
+        """
+        if self.workers <= 0:
+            warm_up_worker()
+            return 1
+        futures = [self._submit(warm_up_worker, None) for _ in range(self.workers)]
+        return len({future.result() for future in futures})
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'pages_in_flight': self._in_flight,
+                'active_documents': len(self._active),
+            }
+
+    def shutdown(self):
+        with self._cond:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+OCR_POOL = OCRPool()
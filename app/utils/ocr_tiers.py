@@ -0,0 +1,125 @@
+import os
+import threading
+from typing import Any, Dict, Optional
+
+# single: one pass at OCR_DPI. tiered: a fast low-DPI pass, then a preprocessed high-DPI
+# retry of the pages whose mean word confidence is below OCR_MIN_CONFIDENCE
+OCR_MODES = ('single', 'tiered')
+OCR_MODE = os.getenv("OCR_MODE", "single")
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "75"))
+OCR_FAST_DPI = int(os.getenv("OCR_FAST_DPI", "100"))
+OCR_RETRY_DPI = int(os.getenv("OCR_RETRY_DPI", "300"))
+# Size limit for retry renders; the regular OCR_MAX_WIDTH would cap them below OCR_RETRY_DPI
+OCR_RETRY_MAX_DIMENSION = int(os.getenv("OCR_RETRY_MAX_DIMENSION", "6000"))
+# OCR pictures embedded in DOCX files; their text is otherwise taken from the document XML alone
+OCR_EMBEDDED_IMAGES = os.getenv("OCR_EMBEDDED_IMAGES", "false").lower() in ("1", "true", "yes")
+
+class OCRPolicy:
+    """How the pages of one document are OCRed"""
+
+    def __init__(
+        self,
+        mode: str = OCR_MODE,
+        min_confidence: float = OCR_MIN_CONFIDENCE,
+        fast_dpi: int = OCR_FAST_DPI,
+        retry_dpi: int = OCR_RETRY_DPI,
+        images: bool = OCR_EMBEDDED_IMAGES
+    ):
+        if mode not in OCR_MODES:
+            raise ValueError(f"Unknown OCR mode: {mode}. Supported modes: {', '.join(OCR_MODES)}")
+        if not 0 <= min_confidence <= 100:
+            raise ValueError("OCR minimum confidence must be between 0 and 100")
+        self.mode = mode
+        self.min_confidence = min_confidence
+        self.fast_dpi = fast_dpi
+        self.retry_dpi = retry_dpi
+        self.images = images
+
+    @classmethod
+    def from_request(
+        cls,
+        mode: Optional[str] = None,
+        min_confidence: Optional[float] = None,
+        images: Optional[bool] = None
+    ) -> "OCRPolicy":
+        """Policy from optional request fields, defaulting to the server configuration"""
+        return cls(
+            mode or OCR_MODE,
+            OCR_MIN_CONFIDENCE if min_confidence is None else min_confidence,
+            images=OCR_EMBEDDED_IMAGES if images is None else images
+        )
+
+    @property
+    def tiered(self) -> bool:
+        return self.mode == 'tiered'
+
+    def settings(self) -> Dict[str, Any]:
+        """Settings that influence OCR output, used to key cached results"""
+        settings: Dict[str, Any] = {'mode': self.mode}
+        if self.tiered:
+            settings.update({
+                'min_confidence': self.min_confidence,
+                'fast_dpi': self.fast_dpi,
+                'retry_dpi': self.retry_dpi,
+                'retry_max_dimension': OCR_RETRY_MAX_DIMENSION,
+            })
+        # Only set when enabled, so keys of existing cached pages stay valid
+        if self.images:
+            settings['images'] = True
+        return settings
+
+class TierStats:
+    """Pages, OCR seconds and mean word confidence per tier, optionally rolled up into a parent"""
+
+    def __init__(self, parent: Optional["TierStats"] = None):
+        self.parent = parent
+        self._lock = threading.Lock()
+        self._tiers: Dict[str, Dict[str, float]] = {}
+
+    def record(self, tier: str, result: Dict[str, Any], kept: bool = True):
+        """Count one OCRed page; kept is False when a retry did not beat the first pass"""
+        with self._lock:
+            stats = self._tiers.setdefault(tier, {
+                'pages': 0, 'kept': 0, 'seconds': 0.0, 'confidence_sum': 0.0, 'scored_pages': 0
+            })
+            stats['pages'] += 1
+            stats['kept'] += int(kept)
+            stats['seconds'] += result['seconds']
+            if result['confidence'] is not None:
+                stats['confidence_sum'] += result['confidence']
+                stats['scored_pages'] += 1
+        if self.parent is not None:
+            self.parent.record(tier, result, kept)
+
+    def drain(self) -> Dict[str, Dict[str, float]]:
+        """Take the raw totals and reset them, for an extraction worker to hand to the server"""
+        with self._lock:
+            tiers, self._tiers = self._tiers, {}
+        return tiers
+
+    def add(self, tiers: Dict[str, Dict[str, float]]):
+        """Add raw totals drained in another process"""
+        with self._lock:
+            for tier, totals in tiers.items():
+                stats = self._tiers.setdefault(tier, dict.fromkeys(totals, 0))
+                for name, value in totals.items():
+                    stats[name] += value
+        if self.parent is not None and tiers:
+            self.parent.add(tiers)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                tier: {
+                    'pages': stats['pages'],
+                    'kept': stats['kept'],
+                    'seconds': round(stats['seconds'], 3),
+                    'mean_confidence': (
+                        round(stats['confidence_sum'] / stats['scored_pages'], 1) if stats['scored_pages'] else None
+                    ),
+                }
+                for tier, stats in self._tiers.items()
+            }
+
+# Totals since startup, exposed at /ocr/stats
+OCR_TIER_STATS = TierStats()
@@ -0,0 +1,298 @@
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Number of warm LibreOffice instances, each with its own user profile
+OFFICE_INSTANCES = int(os.getenv("OFFICE_INSTANCES", "2"))
+OFFICE_CONVERSION_TIMEOUT = float(os.getenv("OFFICE_CONVERSION_TIMEOUT", "60"))
+OFFICE_STARTUP_TIMEOUT = float(os.getenv("OFFICE_STARTUP_TIMEOUT", "30"))
+# Restart an instance after this many conversions to bound LibreOffice memory growth
+OFFICE_MAX_CONVERSIONS = int(os.getenv("OFFICE_MAX_CONVERSIONS", "200"))
+OFFICE_BINARY = os.getenv("OFFICE_BINARY", "soffice")
+
+class OfficeConversionError(Exception):
+    """Raised when LibreOffice cannot convert a document"""
+
+class OfficeConversionTimeout(OfficeConversionError):
+    """Raised when a conversion exceeds its time limit"""
+
+def _uno_available() -> bool:
+    try:
+        import uno  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class OfficeInstance:
+    """One LibreOffice process with an isolated profile.
+
+    With the ``uno`` bindings available the process stays running and is driven over a named
+    pipe. Without them each conversion runs ``soffice --convert-to`` against the instance's
+    already initialized profile, which still avoids profile creation and lock collisions.
+    """
+
+    def __init__(self, index: int, use_uno: bool):
+        self.index = index
+        self.use_uno = use_uno
+        self.profile_dir = tempfile.mkdtemp(prefix=f"docprocessor-lo-{index}-")
+        self.pipe_name = f"docprocessor_{os.getpid()}_{index}"
+        self.conversions = 0
+        self._process: Optional[subprocess.Popen] = None
+        self._desktop = None
+
+    @property
+    def _profile_arg(self) -> str:
+        return f"-env:UserInstallation={Path(self.profile_dir).as_uri()}"
+
+    def start(self):
+        if not self.use_uno:
+            return
+        self._process = subprocess.Popen(
+            [
+                OFFICE_BINARY,
+                '--headless',
+                '--invisible',
+                '--nologo',
+                '--nodefault',
+                '--norestore',
+                '--nolockcheck',
+                self._profile_arg,
+                f'--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext'
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        self._desktop = self._connect()
+        logger.info(f"Started LibreOffice instance {self.index} (pid {self._process.pid})")
+
+    def _connect(self):
+        import uno
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        deadline = time.monotonic() + OFFICE_STARTUP_TIMEOUT
+        while True:
+            if self._process.poll() is not None:
+                raise OfficeConversionError(f"LibreOffice instance {self.index} exited during startup")
+            try:
+                context = resolver.resolve(
+                    f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext"
+                )
+                return context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+            except Exception:
+                if time.monotonic() > deadline:
+                    raise OfficeConversionError(f"LibreOffice instance {self.index} did not start in time")
+                time.sleep(0.25)
+
+    def is_healthy(self) -> bool:
+        if not self.use_uno:
+            return True
+        if self._process is None or self._process.poll() is not None or self._desktop is None:
+            return False
+        try:
+            self._desktop.getFrames()
+            return True
+        except Exception:
+            return False
+
+    def convert(self, input_path: str, output_dir: str, timeout: float) -> str:
+        """Convert input_path to a PDF inside output_dir and return its path"""
+        output_path = os.path.join(output_dir, Path(input_path).stem + '.pdf')
+        if self.use_uno:
+            self._convert_uno(input_path, output_path, timeout)
+        else:
+            self._convert_subprocess(input_path, output_dir, timeout)
+        self.conversions += 1
+
+        if not os.path.exists(output_path):
+            raise OfficeConversionError("LibreOffice produced no PDF")
+        return output_path
+
+    def _convert_uno(self, input_path: str, output_path: str, timeout: float):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def properties(**values):
+            result = []
+            for name, value in values.items():
+                prop = PropertyValue()
+                prop.Name = name
+                prop.Value = value
+                result.append(prop)
+            return tuple(result)
+
+        # Killing the process makes the blocked UNO call fail, which enforces the timeout
+        watchdog = threading.Timer(timeout, self.kill)
+        watchdog.start()
+        try:
+            document = self._desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(input_path)),
+                "_blank",
+                0,
+                properties(Hidden=True, ReadOnly=True)
+            )
+            if document is None:
+                raise OfficeConversionError("LibreOffice could not open the document")
+            try:
+                document.storeToURL(
+                    uno.systemPathToFileUrl(os.path.abspath(output_path)),
+                    properties(FilterName="writer_pdf_Export")
+                )
+            finally:
+                document.close(True)
+        except OfficeConversionError:
+            raise
+        except Exception as e:
+            if not watchdog.is_alive():
+                raise OfficeConversionTimeout(f"LibreOffice conversion timed out after {timeout} seconds")
+            raise OfficeConversionError(f"LibreOffice conversion failed: {str(e)}")
+        finally:
+            watchdog.cancel()
+
+    def _convert_subprocess(self, input_path: str, output_dir: str, timeout: float):
+        try:
+            subprocess.run(
+                [
+                    OFFICE_BINARY,
+                    '--headless',
+                    '--norestore',
+                    '--nolockcheck',
+                    self._profile_arg,
+                    '--convert-to',
+                    'pdf',
+                    '--outdir',
+                    output_dir,
+                    input_path
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout,
+                check=True
+            )
+        except subprocess.TimeoutExpired:
+            raise OfficeConversionTimeout(f"LibreOffice conversion timed out after {timeout} seconds")
+        except subprocess.CalledProcessError as e:
+            raise OfficeConversionError(f"LibreOffice exited with status {e.returncode}")
+
+    def kill(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        self._desktop = None
+
+    def stop(self):
+        if self._desktop is not None:
+            try:
+                self._desktop.terminate()
+            except Exception:
+                pass
+        self.kill()
+        self._process = None
+
+    def restart(self):
+        logger.info(f"Restarting LibreOffice instance {self.index}")
+        self.stop()
+        # A crashed instance can leave a broken profile behind
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+        self.profile_dir = tempfile.mkdtemp(prefix=f"docprocessor-lo-{self.index}-")
+        self.conversions = 0
+        self.start()
+
+    def close(self):
+        self.stop()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+class OfficeConverterPool:
+    """Pool of warm LibreOffice instances shared by all requests"""
+
+    def __init__(self, size: int = OFFICE_INSTANCES, timeout: float = OFFICE_CONVERSION_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.Queue[OfficeInstance]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._instances = []
+
+    def start(self):
+        """Start all instances; called lazily on first conversion or during warm-up"""
+        with self._lock:
+            if self._instances:
+                return
+            use_uno = _uno_available()
+            if not use_uno:
+                logger.info("Python UNO bindings not found, converting with soffice --convert-to")
+            for index in range(self.size):
+                instance = OfficeInstance(index, use_uno)
+                try:
+                    instance.start()
+                except Exception as e:
+                    logger.error(f"Failed to start LibreOffice instance {index}: {str(e)}")
+                self._instances.append(instance)
+                self._idle.put(instance)
+
+    def convert_to_pdf(self, file_bytes: bytes, suffix: str, source_path: Optional[str] = None) -> bytes:
+        """Convert a DOC/DOCX document to PDF bytes.
+
+        With ``source_path`` the document already on disk is linked into the work directory
+        instead of being written out again.
+        """
+        self.start()
+        try:
+            instance = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise OfficeConversionError("No LibreOffice instance became available in time")
+
+        work_dir = tempfile.mkdtemp(prefix="docprocessor-convert-")
+        try:
+            input_path = os.path.join(work_dir, f"document{suffix}")
+            if source_path is not None:
+                os.symlink(os.path.abspath(source_path), input_path)
+            else:
+                with open(input_path, 'wb') as input_file:
+                    input_file.write(file_bytes)
+
+            for attempt in range(2):
+                if not instance.is_healthy() or instance.conversions >= OFFICE_MAX_CONVERSIONS:
+                    instance.restart()
+                try:
+                    output_path = instance.convert(input_path, work_dir, self.timeout)
+                    with open(output_path, 'rb') as pdf_file:
+                        return pdf_file.read()
+                except OfficeConversionError as e:
+                    logger.error(f"LibreOffice instance {instance.index} failed (attempt {attempt + 1}): {str(e)}")
+                    if isinstance(e, OfficeConversionTimeout) or instance.is_healthy() or attempt == 1:
+                        # The document itself is the problem, or the retry failed as well;
+                        # a killed instance is restarted on its next use
+                        raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            self._idle.put(instance)
+
+    def warm_up(self):
+        """Start every instance and run one small conversion on each, so profiles are initialized before traffic"""
+        self.start()
+        # Idle instances are handed out in FIFO order, so consecutive conversions visit each one
+        for _ in range(self.size):
+            self.convert_to_pdf(b"warm-up", '.txt')
+
+    def is_ready(self) -> bool:
+        return bool(self._instances) and any(instance.is_healthy() for instance in self._instances)
+
+    def shutdown(self):
+        with self._lock:
+            for instance in self._instances:
+                instance.close()
+            self._instances = []
+            self._idle = queue.Queue()
+
+OFFICE_POOL = OfficeConverterPool()
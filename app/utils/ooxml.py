@@ -0,0 +1,251 @@
+import io
+import logging
+import posixpath
+import re
+import zipfile
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from xml.etree.ElementTree import iterparse
+
+logger = logging.getLogger(__name__)
+
+# Parts read around the main document: headers before the body, footers and notes after it
+HEADER_RELATIONSHIPS = ('/header',)
+TRAILER_RELATIONSHIPS = ('/footer', '/footnotes', '/endnotes')
+_HYPERLINK_FIELD = re.compile(r'HYPERLINK\s+"([^"]+)"')
+# Containers whose finished children are dropped while parsing, which keeps memory bounded
+_BLOCK_CONTAINERS = {'body', 'hdr', 'ftr', 'footnotes', 'endnotes'}
+# Content that duplicates (mc:Fallback) or no longer belongs to (w:moveFrom) the visible text
+_SKIPPED = {'Fallback', 'moveFrom'}
+_PAGE_BREAK = object()
+
+def _local(name: str) -> str:
+    """Name without its namespace, so transitional and strict OOXML parse alike"""
+    return name.rsplit('}', 1)[-1]
+
+def _attr(element, name: str) -> Optional[str]:
+    for key, value in element.attrib.items():
+        if _local(key) == name:
+            return value
+    return None
+
+def _rels_path(part: str) -> str:
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, '_rels', f"{name}.rels")
+
+class DocxReader:
+    """Streams the text of a DOCX package straight from the zip, without building an object model.
+
+    The main document and its headers, footers, footnotes and endnotes are read with iterparse,
+    one paragraph or table at a time, so memory stays bounded for large documents. Paragraphs in
+    tables, text boxes and content controls are included; table cells are separated by tabs.
+    """
+
+    def __init__(self, source: Union[bytes, str]):
+        self._zip = zipfile.ZipFile(source if isinstance(source, str) else io.BytesIO(source))
+        self._hyperlinks: Dict[str, None] = {}
+        try:
+            self.document_part = self._main_part()
+        except Exception:
+            self._zip.close()
+            raise
+
+    def __enter__(self) -> "DocxReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._zip.close()
+
+    @property
+    def hyperlinks(self) -> List[str]:
+        """External hyperlinks referenced by the parts read so far, in first-seen order"""
+        return list(self._hyperlinks)
+
+    def read_part(self, part: str) -> bytes:
+        return self._zip.read(part)
+
+    def _main_part(self) -> str:
+        for rel_type, target, _ in self._relationships('').values():
+            if rel_type.endswith('/officeDocument'):
+                return target
+        if 'word/document.xml' in self._zip.namelist():
+            return 'word/document.xml'
+        raise ValueError("Not a WordprocessingML package: no main document part")
+
+    def _relationships(self, part: str) -> Dict[str, Tuple[str, str, bool]]:
+        """Relationship id -> (type, target, external) for a part; internal targets become part names"""
+        path = _rels_path(part) if part else '_rels/.rels'
+        try:
+            data = self._zip.read(path)
+        except KeyError:
+            return {}
+        relationships = {}
+        for _, element in iterparse(io.BytesIO(data)):
+            if _local(element.tag) != 'Relationship':
+                continue
+            target = element.get('Target', '')
+            external = element.get('TargetMode') == 'External'
+            if not external:
+                if target.startswith('/'):
+                    target = target[1:]
+                else:
+                    target = posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+            relationships[element.get('Id')] = (element.get('Type', ''), target, external)
+        return relationships
+
+    def _related_parts(self, suffixes: Tuple[str, ...], relationships: Dict[str, Tuple[str, str, bool]]) -> List[str]:
+        parts = []
+        for suffix in suffixes:
+            for rel_type, target, external in relationships.values():
+                if rel_type.endswith(suffix) and not external and target not in parts and target in self._zip.NameToInfo:
+                    parts.append(target)
+        return parts
+
+    def iter_pages(self) -> Iterator[Dict]:
+        """Yield {'text', 'images'} per page, splitting the body at explicit page breaks.
+
+        Header text is prepended to the first page and footer and note text appended to the last;
+        headers repeated across sections are only included once. 'images' lists the part names
+        of the pictures on the page, for callers that OCR them.
+        """
+        relationships = self._relationships(self.document_part)
+        header = self._part_lines(self._related_parts(HEADER_RELATIONSHIPS, relationships))
+        trailer = self._part_lines(self._related_parts(TRAILER_RELATIONSHIPS, relationships))
+
+        lines: List[str] = list(header)
+        images: Dict[str, None] = {}
+        previous = None
+        for item in self._iter_part(self.document_part, relationships):
+            if item is _PAGE_BREAK:
+                if "".join(lines).strip() or images:
+                    if previous is not None:
+                        yield previous
+                    previous = {'text': "\n".join(lines), 'images': list(images)}
+                lines, images = [], {}
+            elif isinstance(item, tuple):
+                images[item[1]] = None
+            else:
+                lines.append(item)
+
+        if "".join(lines).strip() or images:
+            if previous is not None:
+                yield previous
+            previous = {'text': "\n".join(lines), 'images': list(images)}
+        if previous is None and trailer:
+            previous = {'text': "", 'images': []}
+        if previous is not None:
+            previous['text'] = "\n".join(line for line in [previous['text']] + trailer if line)
+            yield previous
+
+    def _part_lines(self, parts: List[str]) -> List[str]:
+        """Non-empty lines of small side parts (headers, footers, notes), skipping repeated parts"""
+        lines: List[str] = []
+        seen = set()
+        for part in parts:
+            part_lines = [
+                item for item in self._iter_part(part, self._relationships(part))
+                if isinstance(item, str) and item.strip()
+            ]
+            key = tuple(part_lines)
+            if part_lines and key not in seen:
+                seen.add(key)
+                lines.extend(part_lines)
+        return lines
+
+    def _iter_part(self, part: str, relationships: Dict[str, Tuple[str, str, bool]]) -> Iterator:
+        """Yield a part's lines in reading order, _PAGE_BREAK markers and ('image', part) references"""
+        paragraphs: List[List[str]] = []
+        rows: List[List[str]] = []
+        cells: List[List[str]] = []
+        stack = []
+        skipped = 0
+        runs = 0
+
+        with self._zip.open(part) as stream:
+            for event, element in iterparse(stream, events=('start', 'end')):
+                name = _local(element.tag)
+                if event == 'start':
+                    stack.append(element)
+                    if name in _SKIPPED:
+                        skipped += 1
+                    if skipped:
+                        continue
+                    if name == 'p':
+                        paragraphs.append([])
+                    elif name == 'r':
+                        runs += 1
+                    elif name == 'tr':
+                        rows.append([])
+                    elif name == 'tc':
+                        cells.append([])
+                    elif name == 'hyperlink':
+                        relationship = relationships.get(_attr(element, 'id'))
+                        if relationship is not None and relationship[2]:
+                            self._hyperlinks[relationship[1]] = None
+                    elif name in ('blip', 'imagedata'):
+                        relationship = relationships.get(_attr(element, 'embed') or _attr(element, 'id'))
+                        if relationship is not None and not relationship[2]:
+                            yield ('image', relationship[1])
+                    elif name == 'fldSimple':
+                        self._add_field(_attr(element, 'instr') or '')
+                    elif name == 'pageBreakBefore' and _attr(element, 'val') not in ('0', 'false', 'off'):
+                        if len(paragraphs) == 1 and not cells and not paragraphs[0]:
+                            yield _PAGE_BREAK
+                    continue
+
+                stack.pop()
+                if name in _SKIPPED:
+                    skipped -= 1
+                    continue
+                if skipped:
+                    continue
+
+                if name == 't' and paragraphs:
+                    paragraphs[-1].append(element.text or '')
+                elif name == 'r':
+                    runs -= 1
+                elif runs and paragraphs and name == 'tab':
+                    paragraphs[-1].append('\t')
+                elif runs and paragraphs and name == 'br':
+                    if _attr(element, 'type') == 'page' and len(paragraphs) == 1 and not cells:
+                        # Text before the break stays on the current page
+                        if "".join(paragraphs[0]).strip():
+                            yield "".join(paragraphs[0])
+                        paragraphs[0] = []
+                        yield _PAGE_BREAK
+                    elif _attr(element, 'type') != 'page':
+                        paragraphs[-1].append('\n')
+                elif runs and paragraphs and name == 'cr':
+                    paragraphs[-1].append('\n')
+                elif runs and paragraphs and name == 'noBreakHyphen':
+                    paragraphs[-1].append('-')
+                elif name == 'instrText':
+                    self._add_field(element.text or '')
+                elif name == 'p' and paragraphs:
+                    text = "".join(paragraphs.pop())
+                    if cells:
+                        cells[-1].append(text)
+                    else:
+                        # Text box paragraphs come out before the paragraph that anchors them
+                        yield text
+                elif name == 'tc' and cells:
+                    text = " ".join(line for line in cells.pop() if line.strip())
+                    if rows:
+                        rows[-1].append(text)
+                elif name == 'tr' and rows:
+                    text = "\t".join(rows.pop())
+                    if cells:
+                        cells[-1].append(text)
+                    else:
+                        yield text
+
+                # Drop finished paragraphs and tables from the tree
+                if stack and _local(stack[-1].tag) in _BLOCK_CONTAINERS:
+                    stack[-1].clear()
+
+    def _add_field(self, instruction: str):
+        match = _HYPERLINK_FIELD.search(instruction)
+        if match:
+            self._hyperlinks[match.group(1)] = None
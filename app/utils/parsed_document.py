@@ -0,0 +1,88 @@
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from PIL import Image
+
+from app.utils.metrics import stage
+
+# PyMuPDF is imported when the first document is opened
+if TYPE_CHECKING:
+    import fitz
+
+logger = logging.getLogger(__name__)
+
+class ParsedDocument:
+    """A PDF parsed once and shared by validation, text extraction and link extraction.
+
+    Page text and links are read from MuPDF once per page and kept until release_page() says
+    the page is done. Rendered bitmaps are produced on demand and not retained, so memory does
+    not grow with page count.
+    Call close() (or use it as a context manager) to release the MuPDF document.
+    Pass ``path`` to let MuPDF read a file on disk instead of an in-memory copy.
+    """
+
+    def __init__(self, pdf_bytes: Optional[bytes] = None, path: Optional[str] = None):
+        import fitz
+
+        if path is not None:
+            self._doc = fitz.open(path, filetype="pdf")
+        else:
+            self._doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        self._texts: Dict[int, str] = {}
+        self._links: Dict[int, List[dict]] = {}
+
+    def __enter__(self) -> "ParsedDocument":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.page_count
+
+    @property
+    def doc(self) -> "fitz.Document":
+        return self._doc
+
+    @property
+    def page_count(self) -> int:
+        return self._doc.page_count
+
+    def page(self, page_number: int) -> "fitz.Page":
+        return self._doc[page_number]
+
+    def page_text(self, page_number: int) -> str:
+        if page_number not in self._texts:
+            with stage('text_layer'):
+                self._texts[page_number] = self._doc[page_number].get_text()
+        return self._texts[page_number]
+
+    def page_links(self, page_number: int) -> List[dict]:
+        if page_number not in self._links:
+            with stage('links'):
+                self._links[page_number] = self._doc[page_number].get_links()
+        return self._links[page_number]
+
+    def release_page(self, page_number: int):
+        """Drop a finished page's cached text and links; they are read again if asked for later"""
+        self._texts.pop(page_number, None)
+        self._links.pop(page_number, None)
+
+    def render_gray(self, page_number: int, zoom: float) -> Image.Image:
+        """Rasterize a page into an 8-bit grayscale image"""
+        import fitz
+
+        pix = self._doc[page_number].get_pixmap(
+            matrix=fitz.Matrix(zoom, zoom),
+            colorspace=fitz.csGRAY,
+            alpha=False
+        )
+        image = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+        del pix
+        return image
+
+    def close(self):
+        if not self._doc.is_closed:
+            self._doc.close()
+        self._texts.clear()
+        self._links.clear()
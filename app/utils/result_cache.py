@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# In-memory tier limits
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+RESULT_CACHE_MAX_MEMORY_BYTES = int(os.getenv("RESULT_CACHE_MAX_MEMORY_BYTES", str(64 * 1024 * 1024)))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "4096"))
+# Optional on-disk tier (SQLite file); empty disables it
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "")
+RESULT_CACHE_MAX_DISK_BYTES = int(os.getenv("RESULT_CACHE_MAX_DISK_BYTES", str(1024 * 1024 * 1024)))
+# Least recently used entries read per query while evicting from disk
+EVICTION_BATCH = 64
+
+def cache_key(*parts) -> str:
+    """Build a content-addressed key from bytes (or memory maps) and JSON-serializable parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, (bytes, bytearray, memoryview, mmap.mmap)):
+            part = json.dumps(part, sort_keys=True).encode()
+        digest.update(hashlib.sha256(part).digest())
+    return digest.hexdigest()
+
+class ResultCache:
+    """Two-tier cache: a bounded in-memory LRU backed by an optional size-capped SQLite table.
+
+    Values are stored as JSON so every hit returns a fresh copy.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        max_memory_bytes: int = RESULT_CACHE_MAX_MEMORY_BYTES,
+        disk_path: str = RESULT_CACHE_PATH,
+        max_disk_bytes: int = RESULT_CACHE_MAX_DISK_BYTES,
+        enabled: bool = RESULT_CACHE_ENABLED
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: Optional[sqlite3.Connection] = None
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+        if enabled and disk_path:
+            try:
+                self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+                self._disk.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+                )
+                self._disk.execute(f"CREATE INDEX IF NOT EXISTS {name}_accessed ON {name} (accessed)")
+                # Running total of the table's value sizes, shared by every process using the file
+                self._disk.execute(f"CREATE TABLE IF NOT EXISTS {name}_size (total INTEGER NOT NULL)")
+                self._disk.execute(
+                    f"INSERT INTO {name}_size (total) SELECT COALESCE(SUM(size), 0) FROM {name} "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM {name}_size)"
+                )
+                self._disk.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Disabling on-disk {name} cache at {disk_path}: {str(e)}")
+                self._disk = None
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return json.loads(value)
+
+            if self._disk is not None:
+                try:
+                    row = self._disk.execute(f"SELECT value FROM {self.name} WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        self._disk.execute(f"UPDATE {self.name} SET accessed = ? WHERE key = ?", (time.time(), key))
+                        self._disk.commit()
+                except sqlite3.Error as e:
+                    # A locked or damaged cache file is a miss, not a failed request
+                    logger.error(f"Failed to read {self.name} cache entry: {str(e)}")
+                    row = None
+                if row is not None:
+                    self._remember(key, row[0])
+                    self._stats['disk_hits'] += 1
+                    return json.loads(row[0])
+
+            self._stats['misses'] += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        encoded = json.dumps(value)
+        with self._lock:
+            self._remember(key, encoded)
+            if self._disk is not None:
+                try:
+                    # Adjusted before the write, in the same transaction, so a replaced entry's size is not counted twice
+                    self._disk.execute(
+                        f"UPDATE {self.name}_size SET total = total + ? - "
+                        f"COALESCE((SELECT size FROM {self.name} WHERE key = ?), 0)",
+                        (len(encoded), key)
+                    )
+                    self._disk.execute(
+                        f"INSERT OR REPLACE INTO {self.name} (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                        (key, encoded, len(encoded), time.time())
+                    )
+                    self._evict_disk()
+                    self._disk.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Failed to write {self.name} cache entry: {str(e)}")
+
+    def _remember(self, key: str, encoded: str):
+        if len(encoded) > self.max_memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = encoded
+        self._memory_bytes += len(encoded)
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        total = self._disk.execute(f"SELECT total FROM {self.name}_size").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        # Drop least recently used entries until the table fits again
+        while total > self.max_disk_bytes:
+            rows = self._disk.execute(
+                f"SELECT key, size FROM {self.name} ORDER BY accessed LIMIT ?", (EVICTION_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            freed = 0
+            for key, size in rows:
+                if total - freed <= self.max_disk_bytes:
+                    break
+                self._disk.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+                freed += size
+            self._disk.execute(f"UPDATE {self.name}_size SET total = total - ?", (freed,))
+            total -= freed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._stats['memory_hits'] + self._stats['disk_hits']
+            lookups = hits + self._stats['misses']
+            return {
+                **self._stats,
+                'hits': hits,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_enabled': self._disk is not None,
+            }
+
+# Full process()/extract_links() results, keyed by document bytes and extraction settings
+RESULT_CACHE = ResultCache("documents", RESULT_CACHE_MAX_ENTRIES)
+# OCR text of individual pages, keyed by page content, so near-duplicate PDFs share work
+PAGE_CACHE = ResultCache("pages", PAGE_CACHE_MAX_ENTRIES)
@@ -0,0 +1,101 @@
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import weakref
+from typing import BinaryIO, Union
+
+logger = logging.getLogger(__name__)
+
+# Directory for spooled uploads and downloads (default: the system temp directory)
+SPOOL_DIR = os.getenv("SPOOL_DIR") or None
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+def suffix_for(filename: str) -> str:
+    """File extension to keep on the spooled copy, so tools that look at it see the original type"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    return extension if extension[1:].isalnum() and len(extension) <= 10 else ''
+
+def _remove(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+class SpooledDocument:
+    """A received document written to a temporary file once and shared by every stage.
+
+    ``buffer`` is a read-only memory map of the file for hashing and sniffing, and ``path`` lets
+    PyMuPDF, PIL, the DOCX reader and LibreOffice open the file directly, so the document is never
+    held as several in-memory copies. Write with write(), then call finish() before reading.
+    close() (or leaving the context manager) unmaps and deletes the file.
+    """
+
+    def __init__(self, suffix: str = ''):
+        fd, self.path = tempfile.mkstemp(prefix="docprocessor-", suffix=suffix, dir=SPOOL_DIR)
+        self._file = os.fdopen(fd, 'wb')
+        self._map = None
+        self.size = 0
+        # The file is removed even if a request path forgets to close it
+        self._finalizer = weakref.finalize(self, _remove, self.path)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, suffix: str = '') -> "SpooledDocument":
+        document = cls(suffix)
+        document.write(data)
+        return document.finish()
+
+    @classmethod
+    def from_file(cls, source: BinaryIO, suffix: str = '') -> "SpooledDocument":
+        """Copy a file object in chunks; blocking, so call it from a worker thread"""
+        document = cls(suffix)
+        try:
+            shutil.copyfileobj(source, document._file, SPOOL_CHUNK_SIZE)
+            document.size = document._file.tell()
+            return document.finish()
+        except Exception:
+            document.close()
+            raise
+
+    def __enter__(self) -> "SpooledDocument":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def finish(self) -> "SpooledDocument":
+        """Close the file for writing and map it read-only"""
+        self._file.close()
+        # Empty files cannot be mapped
+        if self.size:
+            with open(self.path, 'rb') as spooled_file:
+                self._map = mmap.mmap(spooled_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self
+
+    @property
+    def buffer(self) -> Union[mmap.mmap, bytes]:
+        return self._map if self._map is not None else b""
+
+    def open(self) -> BinaryIO:
+        """A new, independently positioned read-only file object"""
+        return open(self.path, 'rb')
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if self._map is not None:
+            try:
+                self._map.close()
+                self._map = None
+            except BufferError:
+                # Still referenced by a stage that outlived the request; freed with the last reference
+                logger.info(f"Spooled document {self.path} is still in use, unmapping later")
+        self._finalizer()
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List
+
+from app.utils.extraction_pool import EXTRACTION_POOL
+from app.utils.office_converter import OFFICE_POOL
+from app.utils.ocr_pool import OCR_POOL
+
+logger = logging.getLogger(__name__)
+
+# Backends loaded at startup, before the instance reports ready; empty loads everything on first use
+WARMUP_BACKENDS = [
+    name.strip() for name in os.getenv("WARMUP_BACKENDS", "libmagic,pymupdf,tesseract,libreoffice").split(',')
+    if name.strip()
+]
+
+def _warm_libmagic():
+    import magic
+
+    magic.from_buffer(b"%PDF-1.4\n", mime=True)
+
+def _warm_pymupdf():
+    import fitz
+
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "warm-up")
+    page.get_text()
+    page.get_pixmap(colorspace=fitz.csGRAY)
+    doc.close()
+
+def _warm_tesseract():
+    workers = OCR_POOL.warm_up()
+    logger.info(f"Warmed OCR engines in {workers} workers")
+
+def _warm_libreoffice():
+    OFFICE_POOL.warm_up()
+
+# Backends warmed in the process that uses them
+LOCAL_WARMERS: Dict[str, Callable[[], None]] = {
+    'libmagic': _warm_libmagic,
+    'pymupdf': _warm_pymupdf,
+    'tesseract': _warm_tesseract,
+    'libreoffice': _warm_libreoffice,
+}
+# With extraction workers, the server only sniffs documents; the other backends are loaded in every worker
+WORKER_BACKENDS = ('pymupdf', 'tesseract', 'libreoffice')
+
+def _warm_in_workers(name: str) -> Callable[[], None]:
+    def warm():
+        # Every warmer starts the pool; the first call starts the workers, the others get the same report
+        errors = EXTRACTION_POOL.start([backend for backend in WARMUP_BACKENDS if backend in WORKER_BACKENDS])
+        if name in errors:
+            raise RuntimeError(errors[name])
+    return warm
+
+WARMERS: Dict[str, Callable[[], None]] = {
+    name: _warm_in_workers(name) if EXTRACTION_POOL.workers > 0 and name in WORKER_BACKENDS else warmer
+    for name, warmer in LOCAL_WARMERS.items()
+}
+
+class Readiness:
+    """Warms the configured backends in the background and tracks whether each one is ready"""
+
+    def __init__(self, backends: List[str] = WARMUP_BACKENDS):
+        unknown = [name for name in backends if name not in WARMERS]
+        if unknown:
+            logger.error(f"Ignoring unknown warm-up backends: {', '.join(unknown)}")
+        self._status: Dict[str, Dict[str, Any]] = {
+            name: {'status': 'pending'} for name in backends if name in WARMERS
+        }
+
+    async def warm_up(self):
+        """Warm all backends concurrently; failures are recorded, not raised"""
+        await asyncio.gather(*(self._warm(name) for name in self._status))
+
+    async def _warm(self, name: str):
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(WARMERS[name])
+        except Exception as e:
+            logger.error(f"Warm-up of {name} failed: {str(e)}")
+            self._status[name] = {'status': 'failed', 'error': str(e)}
+            return
+        seconds = time.perf_counter() - start
+        logger.info(f"Warmed {name} in {seconds:.2f}s")
+        self._status[name] = {'status': 'ready', 'seconds': round(seconds, 3)}
+
+    @property
+    def ready(self) -> bool:
+        return all(status['status'] == 'ready' for status in self._status.values())
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(status) for name, status in self._status.items()}
+
+READINESS = Readiness()
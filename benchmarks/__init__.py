@@ -0,0 +1,4 @@
+"""Benchmarks and load tests for the extraction pipeline.
+
+Run ``python -m benchmarks --help`` from the repository root.
+"""
@@ -0,0 +1,75 @@
+"""Command line entry point.
+
+Examples::
+
+    python -m benchmarks stages --kinds born_digital scanned --pages 1 5 --repeat 3
+    python -m benchmarks load --kinds born_digital --pages 3 --requests 200 --concurrency 1 4 16
+    python -m benchmarks engines --kinds scanned --pages 1
+    python -m benchmarks tiers --kinds scanned --pages 1 5 --min-confidence 60 75 90
+    python -m benchmarks calibrate --kinds born_digital scanned docx png --pages 1 5 --output cost_model.json
+    python -m benchmarks all --output bench.json
+
+Results are written as JSON (stdout or --output) so runs can be compared across commits.
+"""
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+
+from benchmarks.corpus import KINDS, corpus
+from benchmarks.stats import git_revision, peak_rss_mb
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n")[0])
+    parser.add_argument('mode', choices=('stages', 'load', 'engines', 'tiers', 'calibrate', 'all'))
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=['born_digital', 'scanned', 'docx', 'png'])
+    parser.add_argument('--pages', nargs='+', type=int, default=[1, 5])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="repetitions per stage")
+    parser.add_argument('--no-ocr', action='store_true', help="skip stages that need tesseract")
+    parser.add_argument('--requests', type=int, default=50, help="requests per load level")
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--cache', action='store_true', help="keep the result caches enabled during load")
+    parser.add_argument('--min-confidence', nargs='+', type=float, default=[75], help="tiered OCR retry thresholds to compare")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    documents = corpus(args.kinds, args.pages, args.seed)
+    report = {
+        'revision': git_revision(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+    }
+
+    if args.mode in ('stages', 'all'):
+        from benchmarks.stages import run_stages
+        report['stages'] = run_stages(documents, args.repeat, ocr=not args.no_ocr)
+    if args.mode in ('engines', 'all') and not args.no_ocr:
+        from benchmarks.stages import run_engines
+        report['engines'] = run_engines(documents, args.repeat)
+    if args.mode in ('tiers', 'all') and not args.no_ocr:
+        from benchmarks.stages import run_tiers
+        report['tiers'] = run_tiers(documents, args.repeat, args.min_confidence)
+    if args.mode in ('calibrate', 'all'):
+        from benchmarks.calibrate import run_calibration
+        report['calibration'] = run_calibration(documents, args.repeat)
+    if args.mode in ('load', 'all'):
+        from benchmarks.load import load_levels
+        report['load'] = load_levels(documents, args.requests, args.concurrency, args.cache)
+    report['peak_rss_mb'] = peak_rss_mb()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as report_file:
+            report_file.write(output)
+    else:
+        print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Fit the cost model's CPU coefficients to measured extraction cost on the synthetic corpus"""
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+from app.utils.cost import CPU_FEATURES, CostModel, actual_cost, measure_cost
+from app.utils.document_processor import DocumentProcessor
+from app.utils.result_cache import PAGE_CACHE, RESULT_CACHE
+
+logger = logging.getLogger(__name__)
+
+def measure_documents(documents: List[Dict], repeat: int = 3) -> List[Dict]:
+    """Features and actual CPU seconds of a full extraction of every document, repeat times"""
+    RESULT_CACHE.enabled = False
+    PAGE_CACHE.enabled = False
+    samples = []
+    for document in documents:
+        for _ in range(repeat):
+            with DocumentProcessor(document['content'], document['mime_type']) as processor:
+                try:
+                    features = processor.cost_features()
+                    # Measured like the API does: the extraction only, after the estimate
+                    with measure_cost() as measured:
+                        processor.process()
+                except Exception as e:
+                    logger.info(f"Skipping {document['name']}: {str(e)}")
+                    break
+                actual = actual_cost(measured, processor.ocr_stats)
+            samples.append({'name': document['name'], 'features': features, **actual})
+    return samples
+
+def fit_coefficients(samples: List[Dict], model: CostModel) -> Dict[str, float]:
+    """Non-negative least squares fit of the CPU coefficients; features absent from the samples keep their value"""
+    coefficients = dict(model.coefficients)
+    rows = [model.cpu_features(sample['features']) for sample in samples]
+    active = [name for name in CPU_FEATURES if any(row[name] for row in rows)]
+    if not active:
+        return coefficients
+    x = np.array([[row[name] for name in active] for row in rows])
+    y = np.array([sample['cpu_seconds'] for sample in samples])
+    # Drop features that would get a negative coefficient and refit the rest
+    while active:
+        solution = np.linalg.lstsq(x, y, rcond=None)[0]
+        if (solution >= 0).all():
+            break
+        keep = solution >= 0
+        for name in [name for name, kept in zip(active, keep) if not kept]:
+            coefficients[name] = 0.0
+        active = [name for name, kept in zip(active, keep) if kept]
+        x = x[:, keep]
+    for name, value in zip(active, solution if active else []):
+        coefficients[name] = round(float(value), 6)
+    return coefficients
+
+def run_calibration(documents: List[Dict], repeat: int = 3) -> Dict:
+    """Measure, fit, and report predicted versus actual CPU seconds before and after the fit.
+
+    Save the report with --output and point COST_MODEL_PATH at it to use the fitted model.
+    """
+    samples = measure_documents(documents, repeat)
+    default = CostModel()
+    fitted = CostModel(fit_coefficients(samples, default))
+    return {
+        'coefficients': fitted.coefficients,
+        'documents': [
+            {
+                'name': sample['name'],
+                'actual_cpu_seconds': round(sample['cpu_seconds'], 3),
+                'default_cpu_seconds': default.estimate(sample['features'])['cpu_seconds'],
+                'fitted_cpu_seconds': fitted.estimate(sample['features'])['cpu_seconds'],
+            }
+            for sample in samples
+        ],
+    }
@@ -0,0 +1,185 @@
+"""Deterministic synthetic documents for benchmarking.
+
+The same kind, page count and seed always produce the same bytes, so runs on different
+commits measure the same inputs.
+"""
+import io
+import random
+import zipfile
+from typing import Dict, List
+
+import fitz
+from PIL import Image
+
+WORDS = (
+    "experience engineer python developer project team design system data service "
+    "platform cloud analysis research product customer delivery lead senior manager "
+    "software architecture testing deployment performance security university degree "
+    "skills communication leadership kubernetes docker postgres react api backend"
+).split()
+
+KINDS = ('born_digital', 'scanned', 'docx', 'png', 'jpeg', 'tiff')
+
+MIME_TYPES = {
+    'born_digital': 'application/pdf',
+    'scanned': 'application/pdf',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+    'tiff': 'image/tiff',
+}
+
+EXTENSIONS = {
+    'born_digital': '.pdf',
+    'scanned': '.pdf',
+    'docx': '.docx',
+    'png': '.png',
+    'jpeg': '.jpg',
+    'tiff': '.tiff',
+}
+
+def page_lines(rng: random.Random, page: int, lines: int = 40) -> List[str]:
+    """Plausible resume-like text, including a few links and contact details"""
+    result = [f"Page {page + 1} - Jane Doe - jane.doe{page}@example.com - +1 555 010 {page:04d}"]
+    result.append(f"https://github.com/janedoe{page} https://www.linkedin.com/in/janedoe{page}")
+    for _ in range(lines - 2):
+        result.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 12))).capitalize() + ".")
+    return result
+
+def born_digital_pdf(pages: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((50, 60), "\n".join(page_lines(rng, i)), fontsize=10)
+        page.insert_link({
+            'kind': fitz.LINK_URI,
+            'from': fitz.Rect(50, 60, 250, 75),
+            'uri': f"https://github.com/janedoe{i}"
+        })
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+def _page_images(pages: int, seed: int, dpi: int) -> List[Image.Image]:
+    """Render born-digital pages to RGB images, as a scanner would see them"""
+    source = fitz.open(stream=born_digital_pdf(pages, seed), filetype="pdf")
+    images = []
+    for page in source:
+        pix = page.get_pixmap(dpi=dpi)
+        images.append(Image.frombytes("RGB", (pix.width, pix.height), pix.samples))
+    source.close()
+    return images
+
+def scanned_pdf(pages: int, seed: int = 0, dpi: int = 200) -> bytes:
+    """Image-only PDF without a text layer"""
+    doc = fitz.open()
+    for image in _page_images(pages, seed, dpi):
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=buffer.getvalue())
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+def image_file(kind: str, pages: int = 1, seed: int = 0, dpi: int = 200) -> bytes:
+    """PNG/JPEG (first page only) or a multi-frame TIFF"""
+    images = _page_images(pages, seed, dpi)
+    buffer = io.BytesIO()
+    if kind == 'tiff':
+        images[0].save(buffer, format="TIFF", save_all=True, append_images=images[1:], compression="tiff_deflate")
+    elif kind == 'jpeg':
+        images[0].save(buffer, format="JPEG", quality=85)
+    else:
+        images[0].save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _xml_escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def docx_file(pages: int, seed: int = 0) -> bytes:
+    """Minimal WordprocessingML package with paragraphs, a table and a hyperlink"""
+    rng = random.Random(seed)
+    body = []
+    for i in range(pages):
+        for line in page_lines(rng, i):
+            body.append(f'<w:p><w:r><w:t xml:space="preserve">{_xml_escape(line)}</w:t></w:r></w:p>')
+        body.append(
+            '<w:tbl><w:tr>'
+            f'<w:tc><w:p><w:r><w:t>Skill {i}</w:t></w:r></w:p></w:tc>'
+            f'<w:tc><w:p><w:r><w:t>{rng.choice(WORDS)}</w:t></w:r></w:p></w:tc>'
+            '</w:tr></w:tbl>'
+        )
+        body.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+    body.append(
+        '<w:p><w:hyperlink r:id="rId1"><w:r><w:t>GitHub</w:t></w:r></w:hyperlink></w:p>'
+    )
+
+    files = {
+        '[Content_Types].xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ),
+        '_rels/.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/>'
+            '</Relationships>'
+        ),
+        'word/_rels/document.xml.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink" '
+            'Target="https://github.com/janedoe" TargetMode="External"/>'
+            '</Relationships>'
+        ),
+        'word/document.xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<w:body>{"".join(body)}</w:body></w:document>'
+        ),
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            # Fixed timestamps keep the archive bytes deterministic
+            archive.writestr(zipfile.ZipInfo(name, date_time=(2020, 1, 1, 0, 0, 0)), data)
+    return buffer.getvalue()
+
+def generate(kind: str, pages: int, seed: int = 0) -> bytes:
+    if kind == 'born_digital':
+        return born_digital_pdf(pages, seed)
+    if kind == 'scanned':
+        return scanned_pdf(pages, seed)
+    if kind == 'docx':
+        return docx_file(pages, seed)
+    if kind in ('png', 'jpeg', 'tiff'):
+        return image_file(kind, pages if kind == 'tiff' else 1, seed)
+    raise ValueError(f"Unknown document kind: {kind}")
+
+def corpus(kinds: List[str], page_counts: List[int], seed: int = 0) -> List[Dict]:
+    """All combinations of kinds and page counts as dicts with name, kind, pages, mime_type and content"""
+    documents = []
+    for kind in kinds:
+        for pages in page_counts:
+            if kind in ('png', 'jpeg') and pages != page_counts[0]:
+                continue
+            documents.append({
+                'name': f"{kind}-{pages}p{EXTENSIONS[kind]}",
+                'kind': kind,
+                'seed': seed,
+                'pages': pages if kind not in ('png', 'jpeg') else 1,
+                'mime_type': MIME_TYPES[kind],
+                'content': generate(kind, pages, seed),
+            })
+    return documents
@@ -0,0 +1,60 @@
+"""Drive /process-document/ in-process with a configurable number of concurrent clients"""
+import asyncio
+import time
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+from app.auth.auth_handler import API_KEY
+from app.main import app
+from app.utils.result_cache import PAGE_CACHE, RESULT_CACHE
+from benchmarks.stats import summarize
+
+async def _client(client: httpx.AsyncClient, documents, counter, latencies: List[float], statuses: Counter, pages: List[int]):
+    for index in counter:
+        document = documents[index % len(documents)]
+        start = time.perf_counter()
+        response = await client.post(
+            "/process-document/",
+            files={"file": (document['name'], document['content'], document['mime_type'])},
+            headers={"X-API-Key": API_KEY}
+        )
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] += 1
+        if response.status_code == 200:
+            pages.append(document['pages'])
+
+async def run_load(documents: List[Dict], requests: int, concurrency: int, cache: bool = False) -> Dict:
+    """Send requests documents round-robin from concurrency clients and summarize latencies"""
+    RESULT_CACHE.enabled = cache
+    PAGE_CACHE.enabled = cache
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    pages: List[int] = []
+    # Shared iterator: every client takes the next request number until all are sent
+    counter = iter(range(requests))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            _client(client, documents, counter, latencies, statuses, pages)
+            for _ in range(concurrency)
+        ))
+        wall_time = time.perf_counter() - start
+
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'wall_time_s': wall_time,
+        'requests_per_sec': requests / wall_time if wall_time else 0.0,
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+        'latency': summarize(latencies, sum(pages), wall_time),
+    }
+
+def load_levels(documents: List[Dict], requests: int, concurrency_levels: List[int], cache: bool = False) -> List[Dict]:
+    return [
+        asyncio.run(run_load(documents, requests, concurrency, cache))
+        for concurrency in concurrency_levels
+    ]
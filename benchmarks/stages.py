@@ -0,0 +1,149 @@
+"""Time the individual DocumentProcessor stages on a synthetic corpus"""
+import difflib
+import logging
+from typing import Dict, List
+
+from PIL import Image
+
+from app.utils.document_processor import DocumentProcessor, iter_image_frames, render_pages
+from app.utils.links import LinkCollector
+from app.utils.ocr_engine import ENGINES, create_engine
+from app.utils.ocr_pool import ocr_page
+from app.utils.ocr_tiers import OCRPolicy
+from benchmarks.corpus import born_digital_pdf
+from app.utils.result_cache import PAGE_CACHE, RESULT_CACHE
+from benchmarks.stats import Timer, summarize
+
+logger = logging.getLogger(__name__)
+
+PDF_KINDS = ('born_digital', 'scanned')
+
+def _run_stage(timer: Timer, label: str, func) -> bool:
+    try:
+        with timer.measure(label):
+            func()
+        return True
+    except Exception as e:
+        logger.info(f"Stage {label} failed: {str(e)}")
+        timer.samples[label].pop()
+        return False
+
+def _scan_links(processor: DocumentProcessor) -> Dict:
+    """Link scan over the already extracted page text, as done during extraction"""
+    links = LinkCollector()
+    for i in range(processor.page_count):
+        processor._collect_page_links(links, i, processor.parsed.page_text(i))
+    return links.result()
+
+def benchmark_document(document: Dict, repeat: int, ocr: bool) -> Dict:
+    """Time each applicable stage of one document, repeat times"""
+    timer = Timer()
+    content, mime_type, kind = document['content'], document['mime_type'], document['kind']
+
+    for _ in range(repeat):
+        if kind in PDF_KINDS:
+            with DocumentProcessor(content, mime_type) as processor:
+                _run_stage(timer, 'parse', lambda: processor.page_count)
+                _run_stage(timer, 'pymupdf', processor._process_pymupdf)
+                images = []
+                _run_stage(timer, 'render', lambda: images.extend(render_pages(processor.parsed, range(processor.page_count))))
+                if ocr:
+                    _run_stage(timer, 'ocr', lambda: [ocr_page(image) for image in images])
+                del images
+                _run_stage(timer, 'link_extraction', lambda: _scan_links(processor))
+
+        if kind == 'docx':
+            with DocumentProcessor(content, mime_type) as processor:
+                _run_stage(timer, 'docx', processor._process_docx)
+
+        if ocr or kind == 'born_digital':
+            # Full pipeline as the API runs it
+            with DocumentProcessor(content, mime_type) as processor:
+                _run_stage(timer, 'process', processor.process)
+
+    pages = document['pages']
+    return {
+        'name': document['name'],
+        'kind': kind,
+        'pages': pages,
+        'bytes': len(content),
+        'stages': {
+            label: summarize(samples, pages * len(samples))
+            for label, samples in timer.samples.items()
+            if samples
+        },
+    }
+
+def run_stages(documents: List[Dict], repeat: int = 3, ocr: bool = True) -> List[Dict]:
+    # Caches would turn every repetition after the first into a lookup
+    RESULT_CACHE.enabled = False
+    PAGE_CACHE.enabled = False
+    return [benchmark_document(document, repeat, ocr) for document in documents]
+
+def _page_images(document: Dict) -> List[Image.Image]:
+    if document['kind'] in PDF_KINDS:
+        with DocumentProcessor(document['content'], document['mime_type']) as processor:
+            return list(render_pages(processor.parsed, range(processor.page_count)))
+    if document['mime_type'].startswith('image/'):
+        return list(iter_image_frames(document['content']))
+    return []
+
+def run_engines(documents: List[Dict], repeat: int = 3) -> Dict[str, Dict]:
+    """Compare OCR backends: fixed per-call overhead (tiny blank image) and time per real page"""
+    images = [image for document in documents for image in _page_images(document)]
+    blank = Image.new('L', (32, 32), 255)
+    results = {}
+    for name in ENGINES:
+        try:
+            engine = create_engine(name)
+        except Exception as e:
+            results[name] = {'error': f"unavailable: {str(e)}"}
+            continue
+
+        timer = Timer()
+        for _ in range(repeat):
+            _run_stage(timer, 'overhead', lambda: engine.image_to_string(blank))
+            for image in images:
+                _run_stage(timer, 'page', lambda: engine.image_to_string(image))
+        results[name] = {
+            label: summarize(samples, len(samples))
+            for label, samples in timer.samples.items()
+            if samples
+        }
+    return results
+
+def _words(text: str) -> List[str]:
+    return text.split()
+
+def _ground_truth(document: Dict) -> str:
+    """Scanned documents are rasterized born-digital PDFs, so the original text layer is the reference"""
+    with DocumentProcessor(born_digital_pdf(document['pages'], document.get('seed', 0)), 'application/pdf') as processor:
+        return processor._process_pymupdf()[0]
+
+def run_tiers(documents: List[Dict], repeat: int = 3, min_confidences: List[float] = (75,)) -> List[Dict]:
+    """Compare single-pass OCR with tiered OCR at several retry thresholds: time, word accuracy and per-tier stats"""
+    RESULT_CACHE.enabled = False
+    PAGE_CACHE.enabled = False
+    policies = [OCRPolicy('single')] + [OCRPolicy('tiered', min_confidence) for min_confidence in min_confidences]
+    results = []
+    for document in documents:
+        if document['kind'] != 'scanned':
+            continue
+        truth = _words(_ground_truth(document))
+        for policy in policies:
+            timer = Timer()
+            text = ""
+            tiers = {}
+            for _ in range(repeat):
+                with DocumentProcessor(document['content'], document['mime_type'], ocr_policy=policy) as processor:
+                    with timer.measure('process'):
+                        text, _ = processor.process()
+                    tiers = processor.ocr_stats
+            results.append({
+                'name': document['name'],
+                'policy': policy.settings(),
+                'word_accuracy': difflib.SequenceMatcher(None, truth, _words(text), autojunk=False).ratio(),
+                'latency': summarize(timer.samples['process'], document['pages'] * repeat),
+                'tiers': tiers,
+            })
+    return results
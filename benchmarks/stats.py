@@ -0,0 +1,96 @@
+import os
+import resource
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize(latencies: List[float], pages: int = 0, wall_time: Optional[float] = None) -> Dict[str, float]:
+    """p50/p95/p99 latency in milliseconds plus throughput"""
+    total = wall_time if wall_time is not None else sum(latencies)
+    return {
+        'count': len(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': (sum(latencies) / len(latencies) * 1000) if latencies else 0.0,
+        'pages_per_sec': pages / total if total else 0.0,
+    }
+
+def _live_descendants_peak_mb() -> float:
+    """Largest peak RSS (VmHWM) among this process's live descendants; 0 where /proc is missing"""
+    parents: Dict[int, int] = {}
+    try:
+        entries = [entry for entry in os.listdir('/proc') if entry.isdigit()]
+    except OSError:
+        return 0.0
+    for entry in entries:
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                # The command name may contain spaces, so fields are counted from its closing parenthesis
+                parents[int(entry)] = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+
+    peak = 0.0
+    pending = [os.getpid()]
+    while pending:
+        parent = pending.pop()
+        for pid in [pid for pid, ppid in parents.items() if ppid == parent]:
+            pending.append(pid)
+            try:
+                with open(f'/proc/{pid}/status') as status:
+                    for line in status:
+                        if line.startswith('VmHWM:'):
+                            peak = max(peak, int(line.split()[1]) / 1024)
+                            break
+            except (OSError, ValueError, IndexError):
+                continue
+    return peak
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Peak resident set size of this process and of its largest (OCR, extraction, LibreOffice) child.
+
+    RUSAGE_CHILDREN only covers children that have exited and been reaped, so the pool workers
+    still alive at the end of a run are sampled from /proc as well.
+    """
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 / (1024 * 1024) if sys.platform == 'darwin' else 1 / 1024
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        'children': max(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale, _live_descendants_peak_mb()),
+    }
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+class Timer:
+    """Collects wall-clock durations per label"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    @contextmanager
+    def measure(self, label: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(label, []).append(time.perf_counter() - start)
@@ -3,7 +3,7 @@ from setuptools import setup, find_packages
 setup(
     name="docprocessor",
     version="1.0.0",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks*", "tests*"]),
     install_requires=[
         "fastapi",
         "python-multipart",
@@ -11,9 +11,10 @@ setup(
         "pdfplumber",
         "pytesseract",
         "Pillow",
-        "pdf2image",
+        "numpy",
         "python-magic",
-        "httpx",
+        "httpx[http2]",
+        "boto3",
         "uvicorn",
     ],
 ) 
\ No newline at end of file
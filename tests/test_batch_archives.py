@@ -0,0 +1,25 @@
+import io
+
+import pytest
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from app.main import is_zip_archive
+
+def _upload(filename, content_type):
+    return UploadFile(io.BytesIO(b"PK\x03\x04"), filename=filename, headers=Headers({'content-type': content_type}))
+
+@pytest.mark.parametrize('filename, content_type, expected', [
+    ('documents.zip', 'application/zip', True),
+    ('DOCUMENTS.ZIP', 'application/octet-stream', True),
+    ('documents', 'application/zip', True),
+    ('documents', 'application/x-zip-compressed', True),
+    ('resume.docx', 'application/zip', False),
+    ('resume.docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', False),
+    ('sheet.xlsx', 'application/x-zip-compressed', False),
+    ('slides.pptx', 'application/zip', False),
+    ('resume.pdf', 'application/zip', False),
+    ('documents', 'application/octet-stream', False),
+])
+def test_only_plain_zip_uploads_are_expanded(filename, content_type, expected):
+    assert is_zip_archive(_upload(filename, content_type)) is expected
@@ -0,0 +1,21 @@
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.stats import peak_rss_mb
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="live children are sampled from /proc")
+def test_peak_rss_includes_live_children():
+    # A worker that is still running, as OCR pool workers are when the benchmark reports
+    child = subprocess.Popen([
+        sys.executable, '-c',
+        'import sys, time; b = bytearray(200 * 1024 * 1024); b[::4096] = bytes(len(b[::4096])); '
+        'print(flush=True); time.sleep(30)'
+    ], stdout=subprocess.PIPE)
+    try:
+        child.stdout.readline()
+        assert peak_rss_mb()['children'] >= 200
+    finally:
+        child.kill()
+        child.wait()
@@ -0,0 +1,93 @@
+import asyncio
+import io
+import json
+import time
+import uuid
+
+import pytest
+
+fitz = pytest.importorskip('fitz')
+
+from app import main
+from app.utils.cost import COST_BUDGET
+from app.utils.document_processor import DocumentProcessor
+from app.utils.spool import SpooledDocument
+from starlette.datastructures import Headers, UploadFile
+
+def _pdf(pages: int) -> bytes:
+    # A unique marker per document, so no result is served from the cache
+    marker = uuid.uuid4().hex
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"{marker} page {i + 1} " + "text layer words " * 40)
+    return doc.tobytes()
+
+@pytest.fixture
+def slow_pages(monkeypatch):
+    """Make every page take 50 ms and count the pages extracted"""
+    extracted = []
+    collect_page_links = DocumentProcessor._collect_page_links
+
+    def slow(self, collector, page_number, page_text):
+        time.sleep(0.05)
+        extracted.append(page_number)
+        return collect_page_links(self, collector, page_number, page_text)
+    monkeypatch.setattr(DocumentProcessor, '_collect_page_links', slow)
+    return extracted
+
+def _budget_drained(timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if COST_BUDGET.stats()['admitted'] == 0:
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_cancelled_request_stops_its_extraction(slow_pages):
+    document = SpooledDocument.from_bytes(_pdf(100), '.pdf')
+    processor = DocumentProcessor.from_spooled(document, 'application/pdf')
+
+    async def run():
+        estimate = main.estimate_cost(processor)
+        key = main.extraction_key(processor)
+        request = asyncio.create_task(main.process_with_timeout(processor, estimate, key))
+        await asyncio.sleep(0.3)
+        # What a client disconnect does to the request handling it
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+
+    try:
+        asyncio.run(run())
+        assert processor.cancel_event.is_set()
+        assert _budget_drained()
+        # The thread stopped at the next page instead of extracting all hundred
+        assert len(slow_pages) < 50
+    finally:
+        processor.close()
+        document.close()
+
+def test_batch_disconnect_stops_outstanding_documents(slow_pages):
+    pdfs = [_pdf(1)] + [_pdf(100) for _ in range(5)]
+    files = [
+        UploadFile(io.BytesIO(pdf), filename=f"doc{i}.pdf", headers=Headers({'content-type': 'application/pdf'}))
+        for i, pdf in enumerate(pdfs)
+    ]
+
+    async def run():
+        response = await main.process_documents_batch(
+            files=files, urls=None, ocr_mode=None, ocr_min_confidence=None, ocr_images=None, api_key='test'
+        )
+        records = response.body_iterator
+        first = json.loads(await records.__anext__())
+        # The client goes away after the first record
+        await records.aclose()
+        return first
+
+    first = asyncio.run(run())
+
+    assert first['status'] == 'ok' and first['source'] == 'doc0.pdf'
+    assert _budget_drained()
+    # Each outstanding document stopped at its next page instead of extracting all of them
+    assert len(slow_pages) < 200
+    assert COST_BUDGET.stats()['queued'] == 0
@@ -0,0 +1,170 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.utils.cost import CostBudget, CostBudgetBusy
+
+def _estimate(cpu_seconds: float, memory_mb: float = 10) -> dict:
+    return {'cpu_seconds': cpu_seconds, 'memory_mb': memory_mb}
+
+def _budget(**key_limits) -> CostBudget:
+    limits = {key: {'max_concurrent_cpu_seconds': limit} for key, limit in key_limits.items()}
+    return CostBudget(cpu_seconds=10, memory_mb=1000, key_limits=limits)
+
+def test_waiters_are_admitted_in_arrival_order():
+    budget = _budget()
+    order = []
+
+    async def run():
+        first = await budget.acquire(_estimate(10))
+
+        async def waiter(name, cpu_seconds):
+            reservation = await budget.acquire(_estimate(cpu_seconds), timeout=5)
+            order.append(name)
+            budget.release(reservation)
+
+        # The large request queued first is not overtaken by the small one behind it
+        waiters = [asyncio.create_task(waiter('large', 8))]
+        await asyncio.sleep(0.05)
+        waiters.append(asyncio.create_task(waiter('small', 1)))
+        await asyncio.sleep(0.05)
+        assert order == []
+        assert budget.stats()['queued'] == 2
+
+        budget.release(first)
+        await asyncio.gather(*waiters)
+
+    asyncio.run(run())
+    assert order == ['large', 'small']
+    assert budget.stats()['admitted'] == 0
+
+def test_key_limited_waiter_does_not_block_other_keys():
+    budget = _budget(greedy=4)
+
+    async def run():
+        held = await budget.acquire(_estimate(3), 'greedy')
+        # Over greedy's own concurrency limit, but there is global room for others
+        blocked = asyncio.create_task(budget.acquire(_estimate(3), 'greedy', timeout=5))
+        await asyncio.sleep(0.05)
+        other = await asyncio.wait_for(budget.acquire(_estimate(3), 'other'), timeout=1)
+        assert not blocked.done()
+
+        budget.release(held)
+        second = await asyncio.wait_for(blocked, timeout=2)
+        budget.release(second)
+        budget.release(other)
+
+    asyncio.run(run())
+    assert budget.stats()['cpu_seconds_in_flight'] == 0
+
+def test_queue_timeout_leaves_the_queue():
+    budget = _budget()
+
+    async def run():
+        held = await budget.acquire(_estimate(10))
+        with pytest.raises(CostBudgetBusy):
+            await budget.acquire(_estimate(5), timeout=0.1)
+        assert budget.stats()['queued'] == 0
+        budget.release(held)
+
+    asyncio.run(run())
+
+def test_cancelled_waiter_frees_its_place():
+    budget = _budget()
+
+    async def run():
+        held = await budget.acquire(_estimate(10))
+        first = asyncio.create_task(budget.acquire(_estimate(8), timeout=5))
+        second = asyncio.create_task(budget.acquire(_estimate(2), timeout=5))
+        await asyncio.sleep(0.05)
+
+        # The request at the head of the queue goes away (e.g. it timed out)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        budget.release(held)
+        budget.release(await asyncio.wait_for(second, timeout=1))
+
+    asyncio.run(run())
+    assert budget.stats()['queued'] == 0
+    assert budget.stats()['admitted'] == 0
+
+def test_queued_requests_do_not_hold_threads():
+    budget = _budget()
+    threads = threading.active_count()
+
+    async def run():
+        held = await budget.acquire(_estimate(10))
+        waiters = [asyncio.create_task(budget.acquire(_estimate(5), timeout=5)) for _ in range(50)]
+        await asyncio.sleep(0.05)
+        assert budget.stats()['queued'] == 50
+        assert threading.active_count() == threads
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        budget.release(held)
+
+    asyncio.run(run())
+    assert budget.stats()['queued'] == 0
+
+def test_blocking_admit_for_job_threads():
+    budget = _budget()
+    admitted = threading.Event()
+    release = threading.Event()
+
+    def job():
+        with budget.admit(_estimate(10), timeout=5):
+            admitted.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=job)
+    thread.start()
+    assert admitted.wait(5)
+    with pytest.raises(CostBudgetBusy):
+        with budget.admit(_estimate(5), timeout=0.1):
+            pass
+    release.set()
+    thread.join(5)
+    with budget.admit(_estimate(5), timeout=1):
+        assert budget.stats()['admitted'] == 1
+
+def test_oversized_document_is_admitted_alone():
+    budget = _budget()
+
+    async def run():
+        reservation = await asyncio.wait_for(budget.acquire(_estimate(50)), timeout=1)
+        budget.release(reservation)
+        # Releasing twice is harmless
+        budget.release(reservation)
+
+    asyncio.run(run())
+    assert budget.stats()['admitted'] == 0
+
+def test_flooding_key_stays_within_its_limit_under_contention():
+    budget = _budget(greedy=4)
+    running = {'greedy': 0, 'polite': 0}
+    peak = {'greedy': 0, 'polite': 0}
+    waited = {}
+
+    async def request(key):
+        started = asyncio.get_running_loop().time()
+        reservation = await budget.acquire(_estimate(2), key, timeout=10)
+        waited.setdefault(key, asyncio.get_running_loop().time() - started)
+        running[key] += 1
+        peak[key] = max(peak[key], running[key])
+        await asyncio.sleep(0.05)
+        running[key] -= 1
+        budget.release(reservation)
+
+    async def run():
+        flood = [asyncio.create_task(request('greedy')) for _ in range(10)]
+        await asyncio.sleep(0.01)
+        await request('polite')
+        await asyncio.gather(*flood)
+
+    asyncio.run(run())
+    # Two greedy documents at a time, and the other key is admitted without queueing behind them
+    assert peak['greedy'] == 2
+    assert waited['polite'] < 0.05
+    assert budget.stats()['admitted'] == 0
@@ -0,0 +1,146 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+fitz = pytest.importorskip('fitz')
+
+from app.utils.document_processor import ProcessingCancelled
+from app.utils.extraction_pool import ExtractionPool, ExtractionWorkerCrashed, WorkerProcessor
+from app.utils.ocr_tiers import OCRPolicy
+from app.utils.spool import SpooledDocument
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason="workers are inspected through /proc")
+
+def _pdf() -> bytes:
+    doc = fitz.open()
+    for i in range(2):
+        doc.new_page().insert_text((72, 72), f"Page {i + 1} " + "text layer words " * 40)
+    return doc.tobytes()
+
+# Unpickled in the worker when a document is opened there, so a test can make the worker
+# misbehave halfway through a document the way a hung or crashing native stage would
+
+def _start_child_and_hang(pid_path: str) -> OCRPolicy:
+    child = subprocess.Popen(['sleep', '60'])
+    with open(pid_path + '.tmp', 'w') as pid_file:
+        pid_file.write(str(child.pid))
+    os.rename(pid_path + '.tmp', pid_path)
+    time.sleep(60)
+    return OCRPolicy()
+
+def _crash() -> OCRPolicy:
+    os.kill(os.getpid(), signal.SIGKILL)
+
+class _HangingPolicy:
+    def __init__(self, pid_path: str):
+        self.pid_path = pid_path
+
+    def __reduce__(self):
+        return _start_child_and_hang, (self.pid_path,)
+
+class _CrashingPolicy:
+    def __reduce__(self):
+        return _crash, ()
+
+def _gone(pid: int, timeout: float = 5) -> bool:
+    """True once the process has exited (a zombie counts as exited)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with open(f'/proc/{pid}/stat') as stat:
+                if stat.read().rsplit(')', 1)[1].split()[0] in ('Z', 'X'):
+                    return True
+        except (FileNotFoundError, ProcessLookupError):
+            return True
+        time.sleep(0.05)
+    return False
+
+@pytest.fixture
+def document():
+    document = SpooledDocument.from_bytes(_pdf(), '.pdf')
+    yield document
+    document.close()
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**kwargs):
+        pool = ExtractionPool(workers=1, **kwargs)
+        pool.start([])
+        pools.append(pool)
+        return pool
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+def _extract(pool: ExtractionPool, document: SpooledDocument, **kwargs) -> int:
+    """Extract a document in the pool and return the pid of the worker that did it"""
+    with WorkerProcessor(document, 'application/pdf', pool=pool, queue_timeout=30, **kwargs) as processor:
+        text, _ = processor.process()
+        assert "Page 2" in text
+        return processor._worker.pid
+
+def test_worker_is_recycled_after_max_documents(make_pool, document):
+    pool = make_pool(max_documents=2)
+
+    pids = [_extract(pool, document) for _ in range(3)]
+
+    assert pids[0] == pids[1] != pids[2]
+    assert pool.stats()['recycled'] == 1
+    assert _gone(pids[0])
+
+def test_worker_is_recycled_over_max_rss(make_pool, document):
+    pool = make_pool(max_rss_mb=1)
+
+    first, second = _extract(pool, document), _extract(pool, document)
+
+    assert first != second
+    assert pool.stats()['recycled'] == 1
+
+def test_cancel_kills_the_worker_and_its_children(make_pool, document, tmp_path):
+    pool = make_pool()
+    pid_path = str(tmp_path / 'child.pid')
+    processor = WorkerProcessor(document, 'application/pdf', ocr_policy=_HangingPolicy(pid_path), pool=pool, queue_timeout=30)
+    found = {}
+
+    def cancel_once_the_child_runs():
+        # What process_with_timeout does when a document runs past MAX_PROCESSING_TIME
+        deadline = time.monotonic() + 30
+        while not os.path.exists(pid_path) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with open(pid_path) as pid_file:
+            found['child'] = int(pid_file.read())
+        processor.cancel()
+
+    canceller = threading.Thread(target=cancel_once_the_child_runs)
+    canceller.start()
+    worker_pid = pool._idle[0].pid
+    with pytest.raises(ProcessingCancelled):
+        processor.cost_features()
+    canceller.join()
+    processor.close()
+
+    assert _gone(worker_pid)
+    # The child was in the worker's process group, so the hard kill ended it too
+    assert _gone(found['child'])
+    assert pool.stats()['killed'] == 1
+
+def test_crashed_worker_is_a_server_error_and_replaced(make_pool, document):
+    from app.main import to_http_exception
+
+    pool = make_pool()
+    with WorkerProcessor(document, 'application/pdf', ocr_policy=_CrashingPolicy(), pool=pool, queue_timeout=30) as processor:
+        with pytest.raises(ExtractionWorkerCrashed) as raised:
+            processor.cost_features()
+
+    error = to_http_exception(raised.value)
+    assert error.status_code == 500
+    assert pool.stats()['crashed'] == 1
+    # The next document gets a fresh worker
+    _extract(pool, document)
@@ -0,0 +1,241 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.utils import fetcher
+from app.utils.fetcher import SNIFF_BYTES, FetchError, extract_s3_details_from_url, fetch_url
+
+PDF = b"%PDF-1.4\n" + bytes(range(256)) * 200
+
+class Rejected(Exception):
+    pass
+
+class _Handler(BaseHTTPRequestHandler):
+    # path -> (body, send Content-Length)
+    routes = {}
+    # Set by a test to let a held response finish
+    release = threading.Event()
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/held.pdf':
+            # Sends the head, then holds the rest back until the test releases it
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"MZ" + bytes(SNIFF_BYTES))
+            self.wfile.flush()
+            self.release.wait(10)
+            self.wfile.write(bytes(1024))
+            return
+        if path not in self.routes:
+            self.send_error(404)
+            return
+        body, with_length = self.routes[path]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        if with_length:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    _Handler.release.set()
+    httpd.shutdown()
+
+@pytest.fixture(autouse=True)
+def fresh_s3_client(monkeypatch):
+    monkeypatch.setattr(fetcher, '_s3_client', None)
+
+def sniff_pdf(head: bytes, filename: str):
+    if not head.startswith(b"%PDF"):
+        raise Rejected(filename)
+
+def fetch(url: str, sniff=sniff_pdf, **kwargs):
+    async def run():
+        try:
+            return await fetch_url(url, sniff=sniff, **kwargs)
+        finally:
+            await fetcher.close_clients()
+    return asyncio.run(run())
+
+@pytest.mark.parametrize('url, expected', [
+    ('s3://bucket/folder/report.pdf', ('bucket', 'folder/report.pdf')),
+    ('s3://bucket/with%20space.pdf', ('bucket', 'with space.pdf')),
+    ('https://bucket.s3.amazonaws.com/folder/report.pdf', ('bucket', 'folder/report.pdf')),
+    ('https://my.dotted.bucket.s3.eu-west-1.amazonaws.com/report.pdf', ('my.dotted.bucket', 'report.pdf')),
+    ('https://bucket.s3-us-west-2.amazonaws.com/report.pdf', ('bucket', 'report.pdf')),
+    ('https://s3.eu-west-1.amazonaws.com/bucket/folder/report.pdf', ('bucket', 'folder/report.pdf')),
+    ('https://s3.amazonaws.com/bucket/report.pdf', ('bucket', 'report.pdf')),
+    ('s3://bucket', None),
+    ('s3://bucket/', None),
+    ('https://s3.amazonaws.com/bucket', None),
+    ('https://bucket.s3.amazonaws.com/report.pdf?X-Amz-Signature=abc&X-Amz-Expires=60', None),
+    ('https://example.com/report.pdf', None),
+    ('ftp://bucket.s3.amazonaws.com/report.pdf', None),
+])
+def test_s3_url_parsing(url, expected):
+    assert extract_s3_details_from_url(url) == expected
+
+def test_http_download(server):
+    _Handler.routes['/report.pdf'] = (PDF, True)
+
+    document, filename, content_type = fetch(f"{server}/report.pdf?download=1")
+    with document:
+        assert bytes(document.buffer) == PDF
+        assert filename == 'report.pdf'
+        assert content_type == 'application/pdf'
+
+@pytest.mark.parametrize('with_length', [True, False])
+def test_http_size_cap(server, with_length):
+    # Rejected from Content-Length when sent, otherwise once the streamed bytes cross the cap
+    _Handler.routes['/large.pdf'] = (PDF, with_length)
+
+    with pytest.raises(FetchError) as raised:
+        fetch(f"{server}/large.pdf", max_bytes=len(PDF) - 1)
+    assert raised.value.status_code == 413
+
+def test_http_error_status(server):
+    with pytest.raises(FetchError) as raised:
+        fetch(f"{server}/missing.pdf")
+    assert raised.value.status_code == 400
+
+def test_sniff_rejects_before_the_download_finishes(server):
+    _Handler.release.clear()
+    started = time.monotonic()
+
+    with pytest.raises(Rejected):
+        fetch(f"{server}/held.pdf")
+    # The server holds the rest of the body back for ten seconds
+    assert time.monotonic() - started < 5
+    _Handler.release.set()
+
+def test_sniff_sees_short_documents(server):
+    _Handler.routes['/short.txt'] = (b"hello", True)
+
+    with pytest.raises(Rejected):
+        fetch(f"{server}/short.txt")
+
+@pytest.fixture
+def s3(monkeypatch):
+    moto = pytest.importorskip('moto')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with moto.mock_aws():
+        client = fetcher.get_s3_client()
+        client.create_bucket(Bucket='documents')
+        yield client
+
+def test_s3_ranged_reads(s3, monkeypatch):
+    s3.put_object(Bucket='documents', Key='folder/report.pdf', Body=PDF, ContentType='application/pdf')
+    ranges = []
+    read_range = fetcher._read_range
+    monkeypatch.setattr(fetcher, '_read_range', lambda client, bucket, key, start, end, write: (
+        ranges.append((start, end)), read_range(client, bucket, key, start, end, write))[1])
+    heads = []
+
+    document, filename, content_type = fetch('s3://documents/folder/report.pdf',
+                                             sniff=lambda head, name: heads.append(head))
+    with document:
+        assert bytes(document.buffer) == PDF
+        assert filename == 'report.pdf'
+        assert content_type == 'application/pdf'
+    # The sniffer sees only a ranged read of the head; the rest follows in a second range
+    assert heads == [PDF[:SNIFF_BYTES]]
+    assert ranges == [(0, SNIFF_BYTES - 1), (SNIFF_BYTES, len(PDF) - 1)]
+
+def test_s3_virtual_hosted_url(s3):
+    s3.put_object(Bucket='documents', Key='report.pdf', Body=PDF[:100])
+
+    document, filename, _ = fetch('https://documents.s3.amazonaws.com/report.pdf')
+    with document:
+        assert bytes(document.buffer) == PDF[:100]
+        assert filename == 'report.pdf'
+
+def test_s3_size_cap_from_head(s3, monkeypatch):
+    s3.put_object(Bucket='documents', Key='report.pdf', Body=PDF)
+    monkeypatch.setattr(fetcher, '_read_range', lambda *args: pytest.fail("object read despite the size cap"))
+
+    with pytest.raises(FetchError) as raised:
+        fetch('s3://documents/report.pdf', max_bytes=len(PDF) - 1)
+    assert raised.value.status_code == 413
+
+def test_s3_sniff_rejection(s3):
+    s3.put_object(Bucket='documents', Key='notes.txt', Body=b"plain text" * 2000)
+
+    with pytest.raises(Rejected):
+        fetch('s3://documents/notes.txt')
+
+def test_s3_missing_object(s3):
+    with pytest.raises(FetchError) as raised:
+        fetch('s3://documents/missing.pdf')
+    assert raised.value.status_code == 400
+
+def _record_http_fallback(monkeypatch):
+    calls = []
+
+    async def fake_fetch_http(url, sniff, max_bytes):
+        calls.append(url)
+        raise FetchError("fetched over HTTP", status_code=418)
+    monkeypatch.setattr(fetcher, '_fetch_http', fake_fetch_http)
+    return calls
+
+@pytest.fixture
+def no_credentials(monkeypatch, tmp_path):
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SESSION_TOKEN', 'AWS_PROFILE'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('AWS_SHARED_CREDENTIALS_FILE', str(tmp_path / 'credentials'))
+    monkeypatch.setenv('AWS_CONFIG_FILE', str(tmp_path / 'config'))
+    monkeypatch.setenv('AWS_EC2_METADATA_DISABLED', 'true')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+
+def test_https_url_falls_back_to_http_without_credentials(no_credentials, monkeypatch):
+    calls = _record_http_fallback(monkeypatch)
+
+    with pytest.raises(FetchError) as raised:
+        fetch('https://documents.s3.amazonaws.com/report.pdf')
+    assert raised.value.status_code == 418
+    assert calls == ['https://documents.s3.amazonaws.com/report.pdf']
+
+def test_s3_url_without_credentials_is_a_fetch_error(no_credentials, monkeypatch):
+    calls = _record_http_fallback(monkeypatch)
+
+    with pytest.raises(FetchError) as raised:
+        fetch('s3://documents/report.pdf')
+    assert raised.value.status_code == 500
+    assert calls == []
+
+class _DeniedClient:
+    def head_object(self, **kwargs):
+        from botocore.exceptions import ClientError
+        raise ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'Access Denied'}}, 'HeadObject')
+
+def test_https_url_falls_back_to_http_on_access_denied(monkeypatch):
+    calls = _record_http_fallback(monkeypatch)
+    monkeypatch.setattr(fetcher, 'get_s3_client', _DeniedClient)
+
+    with pytest.raises(FetchError) as raised:
+        fetch('https://s3.amazonaws.com/documents/report.pdf')
+    assert raised.value.status_code == 418
+    assert calls == ['https://s3.amazonaws.com/documents/report.pdf']
+
+def test_s3_url_access_denied_is_a_client_error(monkeypatch):
+    calls = _record_http_fallback(monkeypatch)
+    monkeypatch.setattr(fetcher, 'get_s3_client', _DeniedClient)
+
+    with pytest.raises(FetchError) as raised:
+        fetch('s3://documents/report.pdf')
+    assert raised.value.status_code == 400
+    assert calls == []
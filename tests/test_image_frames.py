@@ -0,0 +1,46 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.utils.document_processor import EXIF_ORIENTATION_TAG, iter_image_frames
+
+def _encode(image: Image.Image, image_format: str, orientation: int, **kwargs) -> bytes:
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION_TAG] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, exif=exif, **kwargs)
+    return buffer.getvalue()
+
+def _landscape() -> Image.Image:
+    # Dark left edge, so the direction of a rotation can be checked as well as the size
+    image = Image.new('L', (3000, 1000), 255)
+    image.paste(0, (0, 0, 100, 1000))
+    return image
+
+@pytest.mark.parametrize('image_format', ['TIFF', 'JPEG', 'PNG'])
+@pytest.mark.parametrize('orientation, size', [(1, (2000, 667)), (3, (2000, 667)), (6, (1000, 3000)), (8, (1000, 3000))])
+def test_orientation_is_applied_once(image_format, orientation, size):
+    frames = list(iter_image_frames(_encode(_landscape(), image_format, orientation)))
+
+    assert [frame.size for frame in frames] == [size]
+    assert frames[0].mode == 'L'
+
+@pytest.mark.parametrize('image_format', ['TIFF', 'JPEG', 'PNG'])
+def test_rotation_direction_matches_across_formats(image_format):
+    # Orientation 6: the stored left edge ends up at the top
+    frame = next(iter_image_frames(_encode(_landscape(), image_format, 6)))
+
+    assert frame.getpixel((frame.width // 2, 10)) < 128
+    assert frame.getpixel((frame.width // 2, frame.height - 10)) > 128
+
+def test_multi_frame_tiff_orients_every_frame():
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION_TAG] = 6
+    _landscape().save(buffer, 'TIFF', exif=exif, save_all=True, append_images=[_landscape()])
+
+    frames = list(iter_image_frames(buffer.getvalue()))
+
+    assert len(frames) == 2
+    assert frames[0].size == (1000, 3000)
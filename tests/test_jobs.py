@@ -0,0 +1,251 @@
+import asyncio
+import sys
+import threading
+import time
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.auth.auth_handler import API_KEY
+from app.utils import jobs
+from app.utils.document_processor import ProcessingCancelled
+from app.utils.jobs import JobManager, JobQueueFull, MemoryJobStore, SQLiteJobStore, create_job_store
+
+async def _wait_finished(manager: JobManager, job_ids, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        records = [manager.get(job_id) for job_id in job_ids]
+        if all(record['finished_at'] is not None for record in records):
+            return records
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"jobs did not finish: {records}")
+
+def _hold_until(release: threading.Event):
+    """Handler that keeps the worker busy until released (or cancelled)"""
+    def handler(payload, cancel_event):
+        while not release.is_set():
+            if cancel_event.wait(0.01):
+                raise ProcessingCancelled("Document processing was cancelled")
+        return {'name': payload['name']}
+    return handler
+
+def test_lower_priority_values_run_first():
+    order = []
+    release = threading.Event()
+    hold = _hold_until(release)
+
+    def handler(payload, cancel_event):
+        if payload['name'] == 'blocker':
+            return hold(payload, cancel_event)
+        order.append(payload['name'])
+        return {}
+
+    async def run():
+        manager = JobManager(handler, store=MemoryJobStore(), workers=1)
+        await manager.start()
+        ids = [manager.submit({'name': 'blocker'}, {})['id']]
+        await asyncio.sleep(0.05)
+        # Queued behind the running job; equal priorities keep their submission order
+        for name, priority in (('low', 9), ('high', 1), ('normal-1', 5), ('normal-2', 5)):
+            ids.append(manager.submit({'name': name}, {}, priority=priority)['id'])
+        assert manager.queue_depth == 4
+        release.set()
+        await _wait_finished(manager, ids)
+        await manager.stop()
+
+    asyncio.run(run())
+    assert order == ['high', 'normal-1', 'normal-2', 'low']
+
+def test_full_queue_rejects_and_releases():
+    released = []
+
+    async def run():
+        manager = JobManager(lambda payload, event: {}, store=MemoryJobStore(), workers=0, max_queued=2,
+                             release=released.append)
+        await manager.start()
+        manager.submit({'name': 'a'}, {})
+        manager.submit({'name': 'b'}, {})
+        with pytest.raises(JobQueueFull):
+            manager.submit({'name': 'c'}, {})
+        await manager.stop()
+
+    asyncio.run(run())
+    # Queued payloads are released when the manager stops; the rejected one was never taken
+    assert released == [{'name': 'a'}, {'name': 'b'}]
+
+@pytest.fixture
+def queued_only(monkeypatch, tmp_path):
+    """The app's job endpoints over a manager without workers, so submitted jobs stay queued"""
+    from app.utils import spool
+
+    monkeypatch.setattr(spool, 'SPOOL_DIR', str(tmp_path))
+    manager = JobManager(main.run_extraction_job, store=MemoryJobStore(), workers=0, max_queued=1,
+                         release=main.release_job_payload)
+    asyncio.run(manager.start())
+    monkeypatch.setattr(main, 'job_manager', manager)
+    yield TestClient(main.app, headers={'X-API-Key': API_KEY}), tmp_path
+    asyncio.run(manager.stop())
+    assert list(tmp_path.iterdir()) == []
+
+def _pdf() -> bytes:
+    fitz = pytest.importorskip('fitz')
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Queued document " * 10)
+    return doc.tobytes()
+
+def test_submit_over_capacity_is_429_with_retry_after(queued_only):
+    client, spool_dir = queued_only
+    pdf = _pdf()
+
+    first = client.post('/jobs', files={'file': ('a.pdf', pdf, 'application/pdf')}, data={'priority': '3'})
+    second = client.post('/jobs', files={'file': ('b.pdf', pdf, 'application/pdf')})
+
+    assert first.status_code == 202
+    assert first.json()['status'] == 'queued' and first.json()['priority'] == 3
+    assert second.status_code == 429
+    assert second.headers['Retry-After'] == '10'
+    # Only the queued job's document is still spooled
+    assert len(list(spool_dir.iterdir())) == 1
+
+def test_delete_queued_job(queued_only):
+    client, _ = queued_only
+    job = client.post('/jobs', files={'file': ('a.pdf', _pdf(), 'application/pdf')}).json()
+
+    response = client.delete(f"/jobs/{job['id']}")
+
+    assert response.status_code == 200
+    assert client.get(f"/jobs/{job['id']}").json()['status'] == 'cancelled'
+    assert client.delete('/jobs/unknown').status_code == 404
+    assert client.get('/jobs/unknown').status_code == 404
+
+def test_cancel_running_job():
+    stopped = threading.Event()
+    started = threading.Event()
+
+    def handler(payload, cancel_event):
+        started.set()
+        try:
+            return _hold_until(threading.Event())(payload, cancel_event)
+        finally:
+            stopped.set()
+
+    async def run():
+        manager = JobManager(handler, store=MemoryJobStore(), workers=1)
+        await manager.start()
+        job_id = manager.submit({'name': 'running'}, {})['id']
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        assert manager.get(job_id)['status'] == 'running'
+        manager.cancel(job_id)
+        record, = await _wait_finished(manager, [job_id])
+        await manager.stop()
+        return record
+
+    record = asyncio.run(run())
+    assert record['status'] == 'cancelled'
+    assert stopped.is_set()
+
+def test_timed_out_job_is_stopped_before_the_next_one_runs():
+    events = []
+
+    def handler(payload, cancel_event):
+        events.append(f"start {payload['name']}")
+        if payload['name'] == 'slow':
+            # Ignores the deadline until the cancel event tells it to stop
+            cancel_event.wait(10)
+            time.sleep(0.1)
+            events.append("slow stopped")
+            raise ProcessingCancelled("Document processing was cancelled")
+        return {}
+
+    async def run():
+        manager = JobManager(handler, store=MemoryJobStore(), workers=1, timeout=0.2)
+        await manager.start()
+        ids = [manager.submit({'name': name}, {})['id'] for name in ('slow', 'next')]
+        records = await _wait_finished(manager, ids)
+        await manager.stop()
+        return records
+
+    slow, following = asyncio.run(run())
+    assert slow['status'] == 'timed_out'
+    assert "0.2 second timeout" in slow['error']
+    assert following['status'] == 'succeeded'
+    # The worker joined the timed-out thread before taking the next job
+    assert events == ["start slow", "slow stopped", "start next"]
+
+def test_finished_jobs_expire_after_the_ttl(monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_RESULT_TTL', 0.2)
+
+    async def run():
+        manager = JobManager(lambda payload, event: {'ok': True}, store=MemoryJobStore(), workers=1)
+        await manager.start()
+        old = manager.submit({}, {})['id']
+        await _wait_finished(manager, [old])
+        await asyncio.sleep(0.3)
+        # Expired jobs are purged when the next job is submitted
+        new = manager.submit({}, {})['id']
+        await _wait_finished(manager, [new])
+        await manager.stop()
+        return manager.get(old), manager.get(new)
+
+    old, new = asyncio.run(run())
+    assert old is None
+    assert new['result'] == {'ok': True}
+
+def _job(job_id: str, finished_at=None) -> dict:
+    return {'id': job_id, 'status': 'queued' if finished_at is None else 'succeeded', 'finished_at': finished_at}
+
+def test_sqlite_store_persists_and_purges(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    store = create_job_store(f"sqlite:///{path}")
+    assert isinstance(store, SQLiteJobStore)
+    store.save(_job('old', finished_at=100.0))
+    store.save(_job('recent', finished_at=200.0))
+    store.save(_job('queued'))
+    store.save({**_job('queued'), 'status': 'running'})
+
+    # Another process (or a restart) sees the same jobs
+    reopened = SQLiteJobStore(str(path))
+    assert reopened.get('queued')['status'] == 'running'
+    reopened.purge(150.0)
+    assert reopened.get('old') is None
+    assert reopened.get('recent') is not None
+    # Unfinished jobs are never purged
+    assert reopened.get('queued') is not None
+    assert reopened.get('missing') is None
+
+class _FakeRedis:
+    """Just enough of redis-py for RedisJobStore: values with their expiry"""
+
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+
+    @classmethod
+    def from_url(cls, url):
+        return cls()
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode()
+        self.expiry[key] = ex
+
+    def get(self, key):
+        return self.values.get(key)
+
+def test_redis_store_expires_only_finished_jobs(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'redis', types.SimpleNamespace(Redis=_FakeRedis))
+    store = create_job_store("redis://localhost:6379/0")
+
+    store.save(_job('queued'))
+    store.save(_job('done', finished_at=time.time()))
+
+    assert store.get('queued') == _job('queued')
+    assert store.get('missing') is None
+    client = store._redis
+    assert client.expiry['docprocessor:job:queued'] is None
+    assert client.expiry['docprocessor:job:done'] == int(jobs.JOB_RESULT_TTL)
+
+def test_default_store_is_in_memory():
+    assert isinstance(create_job_store("memory"), MemoryJobStore)
@@ -0,0 +1,56 @@
+import pytest
+
+from app.utils.links import LinkCollector
+
+def _scan(text):
+    collector = LinkCollector()
+    collector.add_text(text)
+    return collector.result()
+
+@pytest.mark.parametrize('text, phone', [
+    ("Call +44 20 7946 0958 today", "+44 20 7946 0958"),
+    ("Tel: +1 (555) 123-4567", "+1 (555) 123-4567"),
+    ("+4915112345678", "+4915112345678"),
+    ("+33 1 42 68 53 00", "+33 1 42 68 53 00"),
+    ("Phone (555) 123-4567.", "(555) 123-4567"),
+    ("(030) 1234567", "(030) 1234567"),
+    ("555-123-4567", "555-123-4567"),
+    ("555.123.4567", "555.123.4567"),
+    ("Office: 030 1234 5678", "030 1234 5678"),
+    ("020 7946 0958", "020 7946 0958"),
+])
+def test_phone_numbers_are_found(text, phone):
+    assert _scan(text)['phone_links'] == [phone]
+
+@pytest.mark.parametrize('text', [
+    "Revenue grew to 100 000 000 last year",
+    "Revenue grew to 1 000 000 000 last year",
+    "Invoice 2019 12345678",
+    "Reference 12345678",
+    "Dates 2019-2020 2021-2022",
+    "Version 10.2.3 build 4567",
+    "Employees: 1200 3400 5600",
+    "Order 0012345678",
+    "+12 34",
+])
+def test_numbers_that_are_not_phones_are_ignored(text):
+    assert _scan(text)['phone_links'] == []
+
+def test_text_scan_finds_every_kind():
+    links = _scan("Mail jane@example.com, see https://github.com/jane and example.org/about. +44 20 7946 0958")
+
+    assert links['email_links'] == ['jane@example.com']
+    assert links['github_links'] == ['https://github.com/jane']
+    assert links['text_links'] == ['https://github.com/jane', 'example.org/about']
+    assert links['phone_links'] == ['+44 20 7946 0958']
+
+def test_mailto_and_tel_annotations_stay_web_links():
+    collector = LinkCollector()
+    collector.add_uris(['mailto:jane@example.com?subject=Hi', 'tel:+15551234567', 'https://www.linkedin.com/in/jane'])
+    links = collector.result()
+
+    assert links['annotation_links'] == ['mailto:jane@example.com?subject=Hi', 'tel:+15551234567', 'https://www.linkedin.com/in/jane']
+    assert links['web_links'] == ['mailto:jane@example.com?subject=Hi', 'tel:+15551234567']
+    assert links['email_links'] == ['jane@example.com']
+    assert links['phone_links'] == ['+15551234567']
+    assert links['linkedin_links'] == ['https://www.linkedin.com/in/jane']
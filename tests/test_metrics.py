@@ -0,0 +1,58 @@
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.utils import metrics
+
+@pytest.fixture
+def client():
+    # Without entering the client, the lifespan (job workers, warm-up) does not run
+    return TestClient(main.app)
+
+def _types(body: str) -> dict:
+    return dict(re.findall(r"^# TYPE (\S+) (\S+)$", body, re.MULTILINE))
+
+def test_histogram_buckets_and_labels(client):
+    metrics.STAGE_SECONDS.observe(0.003, 'sniff')
+    metrics.record_extraction('application/pdf', 'hybrid', ['pymupdf', 'ocr', 'ocr'], 1.5)
+
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    body = response.text
+    buckets = re.findall(r'^docprocessor_stage_seconds_bucket\{stage="sniff",le="([^"]+)"\} (\S+)$', body, re.MULTILINE)
+    bounds = [bound for bound, _ in buckets]
+    assert bounds == [str(float(bound)) for bound in metrics.DEFAULT_BUCKETS] + ['+Inf']
+    counts = [float(count) for _, count in buckets]
+    # Cumulative, and the 3 ms sample is in every bucket from 5 ms up
+    assert counts == sorted(counts)
+    assert counts[bounds.index('0.005')] >= 1 and counts[bounds.index('0.001')] < counts[-1]
+    assert re.search(r'^docprocessor_stage_seconds_count\{stage="sniff"\} ', body, re.MULTILINE)
+    assert re.search(
+        r'^docprocessor_extraction_seconds_bucket\{mime_type="application/pdf",method="hybrid",le="2.5"\} ', body, re.MULTILINE
+    )
+    assert re.search(r'^docprocessor_pages_total\{mime_type="application/pdf",method="ocr"\} ', body, re.MULTILINE)
+
+def test_running_totals_are_counters(client):
+    body = client.get('/metrics').text
+    types = _types(body)
+
+    assert types['docprocessor_stage_seconds'] == 'histogram'
+    for name in (
+        'docprocessor_cache_hits_total', 'docprocessor_cache_misses_total', 'docprocessor_extraction_worker_restarts_total'
+    ):
+        assert types[name] == 'counter'
+    assert 'docprocessor_cache_hits' not in types
+    assert types['docprocessor_cache_hit_ratio'] == 'gauge'
+    assert types['docprocessor_jobs_queued'] == 'gauge'
+    assert re.search(r'^docprocessor_cache_hits_total\{cache="pages"\} ', body, re.MULTILINE)
+    assert re.search(r'^docprocessor_extraction_worker_restarts_total\{reason="crashed"\} ', body, re.MULTILINE)
+    # Every metric's samples follow its own TYPE line
+    assert len(types) == body.count('# TYPE ')
+
+def test_disabled_metrics_are_not_found(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_ENABLED', False)
+
+    assert client.get('/metrics').status_code == 404
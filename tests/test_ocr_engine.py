@@ -0,0 +1,73 @@
+import sys
+import types
+
+import pytest
+from PIL import Image
+
+from app.utils.ocr_engine import TesserocrEngine, create_engine, engine_name
+
+class _FakeAPI:
+    """Records the Tesseract variables in effect when each page is recognized"""
+
+    def __init__(self, lang):
+        self.variables = {'tessedit_do_invert': '1'}
+        self.recognized_with = []
+
+    def SetVariable(self, name, value):
+        self.variables[name] = value
+
+    def SetImageBytes(self, *args):
+        pass
+
+    def SetImage(self, image):
+        pass
+
+    def Recognize(self):
+        pass
+
+    def GetUTF8Text(self):
+        self.recognized_with.append(self.variables['tessedit_do_invert'])
+        return "text"
+
+    def AllWordConfidences(self):
+        return [90]
+
+    def Clear(self):
+        pass
+
+class _BrokenAPI:
+    def __init__(self, lang):
+        # What tesserocr raises when the language data is missing
+        raise RuntimeError("Failed to init API, possibly an invalid tessdata path")
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'tesserocr', types.SimpleNamespace(PyTessBaseAPI=_FakeAPI))
+    return TesserocrEngine()
+
+@pytest.fixture
+def fresh_engine_name():
+    engine_name.cache_clear()
+    yield
+    engine_name.cache_clear()
+
+def test_fast_pass_does_not_leak_into_later_pages(engine):
+    image = Image.new('L', (64, 32), 255)
+
+    engine.image_to_data(image, fast=True)
+    engine.image_to_string(image)
+    engine.image_to_data(image)
+    engine.image_to_data(image, fast=True)
+    engine.image_to_string(image)
+
+    # Inversion is only off for the fast passes, whatever the thread ran before
+    assert engine._api.recognized_with == ['0', '1', '1', '0', '1']
+
+@pytest.mark.parametrize('api, expected', [(_FakeAPI, 'tesserocr'), (_BrokenAPI, 'pytesseract'), (None, 'pytesseract')])
+def test_engine_name_is_the_engine_auto_creates(monkeypatch, fresh_engine_name, api, expected):
+    # None: tesserocr is not installed
+    monkeypatch.setitem(sys.modules, 'tesserocr', types.SimpleNamespace(PyTessBaseAPI=api) if api else None)
+
+    assert engine_name('auto') == expected
+    assert create_engine('auto').name == expected
+    assert engine_name('pytesseract') == 'pytesseract'
@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils.ocr_pool import OCRPool, OCRPoolBusy
+
+@pytest.fixture
+def pool():
+    # Pages run in threads instead of OCR processes; only the admission logic is under test
+    pool = OCRPool(workers=4, max_documents=2)
+    executor = ThreadPoolExecutor(max_workers=4)
+    pool._submit = executor.submit
+    yield pool
+    executor.shutdown(wait=True)
+
+def test_fair_share_shrinks_as_documents_arrive(pool):
+    with pool._admit(1) as first:
+        # Alone, a document may use every worker
+        assert all(pool._acquire(first, block=False) for _ in range(4))
+        with pool._admit(1) as second:
+            assert not pool._acquire(second, block=False)
+
+            pool._release(first)
+            # The freed worker goes to the newcomer, not back to the document over its share
+            assert not pool._acquire(first, block=False)
+            assert pool._acquire(second, block=False)
+
+            pool._release(first)
+            pool._release(first)
+            assert pool._acquire(second, block=False)
+            # Both now hold their share of two
+            assert not pool._acquire(second, block=False)
+            assert pool._acquire(first, block=False)
+            assert pool.stats()['pages_in_flight'] == 4
+            for _ in range(2):
+                pool._release(first)
+                pool._release(second)
+
+def test_documents_over_the_limit_wait_then_are_rejected(pool):
+    with pool._admit(1), pool._admit(1):
+        assert pool.stats()['active_documents'] == 2
+        started = time.monotonic()
+        with pytest.raises(OCRPoolBusy):
+            with pool._admit(0.2):
+                pass
+        assert time.monotonic() - started >= 0.2
+
+def test_small_document_is_not_starved_by_a_large_one(pool):
+    lock = threading.Lock()
+    running = {'large': 0, 'small': 0}
+    peak_while_shared = {'large': 0, 'small': 0}
+    finished = {}
+
+    def ocr(item):
+        name, _ = item
+        with lock:
+            running[name] += 1
+            if running['large'] and running['small']:
+                for key in running:
+                    peak_while_shared[key] = max(peak_while_shared[key], running[key])
+        time.sleep(0.02)
+        with lock:
+            running[name] -= 1
+        return name
+
+    def document(name, pages):
+        for future in pool.map(ocr, ((name, i) for i in range(pages))):
+            future.result()
+        finished[name] = time.monotonic()
+
+    large = threading.Thread(target=document, args=('large', 60))
+    large.start()
+    time.sleep(0.1)
+    small = threading.Thread(target=document, args=('small', 6))
+    small.start()
+    small.join(10)
+    large.join(10)
+
+    # The small document gets its half of the workers and finishes long before the large one
+    assert finished['small'] < finished['large']
+    assert peak_while_shared['small'] == 2
+    assert pool.stats() == {'workers': 4, 'pages_in_flight': 0, 'active_documents': 0}
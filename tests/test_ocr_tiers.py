@@ -0,0 +1,101 @@
+from collections import deque
+
+import pytest
+
+np = pytest.importorskip('numpy')
+fitz = pytest.importorskip('fitz')
+from PIL import Image, ImageDraw
+
+from app.utils import document_processor
+from app.utils.document_processor import DocumentProcessor
+from app.utils.image_preprocess import DESKEW_MAX_ANGLE, estimate_skew, otsu_threshold, preprocess_for_ocr
+from app.utils.ocr_pool import OCR_POOL
+from app.utils.ocr_tiers import OCRPolicy
+
+PAPER, INK = 235, 30
+
+def _text_page() -> Image.Image:
+    """Rows of word-sized dark boxes on light paper, like a scanned page of text"""
+    image = Image.new('L', (800, 1000), PAPER)
+    draw = ImageDraw.Draw(image)
+    rng = np.random.default_rng(1)
+    for y in range(80, 920, 40):
+        x = 60
+        while x < 720:
+            width = int(rng.integers(20, 80))
+            draw.rectangle([x, y, min(x + width, 740), y + 14], fill=INK)
+            x += width + 15
+    return image
+
+def _skewed(angle: float) -> Image.Image:
+    return _text_page().rotate(angle, resample=Image.Resampling.BILINEAR, expand=True, fillcolor=PAPER)
+
+def _skew(image: Image.Image) -> float:
+    pixels = np.asarray(image)
+    return estimate_skew(pixels, otsu_threshold(pixels))
+
+def test_otsu_threshold_separates_ink_from_paper():
+    threshold = otsu_threshold(np.asarray(_skewed(2)))
+
+    assert INK <= threshold < PAPER
+
+@pytest.mark.parametrize('angle', [0, 3, -2, 4.5])
+def test_skew_is_recovered(angle):
+    # The angle preprocess_for_ocr rotates by, undoing the skew
+    assert _skew(_skewed(angle)) == pytest.approx(-angle, abs=0.5)
+
+def test_skew_correction_is_capped():
+    assert abs(_skew(_skewed(10))) <= DESKEW_MAX_ANGLE
+
+def test_preprocessed_page_is_straight_and_binary():
+    image = preprocess_for_ocr(_skewed(3))
+
+    pixels = np.asarray(image)
+    assert set(np.unique(pixels)) <= {0, 255}
+    assert _skew(image) == pytest.approx(0, abs=0.5)
+
+@pytest.fixture
+def scripted_ocr(monkeypatch):
+    """OCR inline with scripted confidences: the fast pass and the retries each answer in page order"""
+    monkeypatch.setattr(OCR_POOL, 'workers', 0)
+    answers = {'fast': deque(), 'retry': deque()}
+
+    def ocr_page_scored(image, fast=False, preprocess=False, confidence=True):
+        tier = 'fast' if fast else 'retry'
+        assert preprocess == (tier == 'retry')
+        page, score = answers[tier].popleft()
+        return {'text': f"{tier} text of page {page}", 'confidence': score, 'seconds': 0.01}
+    monkeypatch.setattr(document_processor, 'ocr_page_scored', ocr_page_scored)
+    return answers
+
+def _pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page()
+    return doc.tobytes()
+
+def test_retry_is_kept_only_when_it_is_more_confident(scripted_ocr):
+    scripted_ocr['fast'].extend([(1, 90), (2, 50), (3, 60)])
+    # Only pages 2 and 3 are under the minimum confidence and retried
+    scripted_ocr['retry'].extend([(2, 80), (3, 40)])
+    policy = OCRPolicy(mode='tiered', min_confidence=75)
+
+    with DocumentProcessor(_pdf(3), 'application/pdf', ocr_policy=policy) as processor:
+        texts = list(processor._ocr_tiered([0, 1, 2]))
+        stats = processor.ocr_stats
+
+    # The less confident retry of page 3 is thrown away
+    assert texts == ["fast text of page 1", "retry text of page 2", "fast text of page 3"]
+    assert stats['fast']['pages'] == 3
+    assert stats['retry']['pages'] == 2 and stats['retry']['kept'] == 1
+    assert not scripted_ocr['retry']
+
+def test_confident_pages_are_not_retried(scripted_ocr):
+    scripted_ocr['fast'].extend([(1, 80), (2, 95)])
+    policy = OCRPolicy(mode='tiered', min_confidence=75)
+
+    with DocumentProcessor(_pdf(2), 'application/pdf', ocr_policy=policy) as processor:
+        texts = list(processor._ocr_tiered([0, 1]))
+
+        assert 'retry' not in processor.ocr_stats
+    assert texts == ["fast text of page 1", "fast text of page 2"]
@@ -0,0 +1,185 @@
+import io
+import zipfile
+
+import pytest
+
+from app.utils.document_processor import DOCX_MIME_TYPE, DocumentProcessor, ExtractionMethod
+from app.utils.ooxml import DocxReader
+
+W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+R = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+MC = 'http://schemas.openxmlformats.org/markup-compatibility/2006'
+WPS = 'http://schemas.microsoft.com/office/word/2010/wordprocessingShape'
+NAMESPACES = f'xmlns:w="{W}" xmlns:r="{R}" xmlns:mc="{MC}" xmlns:wps="{WPS}"'
+REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+EXTERNAL = ' TargetMode="External"'
+
+def _p(*runs: str, properties: str = '') -> str:
+    return f"<w:p>{properties}{''.join(runs)}</w:p>"
+
+def _r(text: str) -> str:
+    return f'<w:r><w:t xml:space="preserve">{text}</w:t></w:r>'
+
+def _docx(body: str, parts: dict = None, relationships: list = None) -> bytes:
+    """A minimal package: the main document plus optional related parts.
+
+    relationships are (id, type suffix, target, external) of the main document.
+    """
+    rels = "".join(
+        f'<Relationship Id="{rel_id}" Type="{REL}/{rel_type}" Target="{target}"'
+        f'{EXTERNAL if external else ""}/>'
+        for rel_id, rel_type, target, external in relationships or []
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as package:
+        package.writestr('[Content_Types].xml', '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>')
+        package.writestr(
+            '_rels/.rels',
+            f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{REL}/officeDocument" Target="word/document.xml"/></Relationships>'
+        )
+        package.writestr('word/document.xml', f'<w:document {NAMESPACES}><w:body>{body}</w:body></w:document>')
+        package.writestr(
+            'word/_rels/document.xml.rels',
+            f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{rels}</Relationships>'
+        )
+        for name, xml in (parts or {}).items():
+            package.writestr(f'word/{name}', xml)
+    return buffer.getvalue()
+
+def _pages(data: bytes) -> list:
+    with DocxReader(data) as reader:
+        return [page['text'] for page in reader.iter_pages()]
+
+def test_explicit_page_breaks_split_pages():
+    body = (
+        _p(_r("First page")) +
+        _p(_r("Still first"), '<w:r><w:br w:type="page"/></w:r>', _r("Second page")) +
+        _p(_r("Third page"), properties='<w:pPr><w:pageBreakBefore/></w:pPr>') +
+        # A line break is not a page break
+        _p(_r("Line one"), '<w:r><w:br/></w:r>', _r("line two"))
+    )
+
+    assert _pages(_docx(body)) == ["First page\nStill first", "Second page", "Third page\nLine one\nline two"]
+
+def test_last_rendered_page_breaks_do_not_split_pages():
+    # Where Word last laid out a page; not a break in the document itself
+    body = _p(_r("Before"), '<w:r><w:lastRenderedPageBreak/><w:t>after</w:t></w:r>') + _p(_r("Next paragraph"))
+
+    assert _pages(_docx(body)) == ["Beforeafter\nNext paragraph"]
+
+def test_table_cells_are_tab_joined():
+    cell = lambda *paragraphs: f"<w:tc>{''.join(_p(_r(text)) for text in paragraphs)}</w:tc>"
+    body = (
+        _p(_r("Before the table")) +
+        f"<w:tbl><w:tr>{cell('Name')}{cell('Amount')}</w:tr>"
+        f"<w:tr>{cell('Widgets', 'and gadgets')}{cell('42')}</w:tr></w:tbl>" +
+        _p(_r("After the table"))
+    )
+
+    assert _pages(_docx(body)) == ["Before the table\nName\tAmount\nWidgets and gadgets\t42\nAfter the table"]
+
+def test_text_box_in_alternate_content_is_read_once():
+    text_box = (
+        '<w:r><mc:AlternateContent>'
+        '<mc:Choice Requires="wps"><w:drawing><wps:wsp><wps:txbx><w:txbxContent>'
+        f'{_p(_r("Boxed text"))}'
+        '</w:txbxContent></wps:txbx></wps:wsp></w:drawing></mc:Choice>'
+        '<mc:Fallback><w:pict><w:txbxContent>'
+        f'{_p(_r("Boxed text"))}'
+        '</w:txbxContent></w:pict></mc:Fallback>'
+        '</mc:AlternateContent></w:r>'
+    )
+    body = _p(_r("Anchor paragraph"), text_box) + _p(_r("Body continues"))
+
+    text, = _pages(_docx(body))
+
+    assert text.count("Boxed text") == 1
+    assert "Anchor paragraph" in text and "Body continues" in text
+
+def test_deleted_and_moved_revisions_are_skipped():
+    body = _p(
+        _r("Kept "),
+        '<w:del w:id="1" w:author="a"><w:r><w:delText>deleted </w:delText></w:r></w:del>',
+        '<w:ins w:id="2" w:author="a"><w:r><w:t>inserted</w:t></w:r></w:ins>'
+    ) + '<w:moveFrom w:id="3" w:author="a"><w:r><w:t>moved away</w:t></w:r></w:moveFrom>'
+
+    assert _pages(_docx(body)) == ["Kept inserted"]
+
+def test_headers_footers_and_notes():
+    part = lambda root, text: f'<w:{root} {NAMESPACES}>{_p(_r(text))}</w:{root}>'
+    parts = {
+        'header1.xml': part('hdr', "Company header"),
+        # The same header again for a second section
+        'header2.xml': part('hdr', "Company header"),
+        'footer1.xml': part('ftr', "Page footer"),
+        'footnotes.xml': f'<w:footnotes {NAMESPACES}><w:footnote w:id="1">{_p(_r("A footnote"))}</w:footnote></w:footnotes>',
+    }
+    relationships = [
+        ('rId1', 'header', 'header1.xml', False), ('rId2', 'header', 'header2.xml', False),
+        ('rId3', 'footer', 'footer1.xml', False), ('rId4', 'footnotes', 'footnotes.xml', False),
+    ]
+    body = _p(_r("Page one")) + _p('<w:r><w:br w:type="page"/></w:r>', _r("Page two"))
+
+    pages = _pages(_docx(body, parts, relationships))
+
+    # Headers lead the first page, footers and notes close the last
+    assert pages == ["Company header\nPage one", "Page two\nPage footer\nA footnote"]
+
+def test_hyperlinks_from_relationships_and_field_codes():
+    relationships = [
+        ('rId1', 'hyperlink', 'https://example.com/rel', True),
+        ('rId2', 'image', 'media/image1.png', False),
+    ]
+    body = (
+        _p(f'<w:hyperlink r:id="rId1">{_r("Linked text")}</w:hyperlink>') +
+        _p('<w:r><w:fldChar w:fldCharType="begin"/></w:r>',
+           '<w:r><w:instrText xml:space="preserve"> HYPERLINK "https://example.com/field" </w:instrText></w:r>',
+           '<w:r><w:fldChar w:fldCharType="separate"/></w:r>', _r("Field text"),
+           '<w:r><w:fldChar w:fldCharType="end"/></w:r>') +
+        _p('<w:fldSimple w:instr=\' HYPERLINK "https://example.com/simple" \'>' + _r("Simple field") + '</w:fldSimple>') +
+        # Internal relationships are not links
+        _p('<w:hyperlink r:id="rId2">' + _r("Not a link") + '</w:hyperlink>')
+    )
+
+    with DocxReader(_docx(body, relationships=relationships)) as reader:
+        text, = [page['text'] for page in reader.iter_pages()]
+        assert reader.hyperlinks == ['https://example.com/rel', 'https://example.com/field', 'https://example.com/simple']
+    assert "Field text" in text and "HYPERLINK" not in text
+
+def test_native_extraction_through_the_processor():
+    body = _p(_r("Native body text")) + _p('<w:r><w:br w:type="page"/></w:r>', _r("Second page"))
+
+    with DocumentProcessor(_docx(body), DOCX_MIME_TYPE) as processor:
+        text, method = processor.process()
+
+        assert method == ExtractionMethod.DOCX
+        assert processor.page_methods == ['docx', 'docx']
+    assert text == "Native body text\nSecond page"
+
+def _converted_pdf() -> bytes:
+    fitz = pytest.importorskip('fitz')
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Text of the converted document " * 4)
+    return doc.tobytes()
+
+@pytest.mark.parametrize('data', [
+    b"PK\x03\x04 truncated zip", _docx("")[:-40], _docx(_p(_r("<unclosed")))
+], ids=['not a zip', 'truncated zip', 'malformed xml'])
+def test_corrupt_package_falls_back_to_conversion(monkeypatch, data):
+    converted = []
+
+    def convert(self):
+        converted.append(True)
+        return _converted_pdf()
+    monkeypatch.setattr(DocumentProcessor, '_convert_to_pdf', convert)
+
+    with DocumentProcessor(data, DOCX_MIME_TYPE) as processor:
+        text, method = processor.process()
+    with DocumentProcessor(data, DOCX_MIME_TYPE) as processor:
+        pages = list(processor.iter_pages())
+
+    assert converted == [True, True]
+    assert "converted document" in text
+    assert method == ExtractionMethod.PYMUPDF
+    assert [page['method'] for page in pages] == [ExtractionMethod.PYMUPDF]
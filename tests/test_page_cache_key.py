@@ -0,0 +1,16 @@
+from app.utils import document_processor
+from app.utils.document_processor import page_ocr_settings
+
+def test_page_key_settings_follow_language_engine_and_version(monkeypatch):
+    baseline = page_ocr_settings()
+
+    monkeypatch.setattr(document_processor, 'OCR_LANGUAGE', 'deu')
+    assert page_ocr_settings() != baseline
+    monkeypatch.undo()
+
+    monkeypatch.setattr(document_processor, 'engine_name', lambda: 'tesserocr' if baseline['ocr_engine'] != 'tesserocr' else 'pytesseract')
+    assert page_ocr_settings() != baseline
+    monkeypatch.undo()
+
+    monkeypatch.setattr(document_processor, 'EXTRACTION_VERSION', document_processor.EXTRACTION_VERSION + 1)
+    assert page_ocr_settings() != baseline
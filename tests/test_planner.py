@@ -0,0 +1,133 @@
+import io
+
+import pytest
+from PIL import Image
+
+fitz = pytest.importorskip('fitz')
+
+from app.utils import document_processor
+from app.utils.document_processor import DocumentProcessor, ExtractionMethod, _garbage_ratio, assess_page
+from app.utils.parsed_document import ParsedDocument
+
+BODY = "Born digital text layer with plenty of words. " * 8
+
+def _png(width: int = 400, height: int = 500) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('L', (width, height), 200).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def _mixed_pdf() -> bytes:
+    doc = fitz.open()
+    # 0: born digital
+    doc.new_page().insert_textbox(fitz.Rect(72, 72, 540, 720), BODY)
+    # 1: a scan without a text layer
+    doc.new_page().insert_image(fitz.Rect(0, 0, 612, 792), stream=_png())
+    # 2: a few characters only
+    doc.new_page().insert_text((72, 72), "Page 3")
+    # 3: a scan with a thin text layer (a header stamped on it)
+    page = doc.new_page()
+    page.insert_image(fitz.Rect(0, 0, 612, 792), stream=_png())
+    page.insert_text((72, 40), "Stamped header with some characters on a scan")
+    page.insert_text((72, 60), "and a second line of the stamp, still short")
+    # 4: a scan with a full text layer underneath, which is trusted
+    page = doc.new_page()
+    page.insert_image(fitz.Rect(0, 0, 612, 792), stream=_png())
+    page.insert_textbox(fitz.Rect(72, 72, 540, 720), BODY)
+    return doc.tobytes()
+
+@pytest.fixture(scope='module')
+def parsed():
+    with ParsedDocument(_mixed_pdf()) as parsed:
+        yield parsed
+
+def test_garbage_ratio():
+    assert _garbage_ratio("") == 0.0
+    assert _garbage_ratio("plain text\n") == 0.0
+    # Whitespace is not counted; replacement and private-use glyphs are
+    assert _garbage_ratio("ab \ufffd\ue000") == 0.5
+
+def test_thresholds(parsed):
+    assessments = [assess_page(parsed, i) for i in range(parsed.page_count)]
+
+    assert [a['needs_ocr'] for a in assessments] == [False, True, True, True, False]
+    born_digital, scan, short, stamped, layered = assessments
+    assert born_digital['char_count'] >= document_processor.TEXT_LAYER_MIN_CHARS
+    assert born_digital['image_coverage'] == 0.0
+    assert scan['char_count'] == 0 and scan['image_coverage'] > document_processor.TEXT_LAYER_MAX_IMAGE_COVERAGE
+    assert short['char_count'] < document_processor.TEXT_LAYER_MIN_CHARS
+    # Enough text for a page without images, too little for one covered by a scan
+    assert document_processor.TEXT_LAYER_MIN_CHARS <= stamped['char_count'] < document_processor.TEXT_LAYER_MIN_CHARS_WITH_IMAGES
+    assert layered['char_count'] >= document_processor.TEXT_LAYER_MIN_CHARS_WITH_IMAGES
+
+def test_thresholds_follow_settings(parsed, monkeypatch):
+    monkeypatch.setattr(document_processor, 'TEXT_LAYER_MIN_CHARS', 1)
+    assert not assess_page(parsed, 2)['needs_ocr']
+    monkeypatch.setattr(document_processor, 'TEXT_LAYER_MAX_IMAGE_COVERAGE', 1.0)
+    assert not assess_page(parsed, 3)['needs_ocr']
+
+def test_garbled_text_layer_needs_ocr(parsed, monkeypatch):
+    # A text layer from a broken font encoding: enough characters, most of them unusable
+    garbled = "\ufffd" * 300 + BODY[:100]
+    monkeypatch.setattr(parsed, 'page_text', lambda page_number: garbled)
+
+    assessment = assess_page(parsed, 0)
+
+    assert assessment['garbage_ratio'] > document_processor.TEXT_LAYER_MAX_GARBAGE_RATIO
+    assert assessment['needs_ocr']
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    """OCR each planned page to a marker instead of running Tesseract; pages in `failing` fail"""
+    requested = []
+    failing = set()
+
+    def ocr_pages(self, page_numbers):
+        page_numbers = list(page_numbers)
+        requested.extend(page_numbers)
+        for i in page_numbers:
+            yield i, None if i in failing else f"OCR text of page {i + 1}"
+    monkeypatch.setattr(DocumentProcessor, '_ocr_pages', ocr_pages)
+    return requested, failing
+
+def test_mixed_pdf_is_hybrid(fake_ocr):
+    requested, _ = fake_ocr
+    with DocumentProcessor(_mixed_pdf(), 'application/pdf') as processor:
+        text, method = processor.process()
+
+        assert method == ExtractionMethod.HYBRID
+        assert processor.page_methods == ['pymupdf', 'ocr', 'ocr', 'ocr', 'pymupdf']
+    # Only the pages whose text layer is unusable are OCRed
+    assert requested == [1, 2, 3]
+    assert "Born digital text layer" in text
+    assert "OCR text of page 2" in text and "OCR text of page 4" in text
+
+def test_pages_are_streamed_in_order_with_their_method(fake_ocr):
+    with DocumentProcessor(_mixed_pdf(), 'application/pdf') as processor:
+        pages = list(processor.iter_pages())
+
+        assert [(page['page'], page['method']) for page in pages] == [
+            (1, ExtractionMethod.PYMUPDF), (2, ExtractionMethod.OCR), (3, ExtractionMethod.OCR),
+            (4, ExtractionMethod.OCR), (5, ExtractionMethod.PYMUPDF)
+        ]
+        assert processor.extraction_method == ExtractionMethod.HYBRID
+
+def test_failed_ocr_page_keeps_its_text_layer(fake_ocr):
+    _, failing = fake_ocr
+    failing.add(2)
+    with DocumentProcessor(_mixed_pdf(), 'application/pdf') as processor:
+        text, _ = processor.process()
+
+        assert processor.page_methods == ['pymupdf', 'ocr', 'pymupdf', 'ocr', 'pymupdf']
+    assert "Page 3" in text
+
+def test_born_digital_pdf_is_not_ocred(fake_ocr):
+    requested, _ = fake_ocr
+    doc = fitz.open()
+    for _ in range(3):
+        doc.new_page().insert_textbox(fitz.Rect(72, 72, 540, 720), BODY)
+
+    with DocumentProcessor(doc.tobytes(), 'application/pdf') as processor:
+        _, method = processor.process()
+
+    assert method == ExtractionMethod.PYMUPDF
+    assert requested == []
@@ -0,0 +1,72 @@
+import json
+import sqlite3
+
+from app.utils.result_cache import ResultCache
+
+def _cache(path, max_disk_bytes=1000, **kwargs):
+    return ResultCache("documents", max_entries=0, disk_path=str(path), max_disk_bytes=max_disk_bytes, enabled=True, **kwargs)
+
+def _disk_total(cache):
+    return cache._disk.execute("SELECT total FROM documents_size").fetchone()[0]
+
+def _disk_sum(cache):
+    return cache._disk.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()[0]
+
+def test_running_total_tracks_inserts_and_replacements(tmp_path):
+    cache = _cache(tmp_path / "cache.sqlite3", max_disk_bytes=10 ** 6)
+
+    cache.set("a", "x" * 100)
+    cache.set("b", "y" * 50)
+    cache.set("a", "z" * 10)
+
+    assert _disk_total(cache) == _disk_sum(cache) == len(json.dumps("z" * 10)) + len(json.dumps("y" * 50))
+
+def test_least_recently_used_entries_are_evicted_over_the_cap(tmp_path):
+    cache = _cache(tmp_path / "cache.sqlite3", max_disk_bytes=300)
+    for key in "abc":
+        cache.set(key, key * 98)
+    assert _disk_total(cache) == 300
+    # Touch a so b is the oldest
+    assert cache.get("a") == "a" * 98
+    cache.set("d", "d" * 98)
+
+    keys = {row[0] for row in cache._disk.execute("SELECT key FROM documents")}
+    assert keys == {"a", "c", "d"}
+    assert _disk_total(cache) == _disk_sum(cache) == 300
+
+def test_running_total_is_seeded_from_an_existing_table(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = _cache(path, max_disk_bytes=10 ** 6)
+    cache.set("a", "a" * 100)
+    # A file written before the running total existed
+    cache._disk.execute("DROP TABLE documents_size")
+    cache._disk.commit()
+
+    reopened = _cache(path, max_disk_bytes=10 ** 6)
+    assert _disk_total(reopened) == 102
+    reopened.set("b", "b" * 8)
+    assert _disk_total(reopened) == _disk_sum(reopened) == 112
+
+def test_caches_sharing_a_file_share_the_total(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    first, second = _cache(path, max_disk_bytes=250), _cache(path, max_disk_bytes=250)
+
+    first.set("a", "a" * 98)
+    second.set("b", "b" * 98)
+    first.set("c", "c" * 98)
+
+    assert _disk_total(second) == _disk_sum(second) == 200
+    assert second.get("a") is None
+
+def test_unreadable_disk_tier_is_a_miss(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = _cache(path, max_disk_bytes=10 ** 6)
+    cache.set("a", "a" * 100)
+    # Damaged by something else using the file
+    other = sqlite3.connect(str(path))
+    other.execute("DROP TABLE documents")
+    other.commit()
+    other.close()
+
+    assert cache.get("a") is None
+    assert cache.stats()['misses'] == 1
@@ -0,0 +1,213 @@
+import asyncio
+import gc
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+fitz = pytest.importorskip('fitz')
+from fastapi.testclient import TestClient
+
+from app import main
+from app.auth.auth_handler import API_KEY
+from app.utils import fetcher, spool
+from app.utils.document_processor import DocumentProcessor
+from app.utils.jobs import JobManager, MemoryJobStore
+from app.utils.ocr_tiers import OCRPolicy
+from app.utils.result_cache import cache_key
+from app.utils.spool import SpooledDocument
+
+def _pdf(text: str = "Spooled document") -> bytes:
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), text + " with a text layer long enough to be trusted " * 3)
+    return doc.tobytes()
+
+PDF = _pdf()
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    """Spool into an empty directory of the test's own, so leftover files are easy to see"""
+    monkeypatch.setattr(spool, 'SPOOL_DIR', str(tmp_path))
+    return tmp_path
+
+def _spooled(spool_dir) -> list:
+    return sorted(os.listdir(spool_dir))
+
+def test_spooled_to_spool_dir_with_its_extension(spool_dir):
+    with SpooledDocument.from_file(io.BytesIO(PDF), spool.suffix_for("Report.PDF")) as document:
+        assert os.path.dirname(document.path) == str(spool_dir)
+        assert document.path.endswith('.pdf')
+        assert len(document) == len(PDF)
+        with document.open() as spooled_file:
+            assert spooled_file.read() == PDF
+    assert _spooled(spool_dir) == []
+
+@pytest.mark.parametrize('filename, suffix', [
+    ("scan.tiff", ".tiff"), ("archive.tar.gz", ".gz"), ("no_extension", ""), ("odd.p df", ""), (None, "")
+])
+def test_suffix_for(filename, suffix):
+    assert spool.suffix_for(filename) == suffix
+
+def test_document_is_hashed_through_its_memory_map(spool_dir):
+    with SpooledDocument.from_bytes(PDF, '.pdf') as document:
+        processor = DocumentProcessor.from_spooled(document, 'application/pdf')
+        # The processor shares the map instead of holding a copy of the bytes
+        assert processor.file_bytes is document.buffer
+        assert cache_key(document.buffer) == cache_key(PDF)
+        processor.close()
+
+def test_empty_document(spool_dir):
+    with SpooledDocument.from_bytes(b"") as document:
+        assert document.buffer == b""
+        assert len(document) == 0
+    assert _spooled(spool_dir) == []
+
+def test_failed_copy_removes_the_file(spool_dir):
+    class Broken(io.BytesIO):
+        def read(self, *args):
+            raise OSError("connection reset")
+
+    with pytest.raises(OSError):
+        SpooledDocument.from_file(Broken(PDF))
+    assert _spooled(spool_dir) == []
+
+def test_close_while_the_map_is_in_use(spool_dir):
+    document = SpooledDocument.from_bytes(PDF, '.pdf')
+    view = memoryview(document.buffer)
+
+    document.close()
+
+    # The file is gone at once; the map is freed with its last reference
+    assert _spooled(spool_dir) == []
+    assert bytes(view[:4]) == b"%PDF"
+    view.release()
+
+def test_forgotten_document_is_removed(spool_dir):
+    SpooledDocument.from_bytes(PDF, '.pdf')
+    gc.collect()
+
+    assert _spooled(spool_dir) == []
+
+@pytest.fixture
+def client():
+    return TestClient(main.app, headers={'X-API-Key': API_KEY})
+
+def test_upload_is_removed_after_the_request(spool_dir, client, monkeypatch):
+    seen = []
+    process_content = main.process_content
+
+    async def watched(document, *args, **kwargs):
+        seen.append(_spooled(spool_dir))
+        return await process_content(document, *args, **kwargs)
+    monkeypatch.setattr(main, 'process_content', watched)
+
+    response = client.post('/process-document/', files={'file': ('report.pdf', _pdf("Upload"), 'application/pdf')})
+
+    assert response.status_code == 200
+    assert "Upload" in response.json()['extracted_text']
+    # One spooled copy while processing, none afterwards
+    assert len(seen) == 1 and len(seen[0]) == 1
+    assert _spooled(spool_dir) == []
+
+def test_upload_is_removed_when_processing_fails(spool_dir, client, monkeypatch):
+    async def failing(*args, **kwargs):
+        raise RuntimeError("extraction failed")
+    monkeypatch.setattr(main, 'process_content', failing)
+
+    response = client.post('/process-document/', files={'file': ('report.pdf', PDF, 'application/pdf')})
+
+    assert response.status_code == 500
+    assert _spooled(spool_dir) == []
+
+def test_archive_members_are_removed_after_the_batch(spool_dir, client):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zip_file:
+        zip_file.writestr('one.pdf', _pdf("Member one"))
+        zip_file.writestr('two.pdf', b"not a pdf")
+
+    response = client.post('/process-documents/batch', files={'files': ('docs.zip', archive.getvalue(), 'application/zip')})
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(record['status'] for record in records) == ['error', 'ok']
+    assert _spooled(spool_dir) == []
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = PDF if self.path == '/report.pdf' else b"plain text" * 1000
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+def _download(url: str):
+    async def run():
+        try:
+            return await fetcher.fetch_url(url, sniff=main.sniff_document)
+        finally:
+            await fetcher.close_clients()
+    return asyncio.run(run())
+
+def test_download_is_spooled_once(spool_dir, server):
+    document, filename, _ = _download(f"{server}/report.pdf")
+
+    with document:
+        assert _spooled(spool_dir) == [os.path.basename(document.path)]
+        assert bytes(document.buffer) == PDF
+    assert _spooled(spool_dir) == []
+
+def test_rejected_download_is_removed(spool_dir, server):
+    with pytest.raises(Exception):
+        _download(f"{server}/notes.txt")
+
+    assert _spooled(spool_dir) == []
+
+def _run_jobs(payloads, cancel_first=False):
+    """Run payloads through a JobManager wired like the app's, returning the finished job records"""
+    async def run():
+        manager = JobManager(main.run_extraction_job, store=MemoryJobStore(), workers=1, release=main.release_job_payload)
+        await manager.start()
+        jobs = [manager.submit(payload, {}) for payload in payloads]
+        if cancel_first:
+            manager.cancel(jobs[-1]['id'])
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            records = [manager.get(job['id']) for job in jobs]
+            if all(record['finished_at'] is not None for record in records) and manager.running == 0:
+                break
+            await asyncio.sleep(0.05)
+        # Payloads are released once the worker is done with each job
+        await manager._queue.join()
+        await manager.stop()
+        return records
+    return asyncio.run(run())
+
+def _payload(data: bytes) -> dict:
+    return {
+        'document': SpooledDocument.from_bytes(data, '.pdf'), 'mime_type': 'application/pdf',
+        'ocr_policy': OCRPolicy(), 'api_key': None
+    }
+
+def test_job_documents_are_removed_once_their_jobs_finish(spool_dir):
+    payloads = [_payload(_pdf("Job")), _payload(b"%PDF-1.4 truncated"), _payload(_pdf("Cancelled"))]
+    assert len(_spooled(spool_dir)) == 3
+
+    records = _run_jobs(payloads, cancel_first=True)
+
+    # Succeeded, failed and cancelled before it ran
+    assert [record['status'] for record in records] == ['succeeded', 'failed', 'cancelled']
+    assert _spooled(spool_dir) == []
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+
+fitz = pytest.importorskip('fitz')
+
+from app import main
+from app.utils.document_processor import DocumentProcessor
+from app.utils.spool import SpooledDocument
+
+def _pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"Page {i + 1} " + "text layer words " * 40)
+    return doc.tobytes()
+
+@pytest.fixture
+def processor():
+    document = SpooledDocument.from_bytes(_pdf(30), '.pdf')
+    processor = DocumentProcessor.from_spooled(document, 'application/pdf')
+    yield processor
+    processor.close()
+    document.close()
+
+def _stream(processor, produced):
+    iter_pages = processor.iter_pages
+
+    def counted():
+        for page in iter_pages():
+            produced.append(page['page'])
+            yield page
+    processor.iter_pages = counted
+    cost = {"predicted": main.estimate_cost(processor), "actual": None}
+    return main.stream_pages(processor, cost), cost
+
+def test_slow_client_holds_extraction_back(processor):
+    produced = []
+
+    async def run():
+        pages, _ = _stream(processor, produced)
+        first = await pages.__anext__()
+        await asyncio.sleep(0.5)
+        started = time.monotonic()
+        await pages.aclose()
+        return first, time.monotonic() - started
+
+    first, close_seconds = asyncio.run(run())
+
+    assert first['page'] == 1
+    # The buffered pages plus the one the producer is waiting to hand over
+    assert len(produced) <= 1 + main.STREAM_BUFFER_PAGES + 1
+    assert close_seconds < 2
+    assert processor.cancel_event.is_set()
+
+def test_yielded_pages_are_released(processor):
+    produced = []
+
+    async def run():
+        pages, cost = _stream(processor, produced)
+        records = [page async for page in pages]
+        return records, cost
+
+    records, cost = asyncio.run(run())
+
+    assert [record['page'] for record in records] == list(range(1, 31))
+    assert cost['actual'] is not None
+    assert processor.parsed._texts == {}
+    assert processor.parsed._links == {}